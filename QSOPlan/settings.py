@@ -27,6 +27,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so latency covers every other middleware
+    'qso_logger.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -58,6 +60,22 @@ TEMPLATES = [
 WSGI_APPLICATION = 'QSOPlan.wsgi.application'
 
 # Database
+# DB_PROFILE picks the connection defaults; each can be overridden on its own.
+# 'production' keeps a connection open for DB_CONN_MAX_AGE seconds instead of
+# opening one per request (checked before reuse when DB_CONN_HEALTH_CHECKS is
+# on), and cancels any statement running longer than DB_STATEMENT_TIMEOUT_MS,
+# so a runaway rankings query frees its worker. Every gunicorn worker and
+# match worker thread holds a connection, which must fit max_connections.
+# Long maintenance commands (rebuild_rollups, rematch_qsos) may need
+# DB_STATEMENT_TIMEOUT_MS=0. Streaming reads (.iterator(), e.g. the export)
+# use server-side cursors; set DB_DISABLE_SERVER_SIDE_CURSORS=1 behind a
+# transaction-pooling PgBouncer, which cannot keep a cursor across queries.
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+DB_PROFILES = {
+    'development': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': 0, 'STATEMENT_TIMEOUT_MS': 0},
+    'production': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': 1, 'STATEMENT_TIMEOUT_MS': 30000},
+}
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', DB_PROFILES[DB_PROFILE]['STATEMENT_TIMEOUT_MS']))
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -66,9 +84,46 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'qso_password'),
         'HOST': os.environ.get('POSTGRES_HOST', 'db'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', DB_PROFILES[DB_PROFILE]['CONN_MAX_AGE'])),
+        'CONN_HEALTH_CHECKS': bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', DB_PROFILES[DB_PROFILE]['CONN_HEALTH_CHECKS']))),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 0))),
+        'OPTIONS': {
+            # Passed to the server at connect time; 0 means no limit
+            'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}',
+        },
     }
 }
 
+# Cache
+# CACHE_BACKEND selects local memory (per process), file-based or Redis;
+# localredis is the Redis backend against an in-process stand-in server
+# (qso_logger/cache_backends.py) for tests and development. Entries expire
+# after CACHE_TIMEOUT seconds; the backends other than Redis also evict once
+# CACHE_MAX_ENTRIES is reached.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'qso-logger'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', '/var/tmp/qso_logger_cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379/1'),
+    'localredis': ('qso_logger.cache_backends.LocalRedisCache', 'redis://local/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+        'KEY_PREFIX': 'qso',
+    }
+}
+if CACHE_BACKEND in ('locmem', 'file'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+elif CACHE_BACKEND == 'localredis':
+    CACHES['default']['OPTIONS'] = {
+        'MAX_KEYS': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+
 # Auth settings
 AUTH_USER_MODEL = 'qso_logger.User'
 
@@ -91,13 +146,74 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'qso_logger.authentication.CachedJWTAuthentication',
     ],
 }
 
+# Seconds a JWT-authenticated user stays cached (0 disables the cache).
+# Saves and approvals drop the entry at once; with the per-process locmem
+# backend other worker processes only notice after this TTL, so use the
+# file or redis backend when running several workers.
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 30))
+
+# Delta sync of QSO logs: how far back a sync token re-reads to cover
+# transactions that committed late, and how long deletions are remembered
+QSO_SYNC_LEEWAY_SECONDS = int(os.environ.get('QSO_SYNC_LEEWAY_SECONDS', 30))
+QSO_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('QSO_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Prometheus scrapes /api/metrics with "Authorization: Bearer <METRICS_TOKEN>";
+# without a token the endpoint is only open when DEBUG is on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Opt-in capture of queries slower than the threshold. A sample of the slow
+# SELECTs is explained (plain EXPLAIN, nothing runs twice on the request
+# path) and the last SLOW_QUERY_BUFFER_SIZE are listed in the admin at
+# /admin/slow-queries/, where EXPLAIN ANALYZE can be run on demand, and at
+# /api/slow-queries/
+SLOW_QUERY_CAPTURE = bool(int(os.environ.get('SLOW_QUERY_CAPTURE', 0)))
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', 100))
+
+# With MATCH_ASYNC on, creating a QSO only queues a match job and the
+# run_match_worker command confirms it; otherwise matching runs in the
+# request and failures are queued for the worker to retry
+MATCH_ASYNC = bool(int(os.environ.get('MATCH_ASYNC', 0)))
+MATCH_WORKER_THREADS = int(os.environ.get('MATCH_WORKER_THREADS', 4))
+MATCH_JOB_BATCH_SIZE = int(os.environ.get('MATCH_JOB_BATCH_SIZE', 100))
+MATCH_JOB_MAX_ATTEMPTS = int(os.environ.get('MATCH_JOB_MAX_ATTEMPTS', 5))
+MATCH_JOB_RETRY_SECONDS = int(os.environ.get('MATCH_JOB_RETRY_SECONDS', 30))
+
+# Contest sessions stage QSOs and write them to the log in batches of up to
+# CONTEST_FLUSH_SIZE, or once the oldest is CONTEST_FLUSH_SECONDS old; each
+# process keeps dupe sheets for its CONTEST_SHEETS_MAX most recent sessions
+CONTEST_FLUSH_SIZE = int(os.environ.get('CONTEST_FLUSH_SIZE', 50))
+CONTEST_FLUSH_SECONDS = int(os.environ.get('CONTEST_FLUSH_SECONDS', 10))
+CONTEST_SHEETS_MAX = int(os.environ.get('CONTEST_SHEETS_MAX', 256))
+
+# POST /api/qsos/import/ runs inside the request, under the statement
+# timeout; larger logs are refused with 413 and go through the import_adif
+# management command instead. 5 MB is some 30,000 ADIF records.
+IMPORT_MAX_UPLOAD_BYTES = int(os.environ.get('IMPORT_MAX_UPLOAD_BYTES', 5 * 1024 * 1024))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'qso_logger': {
+            'handlers': ['console'],
+            'level': os.environ.get('QSO_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000,http://localhost:80,http://localhost').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'X-Sync-Token']
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
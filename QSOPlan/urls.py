@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from qso_logger.admin import slow_query_admin
 
 urlpatterns = [
+    path('admin/slow-queries/', admin.site.admin_view(slow_query_admin), name='slow-queries-admin'),
     path('admin/', admin.site.urls),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
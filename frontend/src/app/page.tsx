@@ -11,6 +11,13 @@ interface UserRanking {
   total_contacts: number;
 }
 
+interface RankingsPage {
+  count: number;
+  next: string | null;
+  previous: string | null;
+  results: UserRanking[];
+}
+
 export default function Home() {
   const [rankings, setRankings] = useState<UserRanking[]>([]);
   const [loading, setLoading] = useState(true);
@@ -19,8 +26,8 @@ export default function Home() {
   useEffect(() => {
     const fetchRankings = async () => {
       try {
-        const response = await api.get<UserRanking[]>('/api/qsos/rankings/');
-        setRankings(response.data);
+        const response = await api.get<RankingsPage>('/api/qsos/rankings/');
+        setRankings(response.data.results);
         setError('');
       } catch (error) {
         const apiError = error as APIError;
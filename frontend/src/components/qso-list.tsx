@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useCallback, useState } from 'react';
+import { useEffect, useCallback, useRef, useState } from 'react';
 import useAuthStore from '@/lib/auth';
 import { APIError } from '@/lib/types';
 import api from '@/lib/api';  // Import the configured api instance
@@ -20,21 +20,55 @@ interface QSO {
   confirmed: boolean;
 }
 
+interface QSOChanges {
+  changed: QSO[];
+  deleted: number[];
+  token: string;
+}
+
+// Newest first, like the API
+const byDatetimeDesc = (a: QSO, b: QSO) =>
+  b.datetime.localeCompare(a.datetime) || b.id - a.id;
+
 export default function QSOList() {
   const [qsos, setQsos] = useState<QSO[]>([]);
   const [error, setError] = useState<string>('');
   const { token, user } = useAuthStore();
+  const syncToken = useRef<string | null>(null);
 
   const fetchQSOs = useCallback(async () => {
     if (!token || !user?.call_sign) return;
+    const headers = { Authorization: `Bearer ${token}` };
 
     try {
-      const response = await api.get<QSO[]>('/api/qsos/', {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
+      // After the first load only the changes since the last sync are fetched
+      if (syncToken.current) {
+        try {
+          const response = await api.get<QSOChanges>('/api/qsos/', {
+            headers,
+            params: { changes_since: syncToken.current },
+          });
+          const { changed, deleted, token: nextToken } = response.data;
+          const changedIds = new Set(changed.map((qso) => qso.id));
+          setQsos((current) =>
+            current
+              .filter((qso) => !changedIds.has(qso.id) && !deleted.includes(qso.id))
+              .concat(changed)
+              .sort(byDatetimeDesc)
+          );
+          syncToken.current = nextToken;
+          setError('');
+          return;
+        } catch (error) {
+          // An expired token means starting over with the full log
+          if ((error as APIError).response?.status !== 410) throw error;
+          syncToken.current = null;
+        }
+      }
+
+      const response = await api.get<QSO[]>('/api/qsos/', { headers });
       setQsos(response.data);
+      syncToken.current = response.headers['x-sync-token'] ?? null;
       setError('');
     } catch (error) {
       const apiError = error as APIError;
@@ -66,6 +100,8 @@ export default function QSOList() {
   };
 
   useEffect(() => {
+    // A different login starts from the full log
+    syncToken.current = null;
     fetchQSOs();
   }, [fetchQSOs]);
 
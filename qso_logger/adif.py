@@ -0,0 +1,193 @@
+# qso_logger/adif.py
+import csv
+import re
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+CALL_SIGN_RE = re.compile(r'^[A-Z0-9]{3,10}$')
+GRID_SQUARE_RE = re.compile(r'^[A-Z]{2}[0-9]{2}[A-Z]{2}$')
+MIN_FREQUENCY = Decimal('26.0')
+MAX_FREQUENCY = Decimal('900.0')
+
+READ_SIZE = 64 * 1024
+
+
+def iter_adif(stream):
+    """
+    Yield ADIF records from a text stream as {FIELD_NAME: value} dicts.
+
+    The stream is read in fixed-size chunks, so memory use depends on the
+    longest record rather than the size of the file. A header (any text
+    before the first field when the file does not start with '<') is
+    skipped up to its <EOH> tag.
+    """
+    buffer = ''
+    position = 0
+    in_header = None
+    record = {}
+
+    def fill():
+        nonlocal buffer, position
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    while True:
+        start = buffer.find('<', position)
+        if start == -1:
+            if in_header is None and buffer[position:].strip():
+                in_header = True
+            position = len(buffer)
+            if not fill():
+                break
+            continue
+        if in_header is None:
+            in_header = bool(buffer[position:start].strip())
+
+        end = buffer.find('>', start)
+        if end == -1:
+            position = start
+            if not fill():
+                break
+            continue
+
+        spec = buffer[start + 1:end].split(':')
+        name = spec[0].strip().upper()
+        if name == 'EOH':
+            in_header = False
+            record = {}
+            position = end + 1
+            continue
+        if name == 'EOR':
+            if record and not in_header:
+                yield record
+            record = {}
+            position = end + 1
+            continue
+
+        try:
+            length = int(spec[1]) if len(spec) > 1 else 0
+        except ValueError:
+            length = 0
+        while len(buffer) < end + 1 + length:
+            # Keep the tag in the buffer while pulling in the rest of its value
+            position = start
+            if not fill():
+                break
+            end -= start
+            start = 0
+        value = buffer[end + 1:end + 1 + length]
+        position = end + 1 + length
+        if not in_header:
+            record[name] = value
+
+    if record and not in_header:
+        yield record
+
+
+def iter_csv(stream):
+    """Yield CSV rows with upper-cased column names, matching ``iter_adif`` records."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield {(key or '').strip().upper(): (value or '').strip() for key, value in row.items()}
+
+
+def _parse_datetime(record):
+    raw = record.get('DATETIME')
+    if raw:
+        moment = datetime.fromisoformat(raw.replace('Z', '+00:00'))
+    else:
+        date = record.get('QSO_DATE', '')
+        time = (record.get('TIME_ON', '') + '00')[:6]
+        moment = datetime.strptime(date + time, '%Y%m%d%H%M%S')
+    if moment.tzinfo is None:
+        # ADIF times are always UTC
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return moment
+
+
+def _grid(value, field):
+    value = (value or '').strip().upper()[:6]
+    if not GRID_SQUARE_RE.match(value):
+        raise ValueError(f'{field} must be a 6-character grid square')
+    return value
+
+
+def normalize_record(record):
+    """
+    Map an ADIF or CSV record onto QSOContact fields.
+
+    Values are normalised the way ``QSOContact.clean`` does (upper-cased call
+    signs and locators) and validated against the same formats; 8-character
+    locators are truncated to the 6 characters the model stores. Raises
+    ValueError with a human-readable reason for rejected records.
+    """
+    recipient = (record.get('CALL') or record.get('RECIPIENT') or '').strip().upper()
+    if not CALL_SIGN_RE.match(recipient):
+        raise ValueError('Call sign must be 3-10 alphanumeric characters')
+
+    try:
+        frequency = Decimal((record.get('FREQ') or record.get('FREQUENCY') or '').strip())
+    except InvalidOperation:
+        raise ValueError('Missing or invalid frequency')
+    if not (MIN_FREQUENCY <= frequency <= MAX_FREQUENCY):
+        raise ValueError('Frequency must be between 26.0 and 900.0 MHz')
+    frequency = frequency.quantize(Decimal('0.001'))
+
+    mode = (record.get('MODE') or '').strip().upper()
+    if not mode or len(mode) > 10:
+        raise ValueError('Missing or invalid mode')
+
+    try:
+        moment = _parse_datetime(record)
+    except ValueError:
+        raise ValueError('Missing or invalid QSO date/time')
+
+    return {
+        'recipient': recipient,
+        'frequency': frequency,
+        'mode': mode,
+        'datetime': moment,
+        'initiator_location': _grid(
+            record.get('MY_GRIDSQUARE') or record.get('INITIATOR_LOCATION'), 'My grid square'
+        ),
+        'recipient_location': _grid(
+            record.get('GRIDSQUARE') or record.get('RECIPIENT_LOCATION'), 'Grid square'
+        ),
+    }
+
+
+def _adif_field(name, value):
+    value = str(value)
+    return f'<{name}:{len(value)}>{value}'
+
+
+def adif_header():
+    return (
+        'QSOPlan ADIF export\n'
+        f"{_adif_field('ADIF_VER', '3.1.4')}\n"
+        f"{_adif_field('PROGRAMID', 'QSOPlan')}\n"
+        '<EOH>\n'
+    )
+
+
+def adif_record(row, station_call_sign):
+    """Render one exported QSO (a ``.values()`` row) as an ADIF record line."""
+    moment = row['datetime'].astimezone(dt_timezone.utc)
+    return ''.join((
+        _adif_field('STATION_CALLSIGN', station_call_sign),
+        _adif_field('CALL', row['recipient']),
+        _adif_field('QSO_DATE', moment.strftime('%Y%m%d')),
+        _adif_field('TIME_ON', moment.strftime('%H%M%S')),
+        _adif_field('FREQ', row['frequency']),
+        _adif_field('BAND', row['band']) if row['band'] else '',
+        _adif_field('MODE', row['mode']),
+        _adif_field('MY_GRIDSQUARE', row['initiator_location']),
+        _adif_field('GRIDSQUARE', row['recipient_location']),
+        _adif_field('QSL_RCVD', 'Y' if row['confirmed'] else 'N'),
+        _adif_field('DISTANCE', round(row['distance_km'])) if row['distance_km'] is not None else '',
+        '<EOR>\n',
+    ))
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, QSOContact
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from . import cache, slow_queries
+from .models import ContestSession, User, QSOContact
 
 class CustomUserAdmin(UserAdmin):
     model = User
@@ -15,7 +19,11 @@ class CustomUserAdmin(UserAdmin):
     actions = ['approve_users']
 
     def approve_users(self, request, queryset):
+        user_ids = list(queryset.values_list('pk', flat=True))
         queryset.update(is_approved=True, is_active=True)
+        # update() sends no signals, so drop the cached logins here
+        for user_id in user_ids:
+            cache.delete(cache.AUTH_USERS, user_id)
     approve_users.short_description = "Approve selected users"
 
 class QSOContactAdmin(admin.ModelAdmin):
@@ -23,6 +31,35 @@ class QSOContactAdmin(admin.ModelAdmin):
     list_filter = ('confirmed', 'mode', 'datetime')
     search_fields = ('initiator__username', 'initiator__call_sign', 'recipient')
     date_hierarchy = 'datetime'
+    # One join for the initiator column, and no second COUNT(*) over every QSO
+    list_select_related = ('initiator',)
+    show_full_result_count = False
+
+class ContestSessionAdmin(admin.ModelAdmin):
+    list_display = ('operator', 'name', 'opened_at', 'closed_at', 'logged_contacts')
+    list_filter = ('closed_at',)
+    search_fields = ('operator__call_sign', 'name')
+    list_select_related = ('operator',)
 
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(QSOContact, QSOContactAdmin)
+admin.site.register(ContestSession, ContestSessionAdmin)
+
+
+def slow_query_admin(request):
+    # The captured slow queries (see slow_queries.py); EXPLAIN ANALYZE runs
+    # here, on an admin's request, rather than on the request that was slow
+    if request.method == 'POST':
+        if 'clear' in request.POST:
+            slow_queries.clear()
+        elif request.POST.get('analyze', '').isdigit():
+            slow_queries.analyze(int(request.POST['analyze']))
+        return redirect('slow-queries-admin')
+    return TemplateResponse(request, 'admin/qso_logger/slow_queries.html', {
+        **admin.site.each_context(request),
+        'title': 'Slow queries',
+        'enabled': settings.SLOW_QUERY_CAPTURE,
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+        'explain_sample_rate': settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        'queries': slow_queries.entries(),
+    })
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QsoLoggerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qso_logger'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.SLOW_QUERY_CAPTURE:
+            from django.db.backends.signals import connection_created
+            from .slow_queries import install
+            connection_created.connect(install, dispatch_uid='qso_logger.slow_queries')
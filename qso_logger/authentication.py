@@ -0,0 +1,54 @@
+# qso_logger/authentication.py
+from django.conf import settings
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from . import cache
+
+
+def _cached_fields(model):
+    # Everything but the password hash, which must not land in a shared or on-disk cache
+    return [field.attname for field in model._meta.concrete_fields if field.attname != 'password']
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the resolved user in the cache for a short TTL.
+
+    Only active users are ever cached, and only their fields other than the
+    password hash; the cached user loads the hash on first access, like a
+    deferred field. Entries are dropped whenever a User is saved or deleted
+    (see signals.py) and by the admin's approve action, so revoking access
+    takes effect on the next request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.AUTH_USER_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        fields = _cached_fields(self.user_model)
+
+        def load():
+            user = super(CachedJWTAuthentication, self).get_user(validated_token)
+            return {
+                'values': [getattr(user, name) for name in fields],
+                # What the token's revoke claim is checked against, not the hash itself
+                'password_md5': get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+            }
+
+        entry = cache.get_or_set(
+            cache.AUTH_USERS, [user_id], load, timeout=settings.AUTH_USER_CACHE_TTL, versioned=False
+        )
+        user = self.user_model.from_db(router.db_for_read(self.user_model), fields, entry['values'])
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        # The token check normally runs against the freshly loaded user
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != entry['password_md5']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
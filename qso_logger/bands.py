@@ -0,0 +1,28 @@
+# qso_logger/bands.py
+from decimal import Decimal
+
+# Amateur bands inside the 26-900 MHz range the API accepts, using the widest
+# allocation of any IARU region so that every legal contact gets a band.
+BAND_PLAN = (
+    ('10m', Decimal('28.000'), Decimal('29.700')),
+    ('6m', Decimal('50.000'), Decimal('54.000')),
+    ('4m', Decimal('70.000'), Decimal('70.500')),
+    ('2m', Decimal('144.000'), Decimal('148.000')),
+    ('1.25m', Decimal('222.000'), Decimal('225.000')),
+    ('70cm', Decimal('420.000'), Decimal('450.000')),
+)
+BANDS = {name: (low, high) for name, low, high in BAND_PLAN}
+
+
+def band_for_frequency(frequency):
+    """Name of the band containing ``frequency`` (MHz), or '' outside the band plan."""
+    frequency = Decimal(str(frequency))
+    for name, low, high in BAND_PLAN:
+        if low <= frequency <= high:
+            return name
+    return ''
+
+
+def frequency_range(band):
+    """(low, high) MHz limits of ``band``; raises KeyError for unknown bands."""
+    return BANDS[band]
@@ -0,0 +1,121 @@
+# qso_logger/batch.py
+from bisect import bisect_left, insort
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import IntegrityError, models, transaction
+from .matching import MATCH_VALUES, MATCH_WINDOW, confirm_pairs, pair_rows
+from .models import DUPLICATE_WINDOW_CONSTRAINT, DUPLICATE_WINDOW_MESSAGE, QSOContact
+from .stats import qso_rollup_key, record_created
+
+
+def _logged_within_hour(moments, moment):
+    """True if any sorted datetime in ``moments`` lies within an hour of ``moment``, either way."""
+    position = bisect_left(moments, moment - MATCH_WINDOW)
+    return position < len(moments) and moments[position] <= moment + MATCH_WINDOW
+
+
+def create_batch(user, entries):
+    """
+    Insert a batch of validated QSOs for ``user`` with a handful of queries.
+
+    ``entries`` is a list of (key, validated_data) tuples. The one-hour
+    duplicate rule is checked in both directions, as the PostgreSQL exclusion
+    constraint does, against the database with a single range query and
+    against earlier entries of the same batch in memory. Accepted rows are
+    inserted with one bulk INSERT and matched against the other stations'
+    logs as a set. If a concurrent write trips the exclusion constraint, the
+    entries are inserted one at a time to find the conflicting one.
+    Returns {key: QSOContact or error dict}.
+    """
+    results = {}
+    if not entries:
+        return results
+
+    moments = [data['datetime'] for _, data in entries]
+    recipients = {data['recipient'] for _, data in entries}
+    logged = {}
+    for recipient, moment in QSOContact.objects.filter(
+        initiator=user,
+        recipient__in=recipients,
+        datetime__gte=min(moments) - MATCH_WINDOW,
+        datetime__lte=max(moments) + MATCH_WINDOW,
+    ).values_list('recipient', 'datetime'):
+        logged.setdefault(recipient, []).append(moment)
+    for recipient_moments in logged.values():
+        recipient_moments.sort()
+
+    accepted = []
+    for key, data in entries:
+        recipient_moments = logged.setdefault(data['recipient'], [])
+        if _logged_within_hour(recipient_moments, data['datetime']):
+            results[key] = {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]}
+            continue
+        insort(recipient_moments, data['datetime'])
+        qso = QSOContact(initiator=user, confirmed=False, **data)
+        qso.update_derived_fields()
+        accepted.append((key, qso))
+
+    if not accepted:
+        return results
+
+    try:
+        with transaction.atomic():
+            created = QSOContact.objects.bulk_create([qso for _, qso in accepted])
+            record_created(qso_rollup_key(qso) for qso in created)
+            match_batch(user, created)
+    except IntegrityError as e:
+        if DUPLICATE_WINDOW_CONSTRAINT not in str(e):
+            raise
+        if len(accepted) == 1:
+            results[accepted[0][0]] = {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]}
+            return results
+        # A QSO committed since the range query collides with one of these
+        data_by_key = dict(entries)
+        for key, _ in accepted:
+            results.update(create_batch(user, [(key, data_by_key[key])]))
+        return results
+
+    for (key, _), qso in zip(accepted, created):
+        results[key] = qso
+    return results
+
+
+def match_batch(user, qsos):
+    """Match freshly inserted QSOs of ``user`` against the other stations in one pass."""
+    candidates = list(
+        QSOContact.objects.filter(
+            initiator__call_sign__in={qso.recipient for qso in qsos},
+            recipient=user.call_sign,
+            datetime__gte=min(qso.datetime for qso in qsos) - MATCH_WINDOW,
+            datetime__lte=max(qso.datetime for qso in qsos) + MATCH_WINDOW,
+            confirmed=False,
+        ).annotate(
+            initiator_call_sign=models.F('initiator__call_sign'),
+        ).values(*MATCH_VALUES)
+    )
+    if not candidates:
+        return
+
+    rows = candidates + [
+        {
+            'id': qso.pk,
+            'initiator_call_sign': user.call_sign,
+            'recipient': qso.recipient,
+            'datetime': qso.datetime,
+            'frequency': qso.frequency,
+            'mode': qso.mode,
+            'initiator_location': qso.initiator_location,
+            'recipient_location': qso.recipient_location,
+        }
+        for qso in qsos
+    ]
+    pairs = pair_rows(rows)
+    if not pairs:
+        return
+
+    confirm_pairs(pairs)
+    confirmed_ids = set(
+        QSOContact.objects.filter(pk__in=[qso.pk for qso in qsos], confirmed=True)
+        .values_list('pk', flat=True)
+    )
+    for qso in qsos:
+        qso.confirmed = qso.pk in confirmed_ids
@@ -0,0 +1,114 @@
+# qso_logger/cache.py
+import random
+import threading
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+
+# Namespaces whose entries are dropped together share a generation counter
+# that is part of every key; invalidating bumps the counter instead of
+# hunting down individual keys, which no cache backend can enumerate cheaply.
+# A counter can itself be evicted (MAX_ENTRIES culling, Redis maxmemory), so
+# it restarts from a random seed rather than 1: restarting from a number
+# already used would bring that generation's stale entries back.
+RANKINGS = 'rankings'
+CALLSIGNS = 'callsigns'
+USER_STATS = 'user-stats'
+AUTH_USERS = 'auth-users'
+
+_MISSING = object()
+_counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'invalidations': 0})
+_counters_lock = threading.Lock()
+
+
+def _count(namespace, event):
+    with _counters_lock:
+        _counters[namespace][event] += 1
+
+
+def _generation_key(namespace):
+    return f'gen:{namespace}'
+
+
+def _seed():
+    return random.getrandbits(48)
+
+
+def _generation(namespace):
+    generation = cache.get(_generation_key(namespace))
+    if generation is None:
+        seed = _seed()
+        cache.add(_generation_key(namespace), seed, timeout=None)
+        generation = cache.get(_generation_key(namespace), seed)
+    return generation
+
+
+def make_key(namespace, *parts, versioned=True):
+    key = ':'.join(str(part) for part in parts)
+    if versioned:
+        return f'{namespace}:{_generation(namespace)}:{key}'
+    return f'{namespace}:{key}'
+
+
+def get_or_set(namespace, parts, builder, timeout=None, versioned=True):
+    """
+    Return the cached value for ``parts`` in ``namespace``, building it on a miss.
+
+    ``timeout`` falls back to the backend's default TTL. Size-based eviction
+    is left to the backend (MAX_ENTRIES for local memory and files,
+    maxmemory for Redis).
+    """
+    key = make_key(namespace, *parts, versioned=versioned)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, 'hits')
+        return value
+
+    _count(namespace, 'misses')
+    value = builder()
+    if timeout is None:
+        cache.set(key, value)
+    else:
+        cache.set(key, value, timeout)
+    return value
+
+
+def invalidate(namespace):
+    """Drop every entry of ``namespace`` once the current transaction commits."""
+    def bump():
+        try:
+            cache.incr(_generation_key(namespace))
+        except ValueError:
+            cache.set(_generation_key(namespace), _seed(), timeout=None)
+        _count(namespace, 'invalidations')
+    transaction.on_commit(bump)
+
+
+def delete(namespace, *parts):
+    """Drop a single unversioned entry once the current transaction commits."""
+    def drop():
+        cache.delete(make_key(namespace, *parts, versioned=False))
+        _count(namespace, 'invalidations')
+    transaction.on_commit(drop)
+
+
+def user_stats_namespace(user_id):
+    return f'{USER_STATS}:{user_id}'
+
+
+def stats():
+    """Hit/miss counters of this process, per namespace."""
+    with _counters_lock:
+        snapshot = {namespace: dict(counts) for namespace, counts in _counters.items()}
+
+    # Per-user namespaces are summed so the report stays small
+    summary = {}
+    for namespace, counts in snapshot.items():
+        name = USER_STATS if namespace.startswith(f'{USER_STATS}:') else namespace
+        totals = summary.setdefault(name, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        for event, value in counts.items():
+            totals[event] += value
+    for totals in summary.values():
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_ratio'] = round(totals['hits'] / lookups, 4) if lookups else None
+    return summary
@@ -0,0 +1,170 @@
+# qso_logger/cache_backends.py
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache.backends.redis import RedisCache, RedisCacheClient, RedisSerializer
+from django.utils.module_loading import import_string
+
+# CACHE_BACKEND=localredis runs Django's Redis cache backend against an
+# in-process stand-in for the server, so the tests and a development setup
+# exercise the Redis code paths (SET NX, INCR on a missing key, ...) without
+# a Redis server or the redis package. Each LOCATION is one server, shared by
+# the threads of a process and lost when it exits.
+
+
+class LocalRedis:
+    """The subset of the redis-py client that Django's Redis cache backend calls."""
+
+    def __init__(self, max_keys=None):
+        # Keys in least recently used order, as {key: (value, expires at or None)}
+        self.data = OrderedDict()
+        # Like maxmemory with allkeys-lru: writes past max_keys evict old keys
+        self.max_keys = max_keys
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _encode(value):
+        # redis-py sends numbers as their decimal digits
+        if isinstance(value, int):
+            return str(value).encode()
+        return value
+
+    def _lookup(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, expires):
+        self.data[key] = (self._encode(value), expires)
+        self.data.move_to_end(key)
+        while self.max_keys is not None and len(self.data) > self.max_keys:
+            self.data.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            entry = self._lookup(key)
+            return None if entry is None else entry[0]
+
+    def mget(self, keys):
+        with self.lock:
+            return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self.lock:
+            if nx and self._lookup(key) is not None:
+                return None
+            self._store(key, value, None if ex is None else time.monotonic() + ex)
+            return True
+
+    def mset(self, mapping):
+        with self.lock:
+            for key, value in mapping.items():
+                self._store(key, value, None)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def exists(self, *keys):
+        with self.lock:
+            return sum(self._lookup(key) is not None for key in keys)
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            entry = self._lookup(key)
+            value, expires = entry if entry is not None else (b'0', None)
+            try:
+                value = int(value) + amount
+            except ValueError:
+                raise ValueError('value is not an integer or out of range') from None
+            self._store(key, value, expires)
+            return value
+
+    def expire(self, key, seconds):
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return False
+            self.data[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def persist(self, key):
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is None or entry[1] is None:
+                return False
+            self.data[key] = (entry[0], None)
+            return True
+
+    def flushdb(self):
+        with self.lock:
+            self.data.clear()
+            return True
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Queues commands and runs them under the server lock on execute()."""
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.server, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self.server.lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def local_server(location, max_keys=None):
+    """The stand-in server at ``location``, created on first use."""
+    with _servers_lock:
+        if location not in _servers:
+            _servers[location] = LocalRedis(max_keys)
+        return _servers[location]
+
+
+class LocalRedisCacheClient(RedisCacheClient):
+    def __init__(self, servers, serializer=None, max_keys=None, **options):
+        # The parent would import redis and build connection pools
+        self._servers = servers
+        if isinstance(serializer, str):
+            serializer = import_string(serializer)
+        if callable(serializer):
+            serializer = serializer()
+        self._serializer = serializer or RedisSerializer()
+        self._max_keys = max_keys
+
+    def get_client(self, key=None, *, write=False):
+        return local_server(self._servers[0], self._max_keys)
+
+
+class LocalRedisCache(RedisCache):
+    """Django's Redis cache backend talking to a LocalRedis stand-in; OPTIONS may set MAX_KEYS."""
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._class = LocalRedisCacheClient
+        options = dict(self._options)
+        if 'MAX_KEYS' in options:
+            options['max_keys'] = options.pop('MAX_KEYS')
+        self._options = options
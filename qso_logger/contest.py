@@ -0,0 +1,219 @@
+# qso_logger/contest.py
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .batch import create_batch
+from .matching import MATCH_WINDOW
+from .models import DUPLICATE_WINDOW_MESSAGE, ContestEntry, ContestSession, QSOContact
+
+logger = logging.getLogger(__name__)
+
+# Contest sessions accept QSOs without writing to the log: a dupe check and
+# one INSERT into the ContestEntry staging table. The dupe check is one
+# indexed lookup of the operator's logged and staged QSOs around the new
+# ones, under a lock on the session row, so dupes staged through another
+# process are refused at once rather than at flush. The staged entries are
+# written to QSOContact and matched in batches (flush()), when a process has
+# staged CONTEST_FLUSH_SIZE of them or the oldest is CONTEST_FLUSH_SECONDS
+# old, when the session closes, and by the match worker. Staged rows are
+# durable, so a restarted or killed process loses nothing.
+
+ENTRY_FIELDS = ('recipient', 'frequency', 'mode', 'datetime', 'initiator_location', 'recipient_location')
+
+
+class DupeSheet:
+    """
+    The calls a session's operator worked, as {call sign: sorted datetimes}.
+
+    A dupe check is a dict lookup and a bisect over the few times one call
+    was worked. The window applies in both directions, as the PostgreSQL
+    exclusion constraint does. Each stage() merges what the database holds
+    around its QSOs, so the sheet also knows what other processes logged.
+    """
+
+    def __init__(self):
+        self.worked = {}
+        self.lock = threading.Lock()
+        # Entries this process staged since its last flush of the session
+        self.staged = 0
+        self.staged_at = None
+
+    def is_dupe(self, recipient, moment):
+        moments = self.worked.get(recipient, ())
+        position = bisect_left(moments, moment - MATCH_WINDOW)
+        return position < len(moments) and moments[position] <= moment + MATCH_WINDOW
+
+    def add(self, recipient, moment):
+        moments = self.worked.setdefault(recipient, [])
+        position = bisect_left(moments, moment)
+        if position == len(moments) or moments[position] != moment:
+            moments.insert(position, moment)
+
+
+# Sheets of the sessions this process served, least recently used first
+_sheets = OrderedDict()
+_sheets_lock = threading.Lock()
+
+
+def _sheet(session):
+    with _sheets_lock:
+        sheet = _sheets.setdefault(session.pk, DupeSheet())
+        _sheets.move_to_end(session.pk)
+        while len(_sheets) > settings.CONTEST_SHEETS_MAX:
+            _sheets.popitem(last=False)
+    return sheet
+
+
+def _forget(session_id):
+    with _sheets_lock:
+        _sheets.pop(session_id, None)
+
+
+def _logged_near(session, entries):
+    # One query over the (initiator, recipient, datetime) index and the
+    # staged rows: the operator's QSOs with these calls around these times
+    moments = [data['datetime'] for _, data in entries]
+    window = (min(moments) - MATCH_WINDOW, max(moments) + MATCH_WINDOW)
+    recipients = {data['recipient'] for _, data in entries}
+    logged = QSOContact.objects.filter(
+        initiator_id=session.operator_id, recipient__in=recipients, datetime__range=window,
+    ).values_list('recipient', 'datetime')
+    staged = ContestEntry.objects.filter(
+        session__operator_id=session.operator_id, error='', recipient__in=recipients, datetime__range=window,
+    ).values_list('recipient', 'datetime')
+    return logged.union(staged, all=True)
+
+
+def stage(session, entries):
+    """
+    Accept validated QSOs into an open ``session``.
+
+    ``entries`` is a list of (key, validated_data) tuples. Dupes of logged,
+    staged or earlier entries of the list are refused; the rest are staged
+    with one bulk INSERT and may trigger a flush. Returns {key: ContestEntry
+    or error dict}.
+    """
+    results = {}
+    if not entries:
+        return results
+
+    sheet = _sheet(session)
+    now = timezone.now()
+    with transaction.atomic(), sheet.lock:
+        staged = []
+        try:
+            # Stagers of one session queue here, in every process, so the
+            # lookup below also sees what the others staged just before
+            list(ContestSession.objects.select_for_update().filter(pk=session.pk).values_list('pk'))
+            for recipient, moment in _logged_near(session, entries):
+                sheet.add(recipient, moment)
+            for key, data in entries:
+                if sheet.is_dupe(data['recipient'], data['datetime']):
+                    results[key] = {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]}
+                    continue
+                sheet.add(data['recipient'], data['datetime'])
+                staged.append((key, ContestEntry(session=session, created_at=now, **data)))
+            ContestEntry.objects.bulk_create([entry for _, entry in staged])
+        except Exception:
+            # The sheet may now list entries that were never staged; start afresh next time
+            _forget(session.pk)
+            raise
+        sheet.staged += len(staged)
+        if staged and sheet.staged_at is None:
+            sheet.staged_at = now
+        due = sheet.staged >= settings.CONTEST_FLUSH_SIZE or (
+            sheet.staged_at is not None
+            and now - sheet.staged_at >= timedelta(seconds=settings.CONTEST_FLUSH_SECONDS)
+        )
+
+    results.update(staged)
+    if due:
+        try:
+            flush(session)
+        except Exception:
+            # The entries stay staged for the next flush
+            logger.exception('Flushing contest session %s failed', session.pk)
+    return results
+
+
+def flush(session):
+    """
+    Write the staged entries of ``session`` to the log and match them.
+
+    Flushes of one session are serialized by locking its row. Entries the log
+    rejects, e.g. a dupe staged by another process, keep the error on their
+    staged row; the others are deleted. Returns the number of QSOs written.
+    """
+    with transaction.atomic():
+        session = ContestSession.objects.select_for_update(of=('self',)).select_related('operator').get(pk=session.pk)
+        entries = list(ContestEntry.objects.filter(session=session, error='').order_by('datetime', 'id'))
+        written = 0
+        if entries:
+            results = create_batch(session.operator, [
+                (entry.pk, {field: getattr(entry, field) for field in ENTRY_FIELDS}) for entry in entries
+            ])
+            rejected = []
+            for entry in entries:
+                outcome = results[entry.pk]
+                if isinstance(outcome, QSOContact):
+                    written += 1
+                else:
+                    entry.error = ' '.join(str(message) for messages in outcome.values() for message in messages)
+                    rejected.append(entry)
+            ContestEntry.objects.filter(pk__in=[entry.pk for entry in entries if not entry.error]).delete()
+            ContestEntry.objects.bulk_update(rejected, ['error'])
+            ContestSession.objects.filter(pk=session.pk).update(logged_contacts=F('logged_contacts') + written)
+            if rejected:
+                logger.warning('Contest session %s: %d staged QSOs rejected by the log', session.pk, len(rejected))
+
+    sheet = _sheets.get(session.pk)
+    if sheet is not None:
+        with sheet.lock:
+            sheet.staged = 0
+            sheet.staged_at = None
+    return written
+
+
+def close(session):
+    """Close ``session`` and write everything it staged to the log. Returns the QSOs written."""
+    ContestSession.objects.filter(pk=session.pk, closed_at__isnull=True).update(closed_at=timezone.now())
+    try:
+        return flush(session)
+    finally:
+        _forget(session.pk)
+
+
+def flush_due():
+    """Flush every session whose oldest staged entry is CONTEST_FLUSH_SECONDS old. Returns the QSOs written."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CONTEST_FLUSH_SECONDS)
+    session_ids = set(
+        ContestEntry.objects.filter(error='', created_at__lte=cutoff).values_list('session', flat=True)
+    )
+    written = 0
+    for session in ContestSession.objects.filter(pk__in=session_ids):
+        try:
+            written += flush(session)
+        except Exception:
+            logger.exception('Flushing contest session %s failed', session.pk)
+    return written
+
+
+@atexit.register
+def _flush_on_exit():
+    # A process stopping gracefully writes what it staged; after a crash the
+    # staged rows wait for the match worker or the next flush of the session
+    with _sheets_lock:
+        pending = [session_id for session_id, sheet in _sheets.items() if sheet.staged]
+    for session_id in pending:
+        try:
+            flush(ContestSession(pk=session_id))
+        except Exception:
+            logger.exception('Flushing contest session %s on exit failed', session_id)
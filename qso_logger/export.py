@@ -0,0 +1,85 @@
+# qso_logger/export.py
+import csv
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from .adif import adif_header, adif_record
+from .renderers import dumps
+
+EXPORT_FIELDS = (
+    'id', 'recipient', 'frequency', 'band', 'mode', 'datetime',
+    'initiator_location', 'recipient_location', 'confirmed', 'distance_km',
+)
+CHUNK_SIZE = 2000
+
+
+def format_datetime(value):
+    # Same representation DRF's DateTimeField produces for the API
+    value = value.astimezone(dt_timezone.utc).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_frequency(value):
+    return str(value.quantize(Decimal('0.001')))
+
+
+def export_rows(queryset):
+    """Stream a QSO queryset as plain dicts through a server-side cursor."""
+    return queryset.order_by('datetime', 'id').values(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def adif_lines(rows, user):
+    yield adif_header().encode('utf-8')
+    for row in rows:
+        yield adif_record(row, user.call_sign).encode('utf-8')
+
+
+class _Echo:
+    """Pseudo-buffer handing each CSV line straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, user):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS).encode('utf-8')
+    for row in rows:
+        yield writer.writerow((
+            row['id'], row['recipient'], format_frequency(row['frequency']), row['band'], row['mode'],
+            format_datetime(row['datetime']), row['initiator_location'],
+            row['recipient_location'], row['confirmed'], row['distance_km'],
+        )).encode('utf-8')
+
+
+def api_row(row, user):
+    """A ``.values(*EXPORT_FIELDS)`` row shaped exactly like QSOContactSerializer output."""
+    return {
+        'id': row['id'],
+        'initiator': user.pk,
+        'initiator_callsign': user.call_sign,
+        'recipient': row['recipient'],
+        'frequency': format_frequency(row['frequency']),
+        'mode': row['mode'],
+        'datetime': format_datetime(row['datetime']),
+        'initiator_location': row['initiator_location'],
+        'recipient_location': row['recipient_location'],
+        'confirmed': row['confirmed'],
+        'band': row['band'],
+        'distance_km': row['distance_km'],
+    }
+
+
+def ndjson_lines(rows, user):
+    # One object per line, serialised exactly as /api/qsos/ serialises it
+    for row in rows:
+        yield dumps(api_row(row, user)) + b'\n'
+
+
+# Writers of each export format, yielding the body as UTF-8 encoded lines
+LINE_WRITERS = {
+    'adif': (adif_lines, 'adi'),
+    'csv': (csv_lines, 'csv'),
+    'ndjson': (ndjson_lines, 'ndjson'),
+}
@@ -0,0 +1,103 @@
+# qso_logger/filters.py
+import re
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from .bands import BANDS
+
+CALL_SIGN_PREFIX = re.compile(r'^[A-Z0-9]{1,10}$')
+
+
+def parse_iso_moment(value):
+    """Parse an ISO date or datetime, treating naive values as UTC; ValueError if it is neither."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, datetime.min.time()) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError(f'Invalid date or datetime: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def parse_moment(value, param):
+    try:
+        return parse_iso_moment(value)
+    except ValueError:
+        raise serializers.ValidationError({param: 'Expected an ISO 8601 date or datetime'})
+
+
+def parse_flag(value, param):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise serializers.ValidationError({param: 'Expected true or false'})
+
+
+def filter_time_range(queryset, params):
+    """Apply ?since= (inclusive) and ?until= (exclusive) to a QSO queryset."""
+    if params.get('since'):
+        queryset = queryset.filter(datetime__gte=parse_moment(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(datetime__lt=parse_moment(params['until'], 'until'))
+    return queryset
+
+
+def filter_day_range(queryset, params):
+    """Apply ?since= (inclusive) and ?until= (exclusive) to a queryset with a ``day`` column."""
+    if params.get('since'):
+        queryset = queryset.filter(day__gte=parse_moment(params['since'], 'since').date())
+    if params.get('until'):
+        queryset = queryset.filter(day__lt=parse_moment(params['until'], 'until').date())
+    return queryset
+
+
+def parse_band(value, param='band'):
+    if value not in BANDS:
+        raise serializers.ValidationError({param: f"Unknown band, expected one of: {', '.join(BANDS)}"})
+    return value
+
+
+def filter_band(queryset, params):
+    """Apply ?band= (a name from the band plan) to a QSO queryset."""
+    if not params.get('band'):
+        return queryset
+    return queryset.filter(band=parse_band(params['band']))
+
+
+def parse_frequency(value, param):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise serializers.ValidationError({param: 'Expected a frequency in MHz'})
+
+
+def filter_qsos(queryset, params):
+    """
+    Apply the /api/qsos/ list filters to a station's QSOs.
+
+    Each filter has an index leading with ``initiator`` (see QSOContact.Meta),
+    so any combination stays a range scan over the station's own rows.
+    """
+    queryset = filter_band(filter_time_range(queryset, params), params)
+    if params.get('recipient'):
+        prefix = params['recipient'].upper()
+        if not CALL_SIGN_PREFIX.match(prefix):
+            raise serializers.ValidationError({'recipient': 'Expected a call sign prefix'})
+        queryset = queryset.filter(recipient__startswith=prefix)
+    if params.get('mode'):
+        queryset = queryset.filter(mode=params['mode'].upper())
+    if params.get('freq_min'):
+        queryset = queryset.filter(frequency__gte=parse_frequency(params['freq_min'], 'freq_min'))
+    if params.get('freq_max'):
+        queryset = queryset.filter(frequency__lte=parse_frequency(params['freq_max'], 'freq_max'))
+    if params.get('confirmed'):
+        queryset = queryset.filter(confirmed=parse_flag(params['confirmed'], 'confirmed'))
+    return queryset
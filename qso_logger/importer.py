@@ -0,0 +1,278 @@
+# qso_logger/importer.py
+import csv
+import io
+import os
+import time
+from collections import Counter
+from itertools import islice
+from django.db import connection, transaction
+from .adif import iter_adif, iter_csv, normalize_record
+from .batch import create_batch, match_batch
+from .maidenhead import distance_km
+from .matching import MATCH_WINDOW
+from .models import QSOContact
+from .bands import band_for_frequency
+from .stats import record_created
+
+STAGING_COLUMNS = (
+    'line', 'recipient', 'frequency', 'band', 'mode', 'datetime',
+    'initiator_location', 'recipient_location', 'distance_km',
+)
+MATCH_BATCH = 2000  # QSOs per match_batch() call after an import
+
+
+class ImportReport:
+    """Counts what happened to every record of an import, plus a sample of rejections."""
+
+    def __init__(self, max_rejections=100):
+        self.read = 0
+        self.inserted = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.self_qsos = 0
+        self.rejections = []
+        self.max_rejections = max_rejections
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def reject(self, record_number, reason):
+        self.invalid += 1
+        if len(self.rejections) < self.max_rejections:
+            self.rejections.append({'record': record_number, 'reason': reason})
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else float(self.read)
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'inserted': self.inserted,
+            'invalid': self.invalid,
+            'duplicates': self.duplicates,
+            'self_qsos': self.self_qsos,
+            'seconds': round(self.elapsed, 3),
+            'records_per_second': round(self.rate, 1),
+            'rejections': self.rejections,
+        }
+
+
+class _CSVStream:
+    """File-like object that renders rows as CSV on demand for COPY ... FROM STDIN."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = ''
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out)
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self._out.seek(0)
+            self._out.truncate()
+            self._writer.writerow(row)
+            self._buffer += self._out.getvalue()
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def guess_format(filename):
+    """Pick the parser from a file name: .csv is CSV, anything else is ADIF."""
+    return 'csv' if os.path.splitext(filename)[1].lower() == '.csv' else 'adif'
+
+
+def import_log(user, stream, file_format='adif', batch_size=2000, report=None):
+    """
+    Load an ADIF or CSV log from a text ``stream`` into ``user``'s QSOs.
+
+    Records are parsed and normalised one at a time. On PostgreSQL they are
+    streamed into a temporary staging table with COPY; self-QSOs and
+    duplicates inside the one-hour window are deleted there, and the rest is
+    merged into QSOContact by one INSERT ... SELECT. Other databases fall
+    back to batched inserts.
+    Newly loaded QSOs are then matched against the other stations' logs.
+    """
+    report = report or ImportReport()
+    records = iter_adif(stream) if file_format == 'adif' else iter_csv(stream)
+
+    def normalized():
+        for number, record in enumerate(records, 1):
+            report.read += 1
+            try:
+                yield number, normalize_record(record)
+            except ValueError as e:
+                report.reject(number, str(e))
+
+    if connection.vendor == 'postgresql':
+        _copy_and_merge(user, normalized(), report)
+    else:
+        _insert_batches(user, normalized(), report, batch_size)
+    report.finish()
+    return report
+
+
+def _distance_km(locator_a, locator_b):
+    # The grid format check admits locators such as JO91ZZ that are off the
+    # map; they are stored without a distance, as QSOContact.save() does
+    try:
+        return distance_km(locator_a, locator_b)
+    except ValueError:
+        return None
+
+
+def _copy_and_merge(user, entries, report):
+    table = QSOContact._meta.db_table
+    rows = (
+        (number, data['recipient'], data['frequency'], band_for_frequency(data['frequency']),
+         data['mode'], data['datetime'].isoformat(),
+         data['initiator_location'], data['recipient_location'],
+         _distance_km(data['initiator_location'], data['recipient_location']))
+        for number, data in entries
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMPORARY TABLE qso_import_staging (
+                line integer,
+                recipient varchar(10),
+                frequency numeric(10, 3),
+                band varchar(8),
+                mode varchar(10),
+                datetime timestamp with time zone,
+                initiator_location varchar(6),
+                recipient_location varchar(6),
+                distance_km double precision
+            ) ON COMMIT DROP
+        """)
+        # csv.writer leaves empty strings unquoted, which COPY reads as NULL;
+        # a frequency outside the band plan has the band '', not NULL
+        cursor.copy_expert(
+            f"COPY qso_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NOT_NULL (band))",
+            _CSVStream(rows),
+        )
+
+        cursor.execute("""
+            SELECT count(*), count(*) FILTER (WHERE recipient = %s), min(datetime), max(datetime)
+            FROM qso_import_staging
+        """, [user.call_sign])
+        staged, self_qsos, first, last = cursor.fetchone()
+
+        # Drop self-QSOs and rows within an hour of a QSO already in the log
+        cursor.execute(f"""
+            DELETE FROM qso_import_staging s
+            WHERE s.recipient = %(call_sign)s
+               OR EXISTS (
+                SELECT 1 FROM {table} q
+                WHERE q.initiator_id = %(user_id)s
+                  AND q.recipient = s.recipient
+                  AND q.datetime BETWEEN s.datetime - interval '1 hour'
+                                     AND s.datetime + interval '1 hour'
+               )
+        """, {'user_id': user.pk, 'call_sign': user.call_sign})
+
+        # Of the remaining rows with the same station, keep the earliest and
+        # every later one that comes more than an hour after the last kept
+        # one. The recursive query walks from kept row to kept row over the
+        # (recipient, datetime) index, so the rows never leave the server.
+        cursor.execute("CREATE INDEX ON qso_import_staging (recipient, datetime, line)")
+        cursor.execute("ANALYZE qso_import_staging")
+        cursor.execute("""
+            WITH RECURSIVE kept AS (
+                SELECT * FROM (
+                    SELECT DISTINCT ON (recipient) line, recipient, datetime
+                    FROM qso_import_staging
+                    ORDER BY recipient, datetime, line
+                ) first_rows
+                UNION ALL
+                SELECT following.line, following.recipient, following.datetime
+                FROM kept
+                CROSS JOIN LATERAL (
+                    SELECT s.line, s.recipient, s.datetime
+                    FROM qso_import_staging s
+                    WHERE s.recipient = kept.recipient
+                      AND s.datetime > kept.datetime + %(window)s
+                    ORDER BY s.datetime, s.line
+                    LIMIT 1
+                ) following
+            )
+            DELETE FROM qso_import_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM kept WHERE kept.line = s.line)
+        """, {'window': MATCH_WINDOW})
+
+        # The inserted rows come back grouped the way the daily rollups count them
+        cursor.execute(f"""
+            WITH inserted AS (
+                INSERT INTO {table} (
+                    initiator_id, recipient, frequency, band, mode, datetime,
+                    initiator_location, recipient_location, distance_km, confirmed,
+                    created_at, updated_at
+                )
+                SELECT %(user_id)s, recipient, frequency, band, mode, datetime,
+                       initiator_location, recipient_location, distance_km, false,
+                       now(), now()
+                FROM qso_import_staging
+                -- Rows logged concurrently by another request hit the exclusion constraint
+                ON CONFLICT DO NOTHING
+                RETURNING datetime, band, mode
+            )
+            SELECT (datetime AT TIME ZONE 'UTC')::date, band, mode, count(*)
+            FROM inserted
+            GROUP BY 1, 2, 3
+        """, {'user_id': user.pk})
+        created = Counter()
+        for day, band, mode, count in cursor.fetchall():
+            created[(user.pk, day, band, mode)] += count
+        inserted = sum(created.values())
+
+        report.inserted += inserted
+        report.self_qsos += self_qsos
+        report.duplicates += staged - self_qsos - inserted
+        if inserted:
+            record_created(created.elements())
+
+    if inserted:
+        _match_range(user, first, last)
+
+
+def _match_range(user, first, last):
+    """Match the user's unconfirmed QSOs in [first, last], read by one range query, MATCH_BATCH at a time."""
+    qsos = QSOContact.objects.filter(
+        initiator=user,
+        confirmed=False,
+        datetime__range=(first, last),
+    ).order_by('datetime', 'id').iterator(chunk_size=MATCH_BATCH)
+    while batch := list(islice(qsos, MATCH_BATCH)):
+        match_batch(user, batch)
+
+
+def _insert_batches(user, entries, report, batch_size):
+    batch = []
+
+    def flush():
+        results = create_batch(user, batch)
+        for outcome in results.values():
+            if isinstance(outcome, QSOContact):
+                report.inserted += 1
+            else:
+                report.duplicates += 1
+        batch.clear()
+
+    for number, data in entries:
+        if data['recipient'] == user.call_sign:
+            report.self_qsos += 1
+            continue
+        batch.append((number, data))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
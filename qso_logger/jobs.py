@@ -0,0 +1,85 @@
+# qso_logger/jobs.py
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from .batch import match_batch
+from .models import MatchJob, QSOContact
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_match(qso):
+    """Queue ``qso`` for the match worker."""
+    return MatchJob.objects.create(qso=qso)
+
+
+def _retry(job, error, now):
+    # Exponential backoff; after the last attempt the job is kept for inspection
+    job.attempts += 1
+    job.last_error = f'{type(error).__name__}: {error}'
+    if job.attempts >= settings.MATCH_JOB_MAX_ATTEMPTS:
+        job.failed_at = now
+    else:
+        job.run_after = now + timedelta(seconds=settings.MATCH_JOB_RETRY_SECONDS * 2 ** (job.attempts - 1))
+
+
+def process_batch(batch_size=None):
+    """
+    Claim up to ``batch_size`` due jobs and match their QSOs. Returns the job count.
+
+    Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers never pick the same job, and stay locked until the batch
+    commits; a worker that dies mid-batch leaves its jobs to the others.
+    The QSOs of each station are matched together with ``match_batch``, in
+    a savepoint, so one station's failure only retries that station's jobs.
+    """
+    batch_size = batch_size or settings.MATCH_JOB_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            MatchJob.objects.select_for_update(skip_locked=True)
+            .filter(failed_at__isnull=True, run_after__lte=now)
+            .order_by('run_after', 'id')[:batch_size]
+        )
+        if not jobs:
+            return 0
+
+        qsos = QSOContact.objects.select_related('initiator').in_bulk([job.qso_id for job in jobs])
+        per_station = {}
+        for job in jobs:
+            per_station.setdefault(qsos[job.qso_id].initiator_id, []).append(job)
+
+        done, retried = [], []
+        for station_jobs in per_station.values():
+            # A partner's job may already have confirmed some of these
+            pending = [qsos[job.qso_id] for job in station_jobs if not qsos[job.qso_id].confirmed]
+            try:
+                with transaction.atomic():
+                    if pending:
+                        match_batch(pending[0].initiator, pending)
+            except Exception as e:
+                logger.exception('Matching QSOs %s failed', [job.qso_id for job in station_jobs])
+                for job in station_jobs:
+                    _retry(job, e, now)
+                retried.extend(station_jobs)
+            else:
+                done.extend(job.pk for job in station_jobs)
+
+        MatchJob.objects.filter(pk__in=done).delete()
+        MatchJob.objects.bulk_update(retried, ['attempts', 'last_error', 'run_after', 'failed_at'])
+    return len(jobs)
+
+
+def queue_stats():
+    """Pending and failed job counts, and the age in seconds of the oldest pending job."""
+    stats = MatchJob.objects.aggregate(
+        pending=Count('id', filter=Q(failed_at__isnull=True)),
+        failed=Count('id', filter=Q(failed_at__isnull=False)),
+        oldest=Min('created_at', filter=Q(failed_at__isnull=True)),
+    )
+    oldest = stats.pop('oldest')
+    stats['lag_seconds'] = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    return stats
@@ -0,0 +1,88 @@
+# qso_logger/maidenhead.py
+import math
+import re
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LOCATOR_RE = re.compile(r'^[A-R]{2}([0-9]{2}([A-X]{2}([0-9]{2})?)?)?$')
+
+# Size in degrees (longitude, latitude) of a field, square, subsquare and extended square
+PAIR_SIZES = ((20.0, 10.0), (2.0, 1.0), (2.0 / 24, 1.0 / 24), (2.0 / 240, 1.0 / 240))
+
+
+def to_latlon(locator):
+    """Return the (lat, lon) centre of a 2, 4, 6 or 8 character Maidenhead locator."""
+    locator = locator.strip().upper()
+    if not LOCATOR_RE.match(locator):
+        raise ValueError(f'Invalid Maidenhead locator: {locator}')
+
+    lon, lat = -180.0, -90.0
+    for index in range(len(locator) // 2):
+        lon_char, lat_char = locator[index * 2], locator[index * 2 + 1]
+        # Letters encode fields and subsquares, digits squares and extended squares
+        base = ord('A') if index % 2 == 0 else ord('0')
+        lon_size, lat_size = PAIR_SIZES[index]
+        lon += (ord(lon_char) - base) * lon_size
+        lat += (ord(lat_char) - base) * lat_size
+    lon_size, lat_size = PAIR_SIZES[len(locator) // 2 - 1]
+    return lat + lat_size / 2, lon + lon_size / 2
+
+
+def distance_km(locator_a, locator_b):
+    """Great-circle distance between the centres of two locators."""
+    lat1, lon1 = map(math.radians, to_latlon(locator_a))
+    lat2, lon2 = map(math.radians, to_latlon(locator_b))
+    h = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def bearing(locator_a, locator_b):
+    """Initial great-circle bearing in degrees (0-360) from ``locator_a`` to ``locator_b``."""
+    lat1, lon1 = map(math.radians, to_latlon(locator_a))
+    lat2, lon2 = map(math.radians, to_latlon(locator_b))
+    y = math.sin(lon2 - lon1) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+# Allowed characters of each position of a 6-character locator, as in LOCATOR_RE
+LOCATOR_RANGES = (('A', 'R'), ('A', 'R'), ('0', '9'), ('0', '9'), ('A', 'X'), ('A', 'X'))
+
+
+def to_latlon_array(locators):
+    """
+    Vectorised ``to_latlon`` for 6-character locators, as stored on QSOContact.
+
+    Returns two float arrays (lat, lon) in degrees, NaN where a locator is
+    not a valid 6-character locator.
+    """
+    codes = np.array(locators, dtype='S6').view(np.uint8).reshape(-1, 6)
+    valid = np.ones(len(codes), dtype=bool)
+    for position, (low, high) in enumerate(LOCATOR_RANGES):
+        valid &= (codes[:, position] >= ord(low)) & (codes[:, position] <= ord(high))
+    chars = codes.astype(np.float64)
+    lon = (-180.0 + (chars[:, 0] - ord('A')) * 20.0 + (chars[:, 2] - ord('0')) * 2.0
+           + (chars[:, 4] - ord('A')) * (2.0 / 24) + 1.0 / 24)
+    lat = (-90.0 + (chars[:, 1] - ord('A')) * 10.0 + (chars[:, 3] - ord('0')) * 1.0
+           + (chars[:, 5] - ord('A')) * (1.0 / 24) + 0.5 / 24)
+    lat[~valid] = np.nan
+    lon[~valid] = np.nan
+    return lat, lon
+
+
+def distances_km(locators_a, locators_b):
+    """Great-circle distances for two equally long sequences of 6-character locators; NaN if either is invalid."""
+    lat1, lon1 = map(np.radians, to_latlon_array(locators_a))
+    lat2, lon2 = map(np.radians, to_latlon_array(locators_b))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(h)))
+
+
+def bearings(locators_a, locators_b):
+    """Initial bearings in degrees for two equally long sequences of 6-character locators."""
+    lat1, lon1 = map(np.radians, to_latlon_array(locators_a))
+    lat2, lon2 = map(np.radians, to_latlon_array(locators_b))
+    y = np.sin(lon2 - lon1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.degrees(np.arctan2(y, x)) % 360
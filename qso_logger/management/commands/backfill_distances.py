@@ -0,0 +1,45 @@
+import math
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from qso_logger.maidenhead import distances_km
+from qso_logger.models import QSOContact
+
+class Command(BaseCommand):
+    help = 'Computes distance_km for QSOs that do not have it yet, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of QSOs computed and updated per chunk (default: 5000)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started = time.monotonic()
+        updated = 0
+        invalid = 0
+        last_id = 0
+        while True:
+            # Walk the primary key so every chunk is an index range scan
+            rows = list(
+                QSOContact.objects.filter(pk__gt=last_id, distance_km__isnull=True)
+                .order_by('pk')
+                .values_list('pk', 'initiator_location', 'recipient_location')[:chunk_size]
+            )
+            if not rows:
+                break
+            ids, initiator_locations, recipient_locations = zip(*rows)
+            distances = distances_km(initiator_locations, recipient_locations)
+            now = timezone.now()
+            # Invalid locators come back as NaN and keep a NULL distance
+            qsos = [QSOContact(pk=pk, distance_km=float(distance), updated_at=now)
+                    for pk, distance in zip(ids, distances) if not math.isnan(distance)]
+            QSOContact.objects.bulk_update(qsos, ['distance_km', 'updated_at'])
+            updated += len(qsos)
+            invalid += len(ids) - len(qsos)
+            last_id = ids[-1]
+            self.stdout.write(f'{updated} QSOs updated...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed distances for {updated} QSOs in {time.monotonic() - started:.1f}s; '
+            f'{invalid} QSOs have invalid locators'
+        ))
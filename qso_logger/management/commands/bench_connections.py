@@ -0,0 +1,98 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Measures the database connection overhead of a request: runs the request cycle with one '
+            'small query, opening a connection per request and with persistent connections, and prints '
+            'the results as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per configuration (default: 500)')
+        parser.add_argument('--max-age', type=int,
+                            help='CONN_MAX_AGE of the persistent runs (default: the configured value, or 60)')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        if connection.in_atomic_block:
+            raise CommandError('Cannot measure connections inside a transaction')
+        max_age = options['max_age'] or connection.settings_dict['CONN_MAX_AGE'] or 60
+
+        configurations = [
+            ('per_request', 0, False),
+            ('persistent', max_age, False),
+            ('persistent_health_checks', max_age, True),
+        ]
+        original = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        results = []
+        try:
+            for name, conn_max_age, health_checks in configurations:
+                # Both settings are read when a connection opens
+                connection.close()
+                connection.settings_dict.update(CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=health_checks)
+                results.append(self._measure(name, conn_max_age, health_checks, options['requests']))
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+
+        report = json.dumps({
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'host': connection.settings_dict['HOST'],
+                'requests': options['requests'],
+                'statement_timeout': connection.settings_dict['OPTIONS'].get('options', ''),
+                'server_side_cursors': not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS', False),
+            },
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        else:
+            self.stdout.write(report)
+
+    def _measure(self, name, conn_max_age, health_checks, requests):
+        opened = 0
+
+        def count(sender, **kwargs):
+            nonlocal opened
+            opened += 1
+
+        timings = []
+        connection_created.connect(count)
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # The signals a request sends; both run close_old_connections()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count)
+
+        timings.sort()
+        return {
+            'configuration': name,
+            'conn_max_age': conn_max_age,
+            'health_checks': health_checks,
+            'connections_opened': opened,
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+            'total_ms': round(sum(timings), 3),
+        }
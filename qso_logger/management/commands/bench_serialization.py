@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from qso_logger.export import EXPORT_FIELDS, api_row
+from qso_logger.models import QSOContact, User
+from qso_logger.renderers import ORJSONRenderer
+from qso_logger.serializers import QSOContactSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares ModelSerializer + JSONRenderer with the values() + orjson list fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of QSOs in the benchmark log (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per path; the fastest is reported (default: 5)')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be positive')
+
+        # The benchmark log only lives inside this transaction
+        with transaction.atomic():
+            user = self._create_log(options['rows'])
+            queryset = QSOContact.objects.filter(initiator=user).order_by('-datetime', '-id')
+
+            def serializer_path():
+                data = QSOContactSerializer(queryset.select_related('initiator'), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast_path():
+                data = [api_row(row, user) for row in queryset.values(*EXPORT_FIELDS)]
+                return ORJSONRenderer().render(data)
+
+            slow_body, slow_time = self._time(serializer_path, options['repeat'])
+            fast_body, fast_time = self._time(fast_path, options['repeat'])
+            transaction.set_rollback(True)
+
+        if slow_body != fast_body:
+            raise CommandError('The fast path output differs from the serializer output')
+
+        self.stdout.write(f'{options["rows"]} rows, {len(fast_body)} bytes of JSON (identical output)')
+        self.stdout.write(f'  ModelSerializer + JSONRenderer: {slow_time * 1000:8.1f} ms')
+        self.stdout.write(f'  values() + ORJSONRenderer:      {fast_time * 1000:8.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {slow_time / fast_time:.1f}x'))
+
+    def _time(self, render, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = render()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return body, best
+
+    def _create_log(self, rows):
+        user = User.objects.create_user(
+            username='bench-serialization', email='bench-serialization@example.invalid',
+            call_sign='BENCH0', password=None, is_approved=True,
+        )
+        rng = random.Random(0)
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        qsos = []
+        for index in range(rows):
+            qso = QSOContact(
+                initiator=user,
+                recipient=f'DL{index % 1000:03d}X',
+                frequency=Decimal(rng.choice(('145.500', '432.100', '28.450', '50.313'))),
+                mode=rng.choice(('FM', 'SSB', 'CW')),
+                datetime=start + timedelta(seconds=index * 3700, microseconds=rng.randrange(1000000)),
+                initiator_location='JO91AA',
+                recipient_location=f'JO{rng.randrange(10)}{rng.randrange(10)}AA',
+                confirmed=rng.random() < 0.3,
+            )
+            qso.update_derived_fields()
+            qsos.append(qso)
+        QSOContact.objects.bulk_create(qsos, batch_size=2000)
+        return user
@@ -0,0 +1,180 @@
+import json
+import platform
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+from rest_framework.test import APIClient
+from qso_logger.metrics import QueryTimer
+from qso_logger.models import QSOContact, User
+from qso_logger.seeding import SEED_USERNAME_PREFIX, seed_qsos
+
+
+class Command(BaseCommand):
+    help = ('Seeds synthetic logs of several sizes and times the main API endpoints against them; '
+            'prints the results as JSON. Every size runs in a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help='Comma-separated QSO counts to benchmark (default: 10000,100000,1000000)')
+        parser.add_argument('--qsos-per-user', type=int, default=500,
+                            help='Average log size of a seeded station (default: 500)')
+        parser.add_argument('--mutual-share', type=float, default=0.3,
+                            help='Share of seeded QSOs that are confirmed pairs (default: 0.3)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for the data and the requests (default: 0)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Requests per operation and size (default: 20)')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        if min(sizes) < 1 or options['qsos_per_user'] < 1 or options['repeat'] < 1:
+            raise CommandError('--sizes, --qsos-per-user and --repeat must be positive')
+        if User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).exists():
+            raise CommandError('The database already contains seeded stations')
+
+        results = []
+        for size in sizes:
+            self.stderr.write(f'Benchmarking {size} QSOs...')
+            with transaction.atomic():
+                results.extend(self._run_size(size, options))
+                transaction.set_rollback(True)
+            cache.clear()
+
+        report = json.dumps({
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'seed': options['seed'],
+                'qsos_per_user': options['qsos_per_user'],
+                'mutual_share': options['mutual_share'],
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        else:
+            self.stdout.write(report)
+
+    def _run_size(self, size, options):
+        users = max(2, size // options['qsos_per_user'])
+        started = time.perf_counter()
+        seed_qsos(users, size, options['mutual_share'], options['seed'])
+        seconds = time.perf_counter() - started
+        results = [{
+            'rows': size, 'operation': 'seed', 'runs': 1, 'total_ms': round(seconds * 1000, 3),
+            'rows_per_second': round(size / seconds),
+        }]
+
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        stations = {user.call_sign: user for user in User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)}
+        busiest = User.objects.get(pk=QSOContact.objects.values('initiator').annotate(
+            n=Count('id')).order_by('-n', 'initiator').values('initiator')[:1])
+        client = APIClient()
+
+        def get(path):
+            def request():
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                return response
+            return request
+
+        def cold(request):
+            # Measure the database work, not the application cache
+            def run():
+                cache.clear()
+                return request()
+            return run
+
+        # Unconfirmed entries whose recipient is a seeded station; logging the
+        # mirror entry as that station goes through matching, unless the
+        # duplicate window rejects it
+        logged_back = QSOContact.objects.filter(
+            initiator__call_sign=OuterRef('recipient'),
+            recipient=OuterRef('initiator__call_sign'),
+            datetime__gte=OuterRef('datetime') - timedelta(hours=2),
+            datetime__lte=OuterRef('datetime') + timedelta(hours=2),
+        )
+        mirrors = list(QSOContact.objects.filter(
+            confirmed=False, recipient__in=list(stations)
+        ).exclude(Exists(logged_back)).select_related('initiator').order_by('id')[:repeat * 10])
+        rng.shuffle(mirrors)
+
+        def create_match():
+            qso = mirrors.pop()
+            client.force_authenticate(stations[qso.recipient])
+            try:
+                return client.post('/api/qsos/', {
+                    'recipient': qso.initiator.call_sign,
+                    'frequency': str(qso.frequency),
+                    'mode': qso.mode,
+                    'datetime': (qso.datetime + timedelta(seconds=30)).isoformat(),
+                    'initiator_location': qso.recipient_location,
+                    'recipient_location': qso.initiator_location,
+                }, format='json')
+            finally:
+                client.force_authenticate(busiest)
+
+        prefixes = sorted({call_sign[:2] for call_sign in stations})
+
+        def search_callsigns():
+            return get(f'/api/users/callsigns/?search={rng.choice(prefixes)}')()
+
+        client.force_authenticate(busiest)
+        operations = [
+            ('create_match', create_match, min(repeat, len(mirrors))),
+            ('list_page', get('/api/qsos/?page_size=50'), repeat),
+            ('list_full', get('/api/qsos/'), repeat),
+            ('rankings', cold(get('/api/qsos/rankings/')), repeat),
+            ('rankings_band', cold(get('/api/qsos/rankings/?band=2m')), repeat),
+            ('search_callsigns', cold(search_callsigns), repeat),
+            ('export_csv', get('/api/qsos/export/?format=csv'), repeat),
+        ]
+        for name, request, runs in operations:
+            results.append(self._measure(size, name, request, runs))
+        return results
+
+    def _measure(self, size, name, request, runs):
+        timings = []
+        queries = []
+        statuses = Counter()
+        for _ in range(runs):
+            timer = QueryTimer()
+            started = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                response = request()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(timer.count)
+            statuses[str(response.status_code)] += 1
+        if not timings:
+            return {'rows': size, 'operation': name, 'runs': 0}
+        timings.sort()
+        return {
+            'rows': size,
+            'operation': name,
+            'runs': runs,
+            'statuses': dict(statuses),
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+            'queries_per_request': round(statistics.mean(queries), 2),
+        }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from qso_logger.importer import guess_format, import_log
+from qso_logger.models import User
+
+class Command(BaseCommand):
+    help = 'Imports an ADIF or CSV log file into a station\'s QSOs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the .adi/.adif or .csv file')
+        parser.add_argument('--user', required=True, help='Call sign or username that owns the log')
+        parser.add_argument('--format', dest='file_format', choices=['adif', 'csv'],
+                            help='File format (default: guessed from the file extension)')
+        parser.add_argument('--encoding', default='utf-8', help='Text encoding of the file (default: utf-8)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(Q(call_sign=options['user'].upper()) | Q(username=options['user']))
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {options['user']}")
+
+        file_format = options['file_format'] or guess_format(options['path'])
+        with open(options['path'], encoding=options['encoding'], errors='replace', newline='') as stream:
+            report = import_log(user, stream, file_format=file_format)
+
+        for rejection in report.rejections:
+            self.stdout.write(f"Record {rejection['record']}: {rejection['reason']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {report.read} records in {report.elapsed:.1f}s ({report.rate:.0f} records/s): '
+            f'{report.inserted} inserted, {report.duplicates} duplicates, '
+            f'{report.self_qsos} self-QSOs, {report.invalid} invalid'
+        ))
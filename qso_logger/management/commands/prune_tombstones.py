@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from qso_logger.sync import prune_tombstones
+
+class Command(BaseCommand):
+    help = 'Deletes QSO tombstones older than the delta sync retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Keep tombstones this many days (default: QSO_TOMBSTONE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        count = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} tombstones'))
@@ -0,0 +1,13 @@
+import time
+from django.core.management.base import BaseCommand
+from qso_logger.stats import rebuild_station_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-station ranking counters from all logged QSOs'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_station_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters for {count} stations in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,13 @@
+import time
+from django.core.management.base import BaseCommand
+from qso_logger.stats import rebuild_daily_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-day, band and mode statistics rollups from all logged QSOs'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_daily_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} daily rollup rows in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,164 @@
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+from qso_logger.filters import parse_iso_moment
+from qso_logger.matching import MATCH_WINDOW, confirm_pairs, pair_rows, unconfirmed_rows
+from qso_logger.models import QSOContact
+from qso_logger.stats import record_confirmed
+
+
+def rematch_range(start, end, chunk, batch_size, dry_run, candidates_before=None, log=None,
+                  record_stats=True):
+    """
+    Pair unconfirmed QSOs whose earlier entry lies in [start, end).
+
+    The range is walked in time-ordered chunks. Each chunk loads its rows plus
+    one match window of look-ahead, so pairs straddling a chunk boundary are
+    found by the chunk holding their earlier entry. Partners are never taken
+    from ``candidates_before`` onwards, which keeps parallel slices disjoint.
+
+    Returns (scanned, pairs, edge_claimed, confirmed_keys) where
+    ``edge_claimed`` holds the ids claimed within one match window of either
+    end of the range.
+    """
+    scanned = 0
+    pairs_found = 0
+    confirmed_keys = Counter()
+    edge_claimed = set()
+    carried = set()
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        load_end = chunk_end + MATCH_WINDOW
+        if candidates_before is not None:
+            load_end = min(load_end, candidates_before - timedelta(microseconds=1))
+
+        rows = unconfirmed_rows(chunk_start, load_end)
+        pairs = pair_rows(rows, anchor_until=chunk_end, exclude_ids=carried)
+        if pairs and not dry_run:
+            confirmed_keys.update(
+                confirm_pairs(pairs, batch_size=batch_size, record_stats=record_stats)
+            )
+
+        moments = {row['id']: row['datetime'] for row in rows}
+        claimed = [qso_id for pair in pairs for qso_id in pair]
+        # Partners beyond this chunk are loaded again by the next one
+        carried = {qso_id for qso_id in claimed if moments[qso_id] >= chunk_end}
+        edge_claimed.update(
+            qso_id for qso_id in claimed
+            if moments[qso_id] < start + MATCH_WINDOW or moments[qso_id] >= end - MATCH_WINDOW
+        )
+        scanned += sum(1 for moment in moments.values() if moment < chunk_end)
+        pairs_found += len(pairs)
+
+        if log:
+            log(f'{chunk_start.isoformat()} .. {chunk_end.isoformat()}: '
+                f'{len(rows)} rows, {len(pairs)} pairs')
+        chunk_start = chunk_end
+    return scanned, pairs_found, edge_claimed, confirmed_keys
+
+
+def _rematch_slice(args):
+    start, end, chunk, batch_size, dry_run = args
+    try:
+        # Counters are updated once by the parent so slices never contend on them
+        return rematch_range(start, end, chunk, batch_size, dry_run,
+                             candidates_before=end, record_stats=False)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Re-runs confirmation matching over unconfirmed QSOs in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rematch QSOs logged at or after this date/datetime')
+        parser.add_argument('--until', help='Only rematch QSOs logged before this date/datetime')
+        parser.add_argument('--chunk-hours', type=int, default=24,
+                            help='Width of the time window loaded per chunk (default: 24)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows confirmed per UPDATE (default: 1000)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Split the time range across this many processes (default: 1)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the pairs that would be confirmed without saving them')
+
+    def handle(self, *args, **options):
+        if options['chunk_hours'] < 1 or options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--chunk-hours, --workers and --batch-size must be positive')
+
+        bounds = QSOContact.objects.filter(confirmed=False).aggregate(
+            first=Min('datetime'), last=Max('datetime')
+        )
+        if bounds['first'] is None:
+            self.stdout.write('No unconfirmed QSOs to rematch.')
+            return
+
+        try:
+            start = parse_iso_moment(options['since']) if options['since'] else bounds['first']
+            end = parse_iso_moment(options['until']) if options['until'] else bounds['last'] + timedelta(microseconds=1)
+        except ValueError as e:
+            raise CommandError(e)
+        if options['since'] and options['until'] and start >= end:
+            raise CommandError('--since must be earlier than --until')
+
+        # No need to walk empty hours outside the unconfirmed rows
+        start = max(start, bounds['first'])
+        end = min(end, bounds['last'] + timedelta(microseconds=1))
+        if start >= end:
+            self.stdout.write('No unconfirmed QSOs in the requested range.')
+            return
+
+        chunk = timedelta(hours=options['chunk_hours'])
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write('SQLite allows a single writer; ignoring --workers.')
+            workers = 1
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        started = time.monotonic()
+
+        if workers == 1:
+            scanned, pairs, _, _ = rematch_range(start, end, chunk, batch_size, dry_run, log=log)
+        else:
+            step = (end - start) / workers
+            boundaries = [start + step * i for i in range(1, workers)]
+            slices = list(zip([start] + boundaries, boundaries + [end]))
+
+            # Child processes must open their own database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(
+                    _rematch_slice,
+                    [(slice_start, slice_end, chunk, batch_size, dry_run) for slice_start, slice_end in slices],
+                ))
+
+            scanned = sum(result[0] for result in results)
+            pairs = sum(result[1] for result in results)
+            edge_claimed = set().union(*(result[2] for result in results))
+            confirmed_keys = sum((result[3] for result in results), Counter())
+            record_confirmed(confirmed_keys.elements())
+
+            # Slices never pair across their borders; do that sequentially now
+            for boundary in boundaries:
+                rows = unconfirmed_rows(boundary - MATCH_WINDOW, boundary + MATCH_WINDOW)
+                boundary_pairs = pair_rows(rows, anchor_until=boundary, exclude_ids=edge_claimed)
+                if boundary_pairs and not dry_run:
+                    confirm_pairs(boundary_pairs, batch_size=batch_size)
+                edge_claimed.update(qso_id for pair in boundary_pairs for qso_id in pair)
+                pairs += len(boundary_pairs)
+
+        elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed else scanned
+        verb = 'Would confirm' if dry_run else 'Confirmed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {pairs} pairs ({pairs * 2} QSOs) from {scanned} unconfirmed QSOs '
+            f'in {elapsed:.1f}s ({rate:.0f} rows/s)'
+        ))
@@ -0,0 +1,88 @@
+import logging
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from qso_logger.contest import flush_due
+from qso_logger.jobs import process_batch, queue_stats
+
+logger = logging.getLogger('qso_logger.jobs')
+
+
+class Command(BaseCommand):
+    help = ('Runs the match worker, which confirms queued QSOs against the other stations\' logs '
+            'and writes the QSOs staged by contest sessions to the log')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.MATCH_WORKER_THREADS,
+                            help='Worker threads, each with its own database connection '
+                                 '(use 1 on SQLite, which allows one writer at a time)')
+        parser.add_argument('--batch-size', type=int, default=settings.MATCH_JOB_BATCH_SIZE,
+                            help='Jobs claimed per transaction')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle thread waits before looking for jobs again (default: 1)')
+        parser.add_argument('--report-interval', type=float, default=60.0,
+                            help='Seconds between queue depth and lag reports (default: 60)')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the jobs that are due now and exit')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--threads and --batch-size must be positive')
+
+        if options['once']:
+            handled = 0
+            while batch := process_batch(options['batch_size']):
+                handled += batch
+            logged = flush_due()
+            self.stdout.write(self.style.SUCCESS(
+                f'Processed {handled} match jobs and {logged} staged contest QSOs; queue: {queue_stats()}'
+            ))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        workers = [
+            threading.Thread(target=self.work, args=(stop, options), name=f'match-worker-{index}')
+            for index in range(options['threads'])
+        ]
+        for worker in workers:
+            worker.start()
+        logger.info('Match worker started with %d threads', len(workers))
+
+        while not stop.wait(options['report_interval']):
+            try:
+                logger.info('Match queue: %(pending)d pending, %(failed)d failed, lag %(lag_seconds).1fs',
+                            queue_stats())
+            except Exception:
+                logger.exception('Could not read the match queue')
+            finally:
+                close_old_connections()
+
+        for worker in workers:
+            worker.join()
+        logger.info('Match worker stopped')
+
+    def work(self, stop, options):
+        try:
+            while not stop.is_set():
+                # Same connection housekeeping as a request: honour CONN_MAX_AGE, drop broken ones
+                close_old_connections()
+                try:
+                    handled = process_batch(options['batch_size'])
+                except Exception:
+                    logger.exception('Match worker batch failed')
+                    handled = 0
+                # Contest sessions whose staged QSOs waited too long, e.g. after a web worker died
+                try:
+                    handled += flush_due()
+                except Exception:
+                    logger.exception('Match worker contest flush failed')
+                    handled = 0
+                if not handled:
+                    stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
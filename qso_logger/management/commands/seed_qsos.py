@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from qso_logger.seeding import seed_qsos
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with synthetic stations and QSOs for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='Number of stations to create (default: 100)')
+        parser.add_argument('--qsos', type=int, default=10000,
+                            help='Number of QSOs to create (default: 10000)')
+        parser.add_argument('--mutual-share', type=float, default=0.3,
+                            help='Share of QSOs logged by both stations and confirmed (default: 0.3)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed; the same seed gives the same data (default: 0)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per INSERT (default: 5000)')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['mutual_share'] <= 1:
+            raise CommandError('--mutual-share must be between 0 and 1')
+        started = time.monotonic()
+        try:
+            result = seed_qsos(options['users'], options['qsos'], options['mutual_share'],
+                               options['seed'], options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['users']} stations and {result['qsos']} QSOs "
+            f"({result['confirmed']} confirmed) in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,161 @@
+# qso_logger/matching.py
+from datetime import timedelta
+from decimal import Decimal
+from django.db import models, transaction
+from django.utils import timezone
+from .models import QSOContact
+from .stats import qso_rollup_key, record_confirmed, rollup_key
+
+# Two log entries describe the same contact when they are logged within an
+# hour of each other, on the same mode, within 5 kHz and with crossed locators.
+MATCH_WINDOW = timedelta(hours=1)
+FREQUENCY_TOLERANCE = Decimal('0.005')  # MHz
+
+
+def reverse_candidates(qso):
+    """
+    Unconfirmed QSOs logged by the other station that mirror ``qso``.
+
+    All comparisons happen in SQL; the (initiator, recipient, datetime) index
+    narrows the scan to the partner's entries for this station.
+    """
+    return QSOContact.objects.filter(
+        initiator__call_sign=qso.recipient,   # QSO initiated by the recipient
+        recipient=qso.initiator.call_sign,    # To the current initiator
+        datetime__range=(qso.datetime - MATCH_WINDOW, qso.datetime + MATCH_WINDOW),
+        frequency__range=(qso.frequency - FREQUENCY_TOLERANCE, qso.frequency + FREQUENCY_TOLERANCE),
+        mode=qso.mode,
+        initiator_location=qso.recipient_location,  # Location match
+        recipient_location=qso.initiator_location,  # Cross-location match
+        confirmed=False,
+    ).exclude(pk=qso.pk)
+
+
+def confirm_match(qso):
+    """
+    Find the partner entry for a saved ``qso`` and confirm both in one UPDATE.
+
+    The entry and its unconfirmed candidates are locked by one SELECT ... FOR
+    UPDATE in primary key order, so two requests confirming mirror entries
+    at the same time queue up instead of deadlocking. A candidate confirmed
+    by a racing request is no longer unconfirmed once the lock is granted,
+    so two requests cannot both confirm against the same partner. Returns
+    the partner's id, or None when no partner was found.
+    """
+    with transaction.atomic():
+        locked = list(
+            QSOContact.objects.select_for_update().filter(
+                models.Q(pk=qso.pk) | models.Q(pk__in=reverse_candidates(qso).values('pk')),
+                confirmed=False,
+            ).order_by('pk').values_list('id', 'initiator_id', 'datetime', 'band', 'mode')
+        )
+        if not any(row[0] == qso.pk for row in locked):
+            # Our own entry was confirmed by a concurrent request in the meantime
+            return None
+        candidates = sorted((row for row in locked if row[0] != qso.pk), key=lambda row: (row[2], row[0]))
+        if not candidates:
+            return None
+        partner_id, *partner = candidates[0]
+
+        QSOContact.objects.filter(pk__in=[qso.pk, partner_id]).update(confirmed=True, updated_at=timezone.now())
+        record_confirmed([qso_rollup_key(qso), rollup_key(*partner)])
+
+    qso.confirmed = True
+    return partner_id
+
+
+# Columns needed to pair rows in Python
+MATCH_VALUES = (
+    'id', 'initiator_call_sign', 'recipient', 'datetime', 'frequency',
+    'mode', 'initiator_location', 'recipient_location',
+)
+
+
+def _match_key(row):
+    return (row['initiator_call_sign'], row['recipient'], row['mode'],
+            row['initiator_location'], row['recipient_location'])
+
+
+def _reverse_key(row):
+    return (row['recipient'], row['initiator_call_sign'], row['mode'],
+            row['recipient_location'], row['initiator_location'])
+
+
+def pair_rows(rows, anchor_until=None, exclude_ids=()):
+    """
+    Hash-join a batch of unconfirmed QSO rows against themselves.
+
+    ``rows`` are dicts as returned by ``unconfirmed_rows``. Rows are visited in
+    time order and each one is paired with the earliest unclaimed mirror
+    entry, which is the partner the online matcher would have chosen. Only
+    rows logged before ``anchor_until`` start a pair; later rows can only be
+    claimed as partners. Returns a list of (id, partner_id) tuples.
+    """
+    rows = sorted(rows, key=lambda row: (row['datetime'], row['id']))
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(_match_key(row), []).append(row)
+
+    claimed = set(exclude_ids)
+    pairs = []
+    for row in rows:
+        if anchor_until is not None and row['datetime'] >= anchor_until:
+            break
+        if row['id'] in claimed:
+            continue
+        for candidate in buckets.get(_reverse_key(row), ()):
+            if candidate['id'] in claimed or candidate['id'] == row['id']:
+                continue
+            if abs(candidate['datetime'] - row['datetime']) > MATCH_WINDOW:
+                continue
+            if abs(candidate['frequency'] - row['frequency']) > FREQUENCY_TOLERANCE:
+                continue
+            claimed.update((row['id'], candidate['id']))
+            pairs.append((row['id'], candidate['id']))
+            break
+    return pairs
+
+
+def unconfirmed_rows(start, end):
+    """Unconfirmed QSOs logged in [start, end], shaped for ``pair_rows``."""
+    return list(
+        QSOContact.objects.filter(
+            confirmed=False,
+            datetime__gte=start,
+            datetime__lte=end,
+        ).annotate(
+            initiator_call_sign=models.F('initiator__call_sign'),
+        ).values(*MATCH_VALUES)
+    )
+
+
+def confirm_pairs(pairs, batch_size=1000, record_stats=True):
+    """
+    Confirm the given (id, partner_id) pairs with batched UPDATEs.
+
+    Rows are locked first and a pair is only confirmed when both of its rows
+    are still unconfirmed, so a concurrent matcher never leaves half a pair.
+    Returns the rollup keys of the confirmed QSOs; with ``record_stats`` off
+    the caller is responsible for passing them to ``record_confirmed``.
+    """
+    confirmed_keys = []
+    for offset in range(0, len(pairs), batch_size // 2 or 1):
+        batch_pairs = pairs[offset:offset + (batch_size // 2 or 1)]
+        with transaction.atomic():
+            pending = {
+                qso_id: rollup_key(*rest)
+                for qso_id, *rest in QSOContact.objects.select_for_update().filter(
+                    pk__in=[qso_id for pair in batch_pairs for qso_id in pair],
+                    confirmed=False,
+                ).values_list('id', 'initiator_id', 'datetime', 'band', 'mode')
+            }
+            ids = [qso_id for pair in batch_pairs if all(qso_id in pending for qso_id in pair)
+                   for qso_id in pair]
+            if not ids:
+                continue
+            QSOContact.objects.filter(pk__in=ids).update(confirmed=True, updated_at=timezone.now())
+            keys = [pending[qso_id] for qso_id in ids]
+            if record_stats:
+                record_confirmed(keys)
+            confirmed_keys.extend(keys)
+    return confirmed_keys
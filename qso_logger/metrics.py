@@ -0,0 +1,131 @@
+# qso_logger/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from . import cache
+
+# Metrics live in the memory of each process; under gunicorn every worker
+# reports its own numbers, which Prometheus adds up across scrape targets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` hook counting the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+_latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+_query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+_sizes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+_query_seconds = defaultdict(float)
+_requests = defaultdict(int)
+
+
+def record_request(view, method, status, seconds, queries):
+    with _lock:
+        _latency[(view, method)].observe(seconds)
+        _query_counts[(view, method)].observe(queries.count)
+        _query_seconds[(view, method)] += queries.seconds
+        _requests[(view, method, str(status))] += 1
+
+
+def record_response_size(view, method, size):
+    # Recorded separately because streamed bodies are only measured once sent
+    with _lock:
+        _sizes[(view, method)].observe(size)
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _histogram_lines(name, help_text, histograms, label_names):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(label_names, key, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(label_names, key)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(label_names, key)} {histogram.count}')
+    return lines
+
+
+def _counter_lines(name, help_text, values, label_names):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{_labels(label_names, key)} {value}')
+    return lines
+
+
+def render():
+    """All metrics of this process in the Prometheus text exposition format."""
+    view_labels = ('view', 'method')
+    with _lock:
+        lines = (
+            _counter_lines('qso_http_requests_total', 'Requests by URL name, method and status.',
+                           _requests, view_labels + ('status',)) +
+            _histogram_lines('qso_http_request_duration_seconds', 'Request latency.',
+                             _latency, view_labels) +
+            _histogram_lines('qso_http_response_size_bytes', 'Response body size as sent.',
+                             _sizes, view_labels) +
+            _histogram_lines('qso_db_queries_per_request', 'SQL queries issued per request.',
+                             _query_counts, view_labels) +
+            _counter_lines('qso_db_query_duration_seconds_total', 'Time spent in SQL queries.',
+                           _query_seconds, view_labels)
+        )
+
+    cache_stats = cache.stats()
+    for event in ('hits', 'misses', 'invalidations'):
+        lines += _counter_lines(
+            f'qso_cache_{event}_total', f'Application cache {event} by namespace.',
+            {(namespace,): counts[event] for namespace, counts in cache_stats.items()}, ('namespace',)
+        )
+
+    # Imported here: the job queue needs the models, metrics are loaded with the middleware
+    from .jobs import queue_stats
+    queue = queue_stats()
+    lines += [
+        '# HELP qso_match_queue_jobs Match jobs by state.',
+        '# TYPE qso_match_queue_jobs gauge',
+        f'qso_match_queue_jobs{{state="pending"}} {queue["pending"]}',
+        f'qso_match_queue_jobs{{state="failed"}} {queue["failed"]}',
+        '# HELP qso_match_queue_lag_seconds Age of the oldest pending match job.',
+        '# TYPE qso_match_queue_lag_seconds gauge',
+        f'qso_match_queue_lag_seconds {queue["lag_seconds"]}',
+    ]
+    return '\n'.join(lines) + '\n'
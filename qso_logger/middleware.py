@@ -0,0 +1,57 @@
+# qso_logger/middleware.py
+import time
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+from django.utils.decorators import decorator_from_middleware
+from . import metrics
+
+
+class LargeResponseGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves responses under ``min_length`` bytes alone."""
+    min_length = 4096
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        return super().process_response(request, response)
+
+
+# Per-view gzip for the endpoints that return whole logs or long lists
+gzip_large = decorator_from_middleware(LargeResponseGZipMiddleware)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL queries and response size per resolved URL name.
+
+    Requests that match no route are grouped under ``<unresolved>`` so that
+    scanners cannot blow up the number of label values. Streamed bodies are
+    measured as they are sent; their latency covers the view, not the stream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        metrics.record_request(view, request.method, response.status_code, elapsed, queries)
+        if response.streaming:
+            response.streaming_content = self._counted(response.streaming_content, view, request.method)
+        else:
+            metrics.record_response_size(view, request.method, len(response.content))
+        return response
+
+    @staticmethod
+    def _counted(chunks, view, method):
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+        metrics.record_response_size(view, method, size)
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0006_alter_qsocontact_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', '-datetime', '-id'], name='qso_initiator_dt_id_idx'),
+        ),
+    ]
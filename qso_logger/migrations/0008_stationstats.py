@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_station_stats(apps, schema_editor):
+    User = apps.get_model('qso_logger', 'User')
+    StationStats = apps.get_model('qso_logger', 'StationStats')
+    counts = User.objects.annotate(
+        total=Count('initiated_contacts'),
+        confirmed=Count('initiated_contacts', filter=Q(initiated_contacts__confirmed=True)),
+    ).values_list('pk', 'total', 'confirmed')
+    StationStats.objects.bulk_create(
+        [StationStats(user_id=pk, total_contacts=total, confirmed_contacts=confirmed)
+         for pk, total, confirmed in counts.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0007_qsocontact_initiator_datetime_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='station_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_contacts', models.IntegerField(default=0)),
+                ('confirmed_contacts', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Station Stats',
+                'verbose_name_plural': 'Station Stats',
+                'indexes': [models.Index(fields=['-confirmed_contacts', '-total_contacts', 'user'], name='station_stats_ranking_idx')],
+            },
+        ),
+        migrations.RunPython(populate_station_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0008_stationstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qsocontact',
+            name='distance_km',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+    ]
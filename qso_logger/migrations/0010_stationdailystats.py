@@ -0,0 +1,64 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:17
+
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from qso_logger.bands import band_for_frequency
+
+
+def populate_daily_stats(apps, schema_editor):
+    QSOContact = apps.get_model('qso_logger', 'QSOContact')
+    StationDailyStats = apps.get_model('qso_logger', 'StationDailyStats')
+    totals, confirmed = Counter(), Counter()
+    groups = QSOContact.objects.values(
+        'initiator_id', 'frequency', 'mode', day=TruncDate('datetime', tzinfo=dt_timezone.utc)
+    ).annotate(
+        total=Count('id'), confirmed=Count('id', filter=Q(confirmed=True))
+    ).order_by()
+    for row in groups.iterator():
+        key = (row['initiator_id'], row['day'], band_for_frequency(row['frequency']), row['mode'])
+        totals[key] += row['total']
+        confirmed[key] += row['confirmed']
+    StationDailyStats.objects.bulk_create(
+        [StationDailyStats(user_id=key[0], day=key[1], band=key[2], mode=key[3],
+                           total_contacts=total, confirmed_contacts=confirmed[key])
+         for key, total in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0009_qsocontact_distance_km'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('band', models.CharField(blank=True, max_length=8)),
+                ('mode', models.CharField(max_length=10)),
+                ('total_contacts', models.IntegerField(default=0)),
+                ('confirmed_contacts', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Station Daily Stats',
+                'verbose_name_plural': 'Station Daily Stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stationdailystats',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'band', 'mode'), name='station_daily_stats_key'),
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:19
+
+from django.db import migrations, models, transaction
+from django.db.models import Max
+
+from qso_logger.bands import BAND_PLAN
+
+CHUNK_SIZE = 10000
+
+
+def backfill_band(apps, schema_editor):
+    # One short transaction per id range so a large table is never locked
+    # for the whole backfill
+    QSOContact = apps.get_model('qso_logger', 'QSOContact')
+    last_id = QSOContact.objects.aggregate(last=Max('id'))['last'] or 0
+    for start in range(0, last_id + 1, CHUNK_SIZE):
+        with transaction.atomic():
+            chunk = QSOContact.objects.filter(id__gte=start, id__lt=start + CHUNK_SIZE)
+            for band, low, high in BAND_PLAN:
+                chunk.filter(frequency__gte=low, frequency__lte=high).update(band=band)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('qso_logger', '0010_stationdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qsocontact',
+            name='band',
+            field=models.CharField(blank=True, editable=False, max_length=8),
+        ),
+        migrations.RunPython(backfill_band, migrations.RunPython.noop),
+        # Built after the backfill so the updates don't have to maintain it
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'band', 'datetime'], name='qso_initiator_band_dt_idx'),
+        ),
+    ]
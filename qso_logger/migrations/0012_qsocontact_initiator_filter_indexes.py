@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0011_qsocontact_band'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='qsocontact',
+            name='qso_logger__initiat_0ffe89_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='qsocontact',
+            name='qso_logger__frequen_a6cda2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'recipient', 'datetime'], name='qso_initiator_recipient_idx', opclasses=['int8_ops', 'varchar_pattern_ops', 'timestamptz_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'mode', 'datetime'], name='qso_initiator_mode_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'frequency'], name='qso_initiator_frequency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'confirmed', 'datetime'], name='qso_initiator_confirmed_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+CONSTRAINT = 'qso_duplicate_window_excl'
+
+# timestamptz - interval is only STABLE in PostgreSQL because day and month
+# intervals depend on the time zone; a fixed one-hour offset does not, so the
+# range can be computed by an IMMUTABLE function and used in the constraint.
+CREATE_SQL = f"""
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+CREATE OR REPLACE FUNCTION qso_duplicate_window(timestamptz) RETURNS tstzrange AS $$
+    SELECT tstzrange($1 - interval '1 hour', $1, '[]')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+ALTER TABLE qso_logger_qsocontact ADD CONSTRAINT {CONSTRAINT} EXCLUDE USING gist (
+    initiator_id WITH =,
+    recipient WITH =,
+    qso_duplicate_window(datetime) WITH &&
+);
+"""
+
+DROP_SQL = f"""
+ALTER TABLE qso_logger_qsocontact DROP CONSTRAINT IF EXISTS {CONSTRAINT};
+DROP FUNCTION IF EXISTS qso_duplicate_window(timestamptz);
+"""
+
+CONFLICTS_SQL = """
+SELECT count(*) FROM qso_logger_qsocontact a
+JOIN qso_logger_qsocontact b
+  ON a.initiator_id = b.initiator_id
+ AND a.recipient = b.recipient
+ AND a.id < b.id
+ AND b.datetime BETWEEN a.datetime - interval '1 hour' AND a.datetime + interval '1 hour'
+"""
+
+
+def add_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CONFLICTS_SQL)
+        conflicts = cursor.fetchone()[0]
+    if conflicts:
+        raise RuntimeError(
+            f'{conflicts} pairs of QSOs break the one-hour duplicate window; '
+            f'remove the duplicates before adding {CONSTRAINT}.'
+        )
+    schema_editor.execute(CREATE_SQL)
+
+
+def remove_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0012_qsocontact_initiator_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraint, remove_constraint),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0013_qsocontact_duplicate_window_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QSOTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qso_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'QSO Tombstone',
+                'verbose_name_plural': 'QSO Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='qsocontact',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='qsocontact',
+            index=models.Index(fields=['initiator', 'updated_at'], name='qso_initiator_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='qsotombstone',
+            name='initiator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qso_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='qsotombstone',
+            index=models.Index(fields=['initiator', 'deleted_at'], name='qso_tombstone_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qsotombstone',
+            index=models.Index(fields=['deleted_at'], name='qso_tombstone_deleted_idx'),
+        ),
+    ]
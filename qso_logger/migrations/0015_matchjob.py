@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0014_qsocontact_updated_at_qsotombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('failed_at', models.DateTimeField(blank=True, null=True)),
+                ('qso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_jobs', to='qso_logger.qsocontact')),
+            ],
+            options={
+                'verbose_name': 'Match Job',
+                'verbose_name_plural': 'Match Jobs',
+                'indexes': [models.Index(condition=models.Q(('failed_at__isnull', True)), fields=['run_after', 'id'], name='match_job_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qso_logger', '0015_matchjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('logged_contacts', models.IntegerField(default=0)),
+                ('operator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Contest Session',
+                'verbose_name_plural': 'Contest Sessions',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.CharField(max_length=10)),
+                ('frequency', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('mode', models.CharField(max_length=10)),
+                ('datetime', models.DateTimeField()),
+                ('initiator_location', models.CharField(max_length=6)),
+                ('recipient_location', models.CharField(max_length=6)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='qso_logger.contestsession')),
+            ],
+            options={
+                'verbose_name': 'Contest Entry',
+                'verbose_name_plural': 'Contest Entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contestsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('operator',), name='contest_session_one_open'),
+        ),
+        migrations.AddIndex(
+            model_name='contestentry',
+            index=models.Index(condition=models.Q(('error', '')), fields=['created_at'], name='contest_entry_staged_idx'),
+        ),
+    ]
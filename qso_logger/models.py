@@ -1,10 +1,26 @@
 # qso_logger/models.py
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models, transaction
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
+from . import maidenhead
+from .bands import band_for_frequency
+
+# PostgreSQL enforces the one-hour duplicate window with this exclusion
+# constraint (migration 0013); other databases rely on QSOContact.clean()
+DUPLICATE_WINDOW_CONSTRAINT = 'qso_duplicate_window_excl'
+# What the station counters and daily rollups of a QSO depend on (signals.py)
+COUNTED_FIELDS = ('initiator_id', 'datetime', 'band', 'mode', 'confirmed')
+DUPLICATE_WINDOW_MESSAGE = (
+    "You have already logged a QSO with this station within the last hour. "
+    "Please wait at least one hour before logging another QSO with the same station."
+)
+
+
+def duplicate_window_enforced():
+    return connection.vendor == 'postgresql'
 
 class User(AbstractUser):
     call_sign = models.CharField(
@@ -29,6 +45,18 @@ class User(AbstractUser):
             self.is_active = False
         super().save(*args, **kwargs)
 
+class QSOContactQuerySet(models.QuerySet):
+    def delete(self):
+        # The deleted QSOs are discounted and tombstoned together rather than
+        # by one post_delete handler run each (signals.bulk_qso_deletes)
+        from .signals import bulk_qso_deletes
+        with transaction.atomic(using=self.db, savepoint=False), bulk_qso_deletes():
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class QSOContact(models.Model):
     initiator = models.ForeignKey(User, related_name='initiated_contacts', on_delete=models.CASCADE)
     recipient = models.CharField(
@@ -36,6 +64,7 @@ class QSOContact(models.Model):
         validators=[RegexValidator(r'^[A-Z0-9]{3,10}$', 'Call sign must be 3-10 alphanumeric characters')]
     )
     frequency = models.DecimalField(max_digits=10, decimal_places=3)  # MHz
+    band = models.CharField(max_length=8, blank=True, editable=False)  # derived from frequency
     mode = models.CharField(max_length=10)  # e.g., SSB, FM, AM
     datetime = models.DateTimeField(db_index=True)
     initiator_location = models.CharField(
@@ -47,13 +76,32 @@ class QSOContact(models.Model):
         validators=[RegexValidator(r'^[A-Z]{2}[0-9]{2}[A-Z]{2}$', 'Grid square must be in format AA00AA')]
     )
     confirmed = models.BooleanField(default=False, db_index=True)
+    distance_km = models.FloatField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every change, including the bulk .update() paths, for delta sync
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = QSOContactQuerySet.as_manager()
 
     class Meta:
+        # Every list filter has an index leading with initiator, since all
+        # queries on a log are scoped to its station
         indexes = [
             models.Index(fields=['recipient', 'datetime']),
-            models.Index(fields=['initiator', 'recipient', 'datetime']),
-            models.Index(fields=['frequency', 'mode', 'datetime']),
+            # Matching and ?recipient= prefix search; pattern_ops lets
+            # PostgreSQL serve LIKE 'X%' under any collation
+            models.Index(
+                fields=['initiator', 'recipient', 'datetime'],
+                name='qso_initiator_recipient_idx',
+                opclasses=['int8_ops', 'varchar_pattern_ops', 'timestamptz_ops'],
+            ),
+            # Keyset pagination of a station's log, newest first
+            models.Index(fields=['initiator', '-datetime', '-id'], name='qso_initiator_dt_id_idx'),
+            models.Index(fields=['initiator', 'band', 'datetime'], name='qso_initiator_band_dt_idx'),
+            models.Index(fields=['initiator', 'mode', 'datetime'], name='qso_initiator_mode_dt_idx'),
+            models.Index(fields=['initiator', 'frequency'], name='qso_initiator_frequency_idx'),
+            models.Index(fields=['initiator', 'confirmed', 'datetime'], name='qso_initiator_confirmed_idx'),
+            models.Index(fields=['initiator', 'updated_at'], name='qso_initiator_updated_idx'),
         ]
         verbose_name = "QSO Contact"
         verbose_name_plural = "QSO Contacts"
@@ -71,29 +119,168 @@ class QSOContact(models.Model):
         if self.initiator and self.initiator.call_sign == self.recipient:
             raise ValidationError("Cannot log a QSO with yourself")
 
-        # Validate time constraints
-        if self.initiator and self.recipient and self.datetime:
-            hour_before = self.datetime - timedelta(hours=1)
-            
-            # Check for existing QSOs initiated by the same user to the same recipient
+        # Validate time constraints, unless the database does it on insert
+        if self.initiator and self.recipient and self.datetime and not duplicate_window_enforced():
+            # Check for existing QSOs initiated by the same user to the same
+            # recipient, an hour either way as the exclusion constraint does
             existing = QSOContact.objects.filter(
                 initiator=self.initiator,
                 recipient=self.recipient,
-                datetime__gte=hour_before,
-                datetime__lte=self.datetime
+                datetime__gte=self.datetime - timedelta(hours=1),
+                datetime__lte=self.datetime + timedelta(hours=1)
             ).exclude(pk=self.pk).exists()
 
             if existing:
-                raise ValidationError(
-                    "You have already logged a QSO with this station within the last hour. "
-                    "Please wait at least one hour before logging another QSO with the same station."
-                )
+                raise ValidationError(DUPLICATE_WINDOW_MESSAGE)
 
         super().clean()
 
+    def update_derived_fields(self):
+        # Columns computed from other fields; bulk inserts bypass save() and call this themselves
+        self.band = band_for_frequency(self.frequency) if self.frequency is not None else ''
+        try:
+            self.distance_km = maidenhead.distance_km(self.initiator_location, self.recipient_location)
+        except (AttributeError, ValueError):
+            self.distance_km = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # As stored, so that an edit can move the QSO in the counters
+        instance.counted = instance.counted_state()
+        return instance
+
+    def counted_state(self):
+        """COUNTED_FIELDS as set on this instance; None for deferred ones."""
+        return tuple(self.__dict__.get(name) for name in COUNTED_FIELDS)
+
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # A loaded initiator needs no existence query; the foreign key still guards it
+        self.full_clean(exclude=['initiator'] if QSOContact.initiator.is_cached(self) else None)
+        self.update_derived_fields()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.initiator.call_sign} → {self.recipient} ({self.datetime})"
+
+
+
+class QSOTombstone(models.Model):
+    """Marks a deleted QSO so that syncing clients can drop their copy."""
+    initiator = models.ForeignKey(User, related_name='qso_tombstones', on_delete=models.CASCADE)
+    qso_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['initiator', 'deleted_at'], name='qso_tombstone_sync_idx'),
+            models.Index(fields=['deleted_at'], name='qso_tombstone_deleted_idx'),
+        ]
+        verbose_name = "QSO Tombstone"
+        verbose_name_plural = "QSO Tombstones"
+
+    def __str__(self):
+        return f"QSO {self.qso_id} deleted {self.deleted_at}"
+
+class MatchJob(models.Model):
+    """A QSO waiting for the match worker to look for its partner entry."""
+    qso = models.ForeignKey(QSOContact, related_name='match_jobs', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)  # pushed back after a failure
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)  # set once the retries are used up
+
+    class Meta:
+        indexes = [
+            # Workers claim due jobs in run_after order; failed jobs drop out of the index
+            models.Index(
+                fields=['run_after', 'id'], name='match_job_pending_idx',
+                condition=models.Q(failed_at__isnull=True),
+            ),
+        ]
+        verbose_name = "Match Job"
+        verbose_name_plural = "Match Jobs"
+
+    def __str__(self):
+        return f"Match QSO {self.qso_id} (attempt {self.attempts + 1})"
+
+class ContestSession(models.Model):
+    """A contest run of one operator; its QSOs are staged and written to the log in batches."""
+    operator = models.ForeignKey(User, related_name='contest_sessions', on_delete=models.CASCADE)
+    name = models.CharField(max_length=100, blank=True)
+    opened_at = models.DateTimeField(default=timezone.now)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    logged_contacts = models.IntegerField(default=0)  # staged entries written to the log so far
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['operator'], name='contest_session_one_open',
+                condition=models.Q(closed_at__isnull=True),
+            ),
+        ]
+        verbose_name = "Contest Session"
+        verbose_name_plural = "Contest Sessions"
+
+    def __str__(self):
+        return f"{self.operator.call_sign} {self.name or self.opened_at}"
+
+class ContestEntry(models.Model):
+    """A QSO accepted by a contest session and not yet written to the log."""
+    session = models.ForeignKey(ContestSession, related_name='entries', on_delete=models.CASCADE)
+    recipient = models.CharField(max_length=10)
+    frequency = models.DecimalField(max_digits=10, decimal_places=3)
+    mode = models.CharField(max_length=10)
+    datetime = models.DateTimeField()
+    initiator_location = models.CharField(max_length=6)
+    recipient_location = models.CharField(max_length=6)
+    created_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)  # set when the log rejected the entry on flush
+
+    class Meta:
+        indexes = [
+            # Flushers look for sessions with old staged entries; rejected ones drop out
+            models.Index(fields=['created_at'], name='contest_entry_staged_idx', condition=models.Q(error='')),
+        ]
+        verbose_name = "Contest Entry"
+        verbose_name_plural = "Contest Entries"
+
+    def __str__(self):
+        return f"{self.recipient} ({self.datetime})"
+
+class StationStats(models.Model):
+    """Running QSO counters per station, kept in step with QSOContact for the rankings."""
+    user = models.OneToOneField(User, primary_key=True, related_name='station_stats', on_delete=models.CASCADE)
+    total_contacts = models.IntegerField(default=0)
+    confirmed_contacts = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-confirmed_contacts', '-total_contacts', 'user'], name='station_stats_ranking_idx'),
+        ]
+        verbose_name = "Station Stats"
+        verbose_name_plural = "Station Stats"
+
+    def __str__(self):
+        return f"{self.user.call_sign}: {self.confirmed_contacts}/{self.total_contacts}"
+
+
+class StationDailyStats(models.Model):
+    """QSO counters per station, UTC day, band and mode, kept in step with QSOContact."""
+    user = models.ForeignKey(User, related_name='daily_stats', on_delete=models.CASCADE)
+    day = models.DateField()
+    band = models.CharField(max_length=8, blank=True)  # '' outside the band plan
+    mode = models.CharField(max_length=10)
+    total_contacts = models.IntegerField(default=0)
+    confirmed_contacts = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'band', 'mode'], name='station_daily_stats_key'),
+        ]
+        verbose_name = "Station Daily Stats"
+        verbose_name_plural = "Station Daily Stats"
+
+    def __str__(self):
+        return f"{self.user.call_sign} {self.day} {self.band} {self.mode}: {self.confirmed_contacts}/{self.total_contacts}"
@@ -0,0 +1,116 @@
+# qso_logger/pagination.py
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, LimitOffsetPagination
+
+
+class QSOCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a station's log, ordered newest first.
+
+    The cursor position is the composite (datetime, id) key of the last row
+    on the page, so every page is a single index range scan on
+    (initiator, -datetime, -id) no matter how deep the client has paged.
+
+    Pagination is opt-in: requests without ``cursor`` or ``page_size``
+    keep receiving the plain list the dashboard expects.
+    """
+    ordering = ('-datetime', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        if (self.cursor_query_param not in request.query_params and
+                self.page_size_query_param not in request.query_params):
+            return None
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by('datetime', 'id')
+        else:
+            queryset = queryset.order_by('-datetime', '-id')
+
+        # Continue strictly past the (datetime, id) key of the cursor row
+        if current_position is not None:
+            position_datetime, position_id = self._parse_position(current_position)
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'datetime__{lookup}': position_datetime}) |
+                Q(datetime=position_datetime, **{f'id__{lookup}': position_id})
+            )
+
+        # Fetch one extra row to find out whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+
+        # Positions always point at the edge rows of this page: forward links
+        # continue past the oldest row, backward links past the newest row.
+        if self.page:
+            first_position = self._get_position_from_instance(self.page[0], self.ordering)
+            last_position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            first_position = last_position = current_position
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+            self.next_position = first_position
+            self.previous_position = last_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+            self.next_position = last_position
+            self.previous_position = first_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return f"{instance['datetime'].isoformat()}|{instance['id']}"
+        return f"{instance.datetime.isoformat()}|{instance.id}"
+
+    def _parse_position(self, position):
+        try:
+            raw_datetime, raw_id = position.rsplit('|', 1)
+            position_datetime = parse_datetime(raw_datetime)
+            position_id = int(raw_id)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position_datetime is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position_datetime, position_id
+
+
+class RankingsPagination(LimitOffsetPagination):
+    """Rankings are public, so every response is bounded."""
+    default_limit = 100
+    max_limit = 500
@@ -0,0 +1,64 @@
+# qso_logger/renderers.py
+import json
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """``data`` as compact JSON bytes, exactly as JSONRenderer writes it by default."""
+    body = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that serializes with orjson.
+
+    Output is byte-for-byte what JSONRenderer produces in its default compact
+    mode: datetimes and decimals go through DRF's own encoder, and U+2028/9
+    are escaped the same way. Indented or ASCII-only output (settings other
+    than DRF's defaults) is left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (self.get_indent(accepted_media_type, renderer_context) or
+                self.ensure_ascii or not self.compact):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Lets ``?format=`` select an export format during content negotiation.
+
+    Successful exports stream their own body, so only error responses are
+    ever rendered here; those are written out as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
+
+
+class ADIFRenderer(ExportRenderer):
+    media_type = 'text/plain'
+    format = 'adif'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
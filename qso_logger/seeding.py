@@ -0,0 +1,145 @@
+# qso_logger/seeding.py
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from .bands import BAND_PLAN
+from .models import QSOContact, User
+from .stats import rebuild_daily_stats, rebuild_station_stats
+
+# Synthetic logs for benchmarks and load tests. Seeded stations are ordinary
+# approved users whose username starts with SEED_USERNAME_PREFIX.
+SEED_USERNAME_PREFIX = 'seed-'
+SEED_START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# Every station logs at most one QSO per slot, within its first 11 minutes,
+# so no two QSOs of a station fall inside the one-hour duplicate window
+SLOT = timedelta(minutes=75)
+
+CALL_SIGN_PREFIXES = ('SP', 'SQ', 'DL', 'DK', 'OK', 'OM', 'HA', 'YO', 'LY', 'YL', 'ES', 'OH', 'SM', 'LA',
+                      'OZ', 'PA', 'ON', 'F', 'G', 'M', 'EA', 'I', 'IK', 'HB9', 'OE', 'S5', '9A')
+MODES = ('SSB', 'CW', 'FM', 'FT8')
+
+
+def _letters(index, length):
+    letters = ''
+    for _ in range(length):
+        index, remainder = divmod(index, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def random_call_sign(rng, suffix=None):
+    """A plausible call sign; ``suffix`` makes it unique when given."""
+    prefix = rng.choice(CALL_SIGN_PREFIXES)
+    if suffix is None:
+        suffix = _letters(rng.randrange(26 ** 3), rng.choice((2, 3)))
+    return f'{prefix}{rng.randrange(10)}{suffix}'
+
+
+def random_grid(rng):
+    """A six-character locator in Europe (fields IN-LO)."""
+    return (rng.choice('IJKL') + rng.choice('NO') + f'{rng.randrange(10)}{rng.randrange(10)}' +
+            _letters(rng.randrange(24), 1) + _letters(rng.randrange(24), 1))
+
+
+def random_contact(rng):
+    """(frequency, mode) somewhere in a random band of the band plan."""
+    _, low, high = rng.choice(BAND_PLAN)
+    khz = rng.randrange(int(low * 1000), int(high * 1000) + 1)
+    return Decimal(khz) / 1000, rng.choice(MODES)
+
+
+def _create_stations(count, rng):
+    taken = set(User.objects.values_list('call_sign', flat=True))
+    suffix_length = 3 if count <= 26 ** 3 else 4
+    password = make_password(None)
+    users = []
+    for index in range(count):
+        call_sign = random_call_sign(rng, _letters(index, suffix_length))
+        while call_sign in taken:
+            call_sign = random_call_sign(rng, _letters(index, suffix_length))
+        taken.add(call_sign)
+        users.append(User(
+            username=f'{SEED_USERNAME_PREFIX}{index}', email=f'{SEED_USERNAME_PREFIX}{index}@example.invalid',
+            call_sign=call_sign, default_grid_square=random_grid(rng), password=password,
+            is_approved=True, is_active=True,
+        ))
+    # Primary keys come back from bulk_create on PostgreSQL and SQLite
+    return User.objects.bulk_create(users, batch_size=1000)
+
+
+def seed_qsos(users, qsos, mutual_share=0.3, seed=0, batch_size=5000):
+    """
+    Create ``users`` stations and ``qsos`` QSOs between them with bulk_create.
+
+    The same ``seed`` always produces the same data. Time advances in
+    75-minute slots; in each slot a ``mutual_share`` of the stations work
+    each other in confirmed pairs (both logs, crossed locators), and the rest
+    log an unconfirmed contact with another seeded station or with a station
+    that has no account. The counters and rollups are rebuilt at the end.
+    Returns {'users', 'qsos', 'confirmed'}.
+    """
+    if users < 1 or qsos < 0:
+        raise ValueError('users must be positive and qsos not negative')
+    if User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).exists():
+        raise ValueError('The database already contains seeded stations')
+
+    rng = random.Random(seed)
+    with transaction.atomic():
+        stations = _create_stations(users, rng)
+        created = confirmed = 0
+        batch = []
+
+        def log(station, recipient, recipient_grid, frequency, mode, moment, is_confirmed):
+            qso = QSOContact(
+                initiator=station, recipient=recipient, frequency=frequency, mode=mode,
+                datetime=moment, initiator_location=station.default_grid_square,
+                recipient_location=recipient_grid, confirmed=is_confirmed,
+            )
+            qso.update_derived_fields()
+            batch.append(qso)
+            if len(batch) >= batch_size:
+                QSOContact.objects.bulk_create(batch)
+                batch.clear()
+
+        slot = 0
+        while created < qsos:
+            slot_start = SEED_START + slot * SLOT
+            order = rng.sample(stations, len(stations))
+            pairs = int(len(order) * mutual_share) // 2
+            for a, b in zip(order[:2 * pairs:2], order[1:2 * pairs:2]):
+                if created + 2 > qsos:
+                    break
+                frequency, mode = random_contact(rng)
+                moment = slot_start + timedelta(seconds=rng.randrange(600))
+                log(a, b.call_sign, b.default_grid_square, frequency, mode, moment, True)
+                log(b, a.call_sign, a.default_grid_square, frequency, mode,
+                    moment + timedelta(seconds=rng.randrange(61)), True)
+                created += 2
+                confirmed += 2
+            for station in order[2 * pairs:]:
+                if created >= qsos:
+                    break
+                others = len(stations) > 1 and rng.random() < 0.5
+                if others:
+                    recipient = rng.choice(stations)
+                    while recipient is station:
+                        recipient = rng.choice(stations)
+                    call_sign, grid = recipient.call_sign, recipient.default_grid_square
+                else:
+                    call_sign, grid = random_call_sign(rng), random_grid(rng)
+                    if call_sign == station.call_sign:
+                        continue
+                frequency, mode = random_contact(rng)
+                log(station, call_sign, grid, frequency, mode,
+                    slot_start + timedelta(seconds=rng.randrange(600)), False)
+                created += 1
+            slot += 1
+
+        if batch:
+            QSOContact.objects.bulk_create(batch)
+        rebuild_station_stats()
+        rebuild_daily_stats()
+    return {'users': users, 'qsos': created, 'confirmed': confirmed}
@@ -1,11 +1,11 @@
 # qso_logger/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.core.validators import RegexValidator
-from django.core.exceptions import ValidationError
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 import re
-from .models import User, QSOContact
+from .models import DUPLICATE_WINDOW_CONSTRAINT, DUPLICATE_WINDOW_MESSAGE, ContestEntry, ContestSession, User, QSOContact
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -80,9 +80,9 @@ class QSOContactSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'initiator', 'initiator_callsign', 'recipient',
             'frequency', 'mode', 'datetime', 'initiator_location',
-            'recipient_location', 'confirmed'
+            'recipient_location', 'confirmed', 'band', 'distance_km'
         )
-        read_only_fields = ('confirmed', 'initiator')
+        read_only_fields = ('confirmed', 'initiator', 'band', 'distance_km')
 
     def validate_initiator_location(self, value):
         if value:
@@ -101,6 +101,8 @@ class QSOContactSerializer(serializers.ModelSerializer):
     def validate(self, data):
         if 'recipient' in data:
             data['recipient'] = data['recipient'].upper()
+        if 'mode' in data:
+            data['mode'] = data['mode'].upper()
         if 'initiator_location' in data:
             data['initiator_location'] = data['initiator_location'].upper()
         if 'recipient_location' in data:
@@ -120,15 +122,24 @@ class QSOContactSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
+        return self._save_checked(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_checked(super().update, instance, validated_data)
+
+    def _save_checked(self, save, *args):
+        # QSOContact.save() runs full_clean(), so the model rules are checked once
         try:
-            instance = QSOContact(**validated_data)
-            instance.clean()
-            return super().create(validated_data)
+            with transaction.atomic():
+                return save(*args)
         except ValidationError as e:
             if hasattr(e, 'message_dict'):
                 raise serializers.ValidationError(e.message_dict)
             raise serializers.ValidationError(str(e))
-        except IntegrityError:
+        except IntegrityError as e:
+            if DUPLICATE_WINDOW_CONSTRAINT in str(e):
+                # Same response clean() gives where the database doesn't enforce the window
+                raise serializers.ValidationError({NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]})
             raise serializers.ValidationError({
                 "error": "You already have a QSO logged with this station at this exact time. "
                         "Please wait at least one minute between logging contacts with the same station."
@@ -163,3 +174,19 @@ class CallSignSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('call_sign',)
+
+class ContestSessionSerializer(serializers.ModelSerializer):
+    # Annotated by the view: entries waiting for a flush, and entries the log rejected
+    staged_contacts = serializers.IntegerField(read_only=True)
+    rejected_contacts = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ContestSession
+        fields = ('id', 'name', 'opened_at', 'closed_at', 'logged_contacts', 'staged_contacts', 'rejected_contacts')
+        read_only_fields = ('opened_at', 'closed_at', 'logged_contacts')
+
+class ContestEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContestEntry
+        fields = ('id', 'recipient', 'frequency', 'mode', 'datetime', 'initiator_location',
+                  'recipient_location', 'created_at', 'error')
@@ -0,0 +1,103 @@
+# qso_logger/signals.py
+import threading
+from contextlib import contextmanager
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import cache
+from .models import COUNTED_FIELDS, QSOContact, QSOTombstone, StationStats, User
+from .stats import qso_rollup_key, record_changed, record_confirmed, record_created, record_deletions, rollup_key
+
+
+@receiver(post_save, sender=User)
+def create_station_stats(sender, instance, created, raw=False, **kwargs):
+    # Every station appears in the rankings from the moment it registers
+    if created and not raw:
+        StationStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which nothing cached depends on
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    cache.delete(cache.AUTH_USERS, instance.pk)
+    # Only the search prefixes that can return this call sign are affected
+    for length in range(2, len(instance.call_sign) + 1):
+        cache.delete(cache.CALLSIGNS, instance.call_sign[:length])
+    cache.invalidate(cache.RANKINGS)
+    cache.invalidate(cache.user_stats_namespace(instance.pk))
+
+
+@receiver(post_save, sender=QSOContact)
+def invalidate_qso_caches(sender, instance, **kwargs):
+    cache.invalidate(cache.user_stats_namespace(instance.initiator_id))
+
+
+# QSOs saved one at a time, through the API, the admin or anywhere else, are
+# counted here; the bulk paths (create_batch, imports, matching) count theirs
+@receiver(pre_save, sender=QSOContact)
+def read_counted_state(sender, instance, raw=False, **kwargs):
+    # An edit of an instance that was not loaded whole reads the stored values first
+    if raw or instance._state.adding or None not in getattr(instance, 'counted', (None,)):
+        return
+    instance.counted = QSOContact.objects.filter(pk=instance.pk).values_list(*COUNTED_FIELDS).first()
+
+
+@receiver(post_save, sender=QSOContact)
+def count_saved_qso(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous, instance.counted = getattr(instance, 'counted', None), instance.counted_state()
+    key = qso_rollup_key(instance)
+    if created:
+        record_created([key])
+        if instance.confirmed:
+            record_confirmed([key])
+    elif previous is not None and previous != instance.counted:
+        record_changed(rollup_key(*previous[:4]), previous[4], key, instance.confirmed)
+
+
+# QuerySet.delete() (QSOContactQuerySet) collects the QSOs it deletes here
+# and discounts them together once the delete is done, instead of one
+# counter UPDATE, invalidation and tombstone INSERT per row
+_bulk = threading.local()
+
+
+@contextmanager
+def bulk_qso_deletes():
+    if getattr(_bulk, 'deleted', None) is not None:
+        yield
+        return
+    _bulk.deleted = deleted = []
+    try:
+        yield
+    finally:
+        _bulk.deleted = None
+    _discount(deleted)
+
+
+def _discount(deleted):
+    # ``deleted`` holds (pk, rollup key, confirmed) tuples: the collector
+    # clears the primary keys of the instances once the delete is done
+    if not deleted:
+        return
+    # Invalidates the rankings and the stations' statistics
+    record_deletions([(key, confirmed) for _, key, confirmed in deleted])
+    QSOTombstone.objects.bulk_create(
+        [QSOTombstone(initiator_id=key[0], qso_id=pk) for pk, key, _ in deleted]
+    )
+
+
+@receiver(post_delete, sender=QSOContact)
+def discount_deleted_qso(sender, instance, origin=None, **kwargs):
+    # A deleted station's counters and rollups are deleted with it, and it has
+    # no log left to sync; its tombstones would point at a user being removed
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    entry = (instance.pk, qso_rollup_key(instance), instance.confirmed)
+    deleted = getattr(_bulk, 'deleted', None)
+    if deleted is not None:
+        deleted.append(entry)
+    else:
+        _discount([entry])
@@ -0,0 +1,147 @@
+# qso_logger/slow_queries.py
+import itertools
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Captured queries live in a per-process ring buffer; the oldest entries are
+# dropped once SLOW_QUERY_BUFFER_SIZE is reached.
+APP_DIR = str(Path(__file__).parent)
+STACK_DEPTH = 6
+
+_lock = threading.Lock()
+_entries = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+_ids = itertools.count(1)
+
+
+def _call_site():
+    """The innermost qso_logger frames that issued the query, outermost first."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(APP_DIR) and frame.filename != __file__
+    ]
+    return [
+        f'{Path(frame.filename).relative_to(APP_DIR)}:{frame.lineno} {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+def _explain(connection, sql, params, analyze=False):
+    """
+    Plan of ``sql`` on a fresh cursor, so the caller's result set survives.
+
+    On PostgreSQL captured queries get a plain EXPLAIN, which plans without
+    executing; ``analyze`` runs the query again under EXPLAIN (ANALYZE,
+    BUFFERS), which is only done on demand from the admin (see analyze()).
+    Inside a transaction this happens in a savepoint, so a failing EXPLAIN
+    cannot abort the caller's transaction. SQLite only has the query plan.
+    """
+    postgresql = connection.vendor == 'postgresql'
+    if postgresql:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    else:
+        prefix = 'EXPLAIN QUERY PLAN '
+    savepoint = postgresql and connection.in_atomic_block
+    cursor = connection.create_cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT qso_slow_query_explain')
+        try:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        except Exception as e:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT qso_slow_query_explain')
+            return f'EXPLAIN failed: {e}'
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT qso_slow_query_explain')
+    finally:
+        cursor.close()
+    if postgresql:
+        return '\n'.join(row[0] for row in rows)
+    # (id, parent, notused, detail)
+    return '\n'.join(row[-1] for row in rows)
+
+
+def _is_select(sql):
+    return sql.lstrip()[:6].upper() == 'SELECT'
+
+
+def capture(execute, sql, params, many, context):
+    """``execute_wrapper`` that records queries slower than SLOW_QUERY_THRESHOLD_MS."""
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return result
+
+    connection = context['connection']
+    plan = None
+    if not many and _is_select(sql) and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        plan = _explain(connection, sql, params)
+    entry = {
+        'id': next(_ids),
+        'at': timezone.now().isoformat(),
+        'duration_ms': round(duration_ms, 3),
+        'vendor': connection.vendor,
+        'sql': sql,
+        'params': [repr(param) for param in params or ()] if not many else None,
+        'call_site': _call_site(),
+        'plan': plan,
+        'analyzed_plan': None,
+        # Kept for analyze(), left out of entries()
+        'alias': connection.alias,
+        'raw_params': params if not many else None,
+    }
+    with _lock:
+        _entries.append(entry)
+    return result
+
+
+def install(connection, **kwargs):
+    """
+    ``connection_created`` receiver adding ``capture`` as the outermost wrapper.
+
+    It goes to the front because ``connection.execute_wrapper()`` blocks that
+    are open while the connection is made pop the last wrapper on exit.
+    Connections are reopened on the same wrapper, so check first.
+    """
+    if capture not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, capture)
+
+
+def entries():
+    """Captured queries, newest first."""
+    with _lock:
+        return [
+            {key: value for key, value in entry.items() if key not in ('alias', 'raw_params')}
+            for entry in reversed(_entries)
+        ]
+
+
+def analyze(entry_id):
+    """
+    Run the captured SELECT ``entry_id`` again under EXPLAIN (ANALYZE, BUFFERS).
+
+    The plan is stored on the entry and returned; None when the entry has
+    been dropped from the buffer or is not a single SELECT.
+    """
+    with _lock:
+        entry = next((entry for entry in _entries if entry['id'] == entry_id), None)
+    if entry is None or entry['params'] is None or not _is_select(entry['sql']):
+        return None
+    plan = _explain(connections[entry['alias']], entry['sql'], entry['raw_params'], analyze=True)
+    with _lock:
+        entry['analyzed_plan'] = plan
+    return plan
+
+
+def clear():
+    with _lock:
+        _entries.clear()
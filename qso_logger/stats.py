@@ -0,0 +1,191 @@
+# qso_logger/stats.py
+from collections import Counter
+from datetime import timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from . import cache
+from .models import StationDailyStats, StationStats, User, QSOContact
+
+ROLLUP_BATCH = 200  # keys per UPDATE of the daily rollups
+
+
+def rollup_key(initiator_id, moment, band, mode):
+    """The (user_id, UTC day, band, mode) rollup row a QSO is counted in."""
+    return (initiator_id, moment.astimezone(dt_timezone.utc).date(), band, mode)
+
+
+def qso_rollup_key(qso):
+    return rollup_key(qso.initiator_id, qso.datetime, qso.band, qso.mode)
+
+
+def _bump(deltas, create_missing=True):
+    """
+    Apply {user_id: (total_delta, confirmed_delta)} to the station counters.
+
+    Users sharing the same delta are updated by one UPDATE. Missing counter
+    rows are created on demand for increments; decrements never create rows,
+    so a cascading user delete cannot resurrect its counters.
+    """
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta != (0, 0):
+            by_delta.setdefault(delta, []).append(user_id)
+
+    if not by_delta:
+        return
+    cache.invalidate(cache.RANKINGS)
+    for user_id in deltas:
+        cache.invalidate(cache.user_stats_namespace(user_id))
+
+    for (total_delta, confirmed_delta), user_ids in by_delta.items():
+        counters = StationStats.objects.filter(user_id__in=user_ids)
+        updated = counters.update(
+            total_contacts=F('total_contacts') + total_delta,
+            confirmed_contacts=F('confirmed_contacts') + confirmed_delta,
+        )
+        if updated == len(user_ids) or not create_missing:
+            continue
+
+        existing = set(counters.values_list('user_id', flat=True))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        StationStats.objects.bulk_create(
+            [StationStats(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        StationStats.objects.filter(user_id__in=missing).update(
+            total_contacts=F('total_contacts') + total_delta,
+            confirmed_contacts=F('confirmed_contacts') + confirmed_delta,
+        )
+
+
+def _rollup_filter(keys):
+    condition = Q()
+    for user_id, day, band, mode in keys:
+        condition |= Q(user_id=user_id, day=day, band=band, mode=mode)
+    return StationDailyStats.objects.filter(condition)
+
+
+def _bump_rollups(deltas, create_missing=True):
+    """
+    Apply {rollup_key: (total_delta, confirmed_delta)} to the daily rollups.
+
+    Works like ``_bump``: keys sharing a delta are updated together, a few
+    hundred per UPDATE, and missing rows are only created for increments.
+    """
+    by_delta = {}
+    for key, delta in deltas.items():
+        if delta != (0, 0):
+            by_delta.setdefault(delta, []).append(key)
+
+    for (total_delta, confirmed_delta), keys in by_delta.items():
+        for offset in range(0, len(keys), ROLLUP_BATCH):
+            batch = keys[offset:offset + ROLLUP_BATCH]
+            rollups = _rollup_filter(batch)
+            updated = rollups.update(
+                total_contacts=F('total_contacts') + total_delta,
+                confirmed_contacts=F('confirmed_contacts') + confirmed_delta,
+            )
+            if updated == len(batch) or not create_missing:
+                continue
+
+            existing = set(rollups.values_list('user_id', 'day', 'band', 'mode'))
+            missing = [key for key in batch if key not in existing]
+            StationDailyStats.objects.bulk_create(
+                [StationDailyStats(user_id=user_id, day=day, band=band, mode=mode)
+                 for user_id, day, band, mode in missing],
+                ignore_conflicts=True,
+            )
+            _rollup_filter(missing).update(
+                total_contacts=F('total_contacts') + total_delta,
+                confirmed_contacts=F('confirmed_contacts') + confirmed_delta,
+            )
+
+
+def _record(keys, total, confirmed, create_missing=True):
+    # Each key stands for one QSO, so repeated keys add up
+    per_key = Counter(keys)
+    per_user = Counter()
+    for key, n in per_key.items():
+        per_user[key[0]] += n
+    _bump({user_id: (total * n, confirmed * n) for user_id, n in per_user.items()}, create_missing)
+    _bump_rollups({key: (total * n, confirmed * n) for key, n in per_key.items()}, create_missing)
+
+
+def record_created(keys):
+    """Count newly logged QSOs, given one rollup key per QSO."""
+    _record(keys, 1, 0)
+
+
+def record_confirmed(keys):
+    """Count one confirmation per rollup key in ``keys`` (keys may repeat)."""
+    _record(keys, 0, 1)
+
+
+def record_deletions(deletions):
+    """Take deleted QSOs, given as (rollup key, confirmed) pairs, out of the counters at once."""
+    per_user, per_key = {}, {}
+    for key, confirmed in deletions:
+        for deltas, target in ((per_user, key[0]), (per_key, key)):
+            total, confirmed_total = deltas.get(target, (0, 0))
+            deltas[target] = (total - 1, confirmed_total - (1 if confirmed else 0))
+    _bump(per_user, create_missing=False)
+    _bump_rollups(per_key, create_missing=False)
+
+
+def record_changed(old_key, old_confirmed, new_key, new_confirmed):
+    """Move an edited QSO between stations, rollup rows and confirmation counts."""
+    old = (1, 1 if old_confirmed else 0)
+    new = (1, 1 if new_confirmed else 0)
+    if (old_key, old) == (new_key, new):
+        return
+    for bump, old_target, new_target in ((_bump, old_key[0], new_key[0]), (_bump_rollups, old_key, new_key)):
+        if old_target == new_target:
+            bump({new_target: (0, new[1] - old[1])}, create_missing=False)
+        else:
+            bump({old_target: (-old[0], -old[1])}, create_missing=False)
+            bump({new_target: new})
+    cache.invalidate(cache.RANKINGS)
+    for user_id in {old_key[0], new_key[0]}:
+        cache.invalidate(cache.user_stats_namespace(user_id))
+
+
+def rebuild_station_stats(batch_size=1000):
+    """Recompute every station's counters from QSOContact. Returns the row count."""
+    counts = User.objects.annotate(
+        total=Count('initiated_contacts'),
+        confirmed=Count('initiated_contacts', filter=Q(initiated_contacts__confirmed=True)),
+    ).values_list('pk', 'total', 'confirmed')
+
+    with transaction.atomic():
+        StationStats.objects.all().delete()
+        rows = [
+            StationStats(user_id=pk, total_contacts=total, confirmed_contacts=confirmed)
+            for pk, total, confirmed in counts.iterator()
+        ]
+        StationStats.objects.bulk_create(rows, batch_size=batch_size)
+        cache.invalidate(cache.RANKINGS)
+    return len(rows)
+
+
+def rebuild_daily_stats(batch_size=1000):
+    """Recompute the per-day rollups from QSOContact. Returns the row count."""
+    groups = QSOContact.objects.values(
+        'initiator_id', 'band', 'mode', day=TruncDate('datetime', tzinfo=dt_timezone.utc)
+    ).annotate(
+        total=Count('id'), confirmed=Count('id', filter=Q(confirmed=True))
+    ).order_by()
+
+    with transaction.atomic():
+        affected = set(StationDailyStats.objects.values_list('user_id', flat=True).distinct())
+        StationDailyStats.objects.all().delete()
+        rows = [
+            StationDailyStats(user_id=row['initiator_id'], day=row['day'], band=row['band'], mode=row['mode'],
+                              total_contacts=row['total'], confirmed_contacts=row['confirmed'])
+            for row in groups.iterator()
+        ]
+        StationDailyStats.objects.bulk_create(rows, batch_size=batch_size)
+        affected.update(row.user_id for row in rows)
+        for user_id in affected:
+            cache.invalidate(cache.user_stats_namespace(user_id))
+    return len(rows)
@@ -0,0 +1,75 @@
+# qso_logger/sync.py
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework import serializers
+from .models import QSOContact, QSOTombstone, StationStats, User
+
+
+def encode_token(moment):
+    """Opaque sync token for a point in time (microseconds since the epoch)."""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_token(token, param='changes_since'):
+    try:
+        return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise serializers.ValidationError({param: 'Invalid sync token'})
+
+
+def token_expired(moment):
+    """True when deletions before ``moment`` may already have been pruned."""
+    return moment < timezone.now() - timedelta(days=settings.QSO_TOMBSTONE_RETENTION_DAYS)
+
+
+def log_state(user, variant=''):
+    """
+    (last_modified, etag) of a station's log as seen through ``variant``.
+
+    One query: the newest updated_at and deleted_at over the (initiator,
+    updated_at) and (initiator, deleted_at) indexes, and the station's
+    maintained QSO count, which covers deletions whose tombstones have been
+    pruned. ``variant`` (filters, page, format) keeps different views of the
+    same log from sharing an ETag.
+    """
+    state = User.objects.filter(pk=user.pk).annotate(
+        last_updated=Subquery(
+            QSOContact.objects.filter(initiator=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+        ),
+        last_deleted=Subquery(
+            QSOTombstone.objects.filter(initiator=OuterRef('pk')).order_by('-deleted_at').values('deleted_at')[:1]
+        ),
+        count=Subquery(StationStats.objects.filter(user=OuterRef('pk')).values('total_contacts')),
+    ).values('last_updated', 'last_deleted', 'count').first() or {}
+    moments = [moment for moment in (state.get('last_updated'), state.get('last_deleted')) if moment is not None]
+    last_modified = max(moments) if moments else None
+    fingerprint = f"{user.pk}:{state.get('count')}:{encode_token(last_modified) if last_modified else ''}:{variant}"
+    return last_modified, quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+
+
+def changes_since(user, moment):
+    """
+    QSOs changed and ids deleted since ``moment``, re-reading a leeway window.
+
+    ``updated_at`` is stamped before a transaction commits, so a row can
+    become visible after a sync that started later than its timestamp. Going
+    back QSO_SYNC_LEEWAY_SECONDS catches those; clients apply changes as
+    upserts, so rows seen twice do no harm.
+    """
+    start = moment - timedelta(seconds=settings.QSO_SYNC_LEEWAY_SECONDS)
+    changed = QSOContact.objects.filter(initiator=user, updated_at__gte=start).order_by('updated_at', 'id')
+    deleted = QSOTombstone.objects.filter(
+        initiator=user, deleted_at__gte=start
+    ).order_by('deleted_at').values_list('qso_id', flat=True)
+    return changed, list(deleted)
+
+
+def prune_tombstones(days=None):
+    """Delete tombstones older than the retention period. Returns the count."""
+    days = settings.QSO_TOMBSTONE_RETENTION_DAYS if days is None else days
+    deleted, _ = QSOTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -1,3 +1,1785 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import math
+import re
+import threading
+from unittest import mock, skipUnless
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.conf import settings
+from django.contrib.admin import site as admin_site
+from django.core.cache import cache as django_cache
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from . import adif, cache, contest, slow_queries
+from .admin import CustomUserAdmin
+from .cache_backends import LocalRedis
+from .batch import create_batch
+from .filters import filter_qsos
+from .importer import import_log
+from .management.commands.run_match_worker import Command as RunMatchWorker
+from .jobs import enqueue_match, process_batch, queue_stats
+from .maidenhead import bearing, bearings, distance_km, distances_km, to_latlon
+from .matching import confirm_match
+from .models import (
+    DUPLICATE_WINDOW_CONSTRAINT, DUPLICATE_WINDOW_MESSAGE, ContestEntry, ContestSession, MatchJob, QSOContact, QSOTombstone,
+    StationDailyStats, StationStats, User,
+)
+from .serializers import QSOContactSerializer
+from .seeding import SEED_USERNAME_PREFIX, seed_qsos
+from .stats import rebuild_daily_stats, rebuild_station_stats
+from .sync import encode_token, prune_tombstones
 
-# Create your tests here.
+# Filter combinations accepted by /api/qsos/
+FILTER_COMBINATIONS = [
+    {},
+    {'since': '2024-01-01'},
+    {'since': '2024-01-01', 'until': '2024-02-01'},
+    {'band': '2m'},
+    {'band': '70cm', 'since': '2024-01-01'},
+    {'mode': 'FM'},
+    {'mode': 'SSB', 'until': '2024-02-01'},
+    {'recipient': 'DL'},
+    {'recipient': 'DL1', 'since': '2024-01-01'},
+    {'freq_min': '144', 'freq_max': '146'},
+    {'confirmed': 'true'},
+    {'confirmed': 'false', 'band': '2m', 'mode': 'FM'},
+    {'recipient': 'DL', 'mode': 'FM', 'freq_min': '145', 'confirmed': 'false'},
+]
+
+
+def make_user(call_sign):
+    return User.objects.create_user(
+        username=call_sign.lower(), email=f'{call_sign.lower()}@example.com', call_sign=call_sign,
+        default_grid_square='JO91AA', password='secret', is_approved=True,
+    )
+
+
+class QSOFilterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('SP5AAA')
+        cls.other = make_user('SP6BBB')
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        qsos = []
+        for index in range(60):
+            for initiator in (cls.user, cls.other):
+                qso = QSOContact(
+                    initiator=initiator,
+                    recipient=('DL', 'OK', 'G')[index % 3] + f'{index}ABC',
+                    frequency=(Decimal('145.500'), Decimal('432.100'))[index % 2],
+                    mode=('FM', 'SSB')[index % 2],
+                    datetime=start + timedelta(hours=index * 13),
+                    initiator_location='JO91AA',
+                    recipient_location='JO62AA',
+                    confirmed=index % 4 == 0,
+                )
+                qso.update_derived_fields()
+                qsos.append(qso)
+        QSOContact.objects.bulk_create(qsos)
+
+    def station_queryset(self, params):
+        queryset = QSOContact.objects.filter(initiator=self.user).order_by('-datetime', '-id')
+        return filter_qsos(queryset, params)
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny; make the planner show which index it would use
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertScopedToInitiator(self, params):
+        plan = self.explain(self.station_queryset(params))
+        initiator_indexes = [
+            index.name for index in QSOContact._meta.indexes if index.fields[0] == 'initiator'
+        ]
+        self.assertTrue(
+            any(name in plan for name in initiator_indexes),
+            f'{params} does not use an initiator index:\n{plan}'
+        )
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan, f'{params}:\n{plan}')
+        else:
+            self.assertIn('initiator_id=?', plan, f'{params}:\n{plan}')
+            self.assertNotRegex(plan, r'\bSCAN qso_logger_qsocontact\b', f'{params}:\n{plan}')
+
+    def test_every_filter_combination_uses_an_initiator_index(self):
+        for params in FILTER_COMBINATIONS:
+            with self.subTest(params=params):
+                self.assertScopedToInitiator(params)
+
+    def test_dedicated_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Only SQLite picks indexes deterministically without table statistics")
+        for params, index_name in (
+            ({'band': '2m'}, 'qso_initiator_band_dt_idx'),
+            ({'mode': 'FM'}, 'qso_initiator_mode_dt_idx'),
+            ({'freq_min': '144', 'freq_max': '146'}, 'qso_initiator_frequency_idx'),
+            ({'since': '2024-01-01'}, 'qso_initiator_dt_id_idx'),
+        ):
+            with self.subTest(params=params):
+                self.assertIn(index_name, self.explain(self.station_queryset(params)))
+
+    def test_list_filters(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        own = QSOContact.objects.filter(initiator=self.user)
+
+        def ids(query):
+            response = client.get(f'/api/qsos/?{query}')
+            self.assertEqual(response.status_code, 200, response.content)
+            return {qso['id'] for qso in response.json()}
+
+        self.assertEqual(ids('band=70cm'), set(own.filter(band='70cm').values_list('id', flat=True)))
+        self.assertEqual(ids('mode=fm'), set(own.filter(mode='FM').values_list('id', flat=True)))
+        self.assertEqual(ids('recipient=dl'), set(own.filter(recipient__startswith='DL').values_list('id', flat=True)))
+        self.assertEqual(ids('freq_min=400'), set(own.filter(frequency__gte=400).values_list('id', flat=True)))
+        self.assertEqual(
+            ids('confirmed=true&since=2024-01-10'),
+            set(own.filter(confirmed=True, datetime__gte='2024-01-10T00:00Z').values_list('id', flat=True))
+        )
+        for query in ('band=3cm', 'freq_min=abc', 'confirmed=maybe', 'recipient=D-', 'since=yesterday',
+                      'until=2024-13-01'):
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f'/api/qsos/?{query}').status_code, 400)
+
+
+class QSOListTestCase(TestCase):
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        for index, (frequency, mode, grid) in enumerate((
+            ('145.500', 'FM', 'JO62AA'),
+            ('432.100', 'SSB', 'JO91ZZ'),
+            ('7.074', 'FT8', 'IO91WM'),
+            ('1296.200', 'CW', 'JO62AA'),
+        )):
+            qso = QSOContact.objects.create(
+                initiator=self.user, recipient=f'DL{index}ABC', frequency=Decimal(frequency), mode=mode,
+                datetime=start + timedelta(minutes=index * 7, microseconds=index * 1234),
+                initiator_location='JO91AA', recipient_location=grid,
+            )
+        QSOContact.objects.filter(pk=qso.pk).update(confirmed=True)
+
+    def test_fast_path_matches_the_serializer(self):
+        response = self.client.get('/api/qsos/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(None, [row['distance_km'] for row in response.json()])
+        queryset = QSOContact.objects.filter(initiator=self.user).order_by('-datetime', '-id')
+        self.assertEqual(
+            response.content, JSONRenderer().render(QSOContactSerializer(queryset, many=True).data)
+        )
+
+    def pages(self, url, link):
+        """Follow ``link`` from ``url`` and return the ids on each page."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            pages.append([row['id'] for row in body['results']])
+            url = body[link]
+        return pages
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        # QSOs sharing a datetime are told apart by id
+        moment = datetime(2024, 3, 1, 12, 10, tzinfo=dt_timezone.utc)
+        QSOContact.objects.bulk_create([
+            QSOContact(initiator=self.user, recipient=f'OK{index}ABC', frequency=Decimal('145.500'), band='2m',
+                       mode='FM', datetime=moment, initiator_location='JO91AA', recipient_location='JO62AA')
+            for index in range(7)
+        ])
+        expected = list(
+            QSOContact.objects.filter(initiator=self.user).order_by('-datetime', '-id').values_list('id', flat=True)
+        )
+        forward = self.pages('/api/qsos/?page_size=3', 'next')
+        self.assertEqual([len(page) for page in forward], [3, 3, 3, 2])
+        self.assertEqual(sum(forward, []), expected)
+
+        last = self.client.get('/api/qsos/?page_size=3').json()
+        while last['next']:
+            last = self.client.get(last['next']).json()
+        self.assertIsNone(self.client.get('/api/qsos/?page_size=3').json()['previous'])
+        backward = self.pages(last['previous'], 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_bad_cursor_is_not_found(self):
+        positions = (b'p=yesterday|1', b'p=2024-03-01T12:00:00+00:00|x', b'p=nothing')
+        for cursor in ['garbage'] + [base64.b64encode(position).decode() for position in positions]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/qsos/', {'cursor': cursor}).status_code, 404)
+
+    def test_list_without_a_page_is_a_plain_list(self):
+        body = self.client.get('/api/qsos/').json()
+        self.assertIsInstance(body, list)
+        self.assertEqual(len(body), 4)
+        body = self.client.get('/api/qsos/?page_size=2').json()
+        self.assertEqual(set(body), {'next', 'previous', 'results'})
+        self.assertEqual(len(body['results']), 2)
+
+
+class BatchTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+
+    def entry(self, recipient, minutes):
+        return {
+            'recipient': recipient, 'frequency': Decimal('145.500'), 'mode': 'FM',
+            'datetime': self.START + timedelta(minutes=minutes),
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+        }
+
+    def test_duplicate_window_both_ways(self):
+        QSOContact.objects.create(initiator=self.user, **self.entry('DL1LTR', 30))
+        results = create_batch(self.user, [
+            ('later', self.entry('DL2OOO', 120)),
+            # Out of order: within the hour before the previous entry
+            ('earlier', self.entry('DL2OOO', 70)),
+            # Within the hour before a QSO already in the log
+            ('before_logged', self.entry('DL1LTR', 0)),
+            ('clear', self.entry('DL1LTR', 91)),
+        ])
+        self.assertIsInstance(results['later'], QSOContact)
+        self.assertIsInstance(results['clear'], QSOContact)
+        self.assertEqual(results['earlier'], {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]})
+        self.assertEqual(results['before_logged'], {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]})
+        self.assertEqual(QSOContact.objects.count(), 3)
+
+    def test_modes_are_stored_uppercase(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        entry = dict(self.entry('DL1ABC', 0), frequency='145.500', mode='fm', datetime=self.START.isoformat())
+        created = api.post('/api/qsos/', entry, format='json').json()
+        self.assertEqual(created['mode'], 'FM')
+        entry.update(recipient='DL2ABC', mode='ssb')
+        batch = api.post('/api/qsos/batch/', [entry], format='json').json()
+        self.assertEqual(api.patch(f"/api/qsos/{created['id']}/", {'mode': 'cw'}, format='json').json()['mode'], 'CW')
+        self.assertEqual(QSOContact.objects.get(pk=batch['results'][0]['id']).mode, 'SSB')
+        self.assertEqual([qso['recipient'] for qso in api.get('/api/qsos/?mode=ssb').json()], ['DL2ABC'])
+
+    def test_duplicate_error_matches_single_create(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        entry = dict(self.entry('DL1ABC', 0), frequency='145.500', datetime=self.START.isoformat())
+        self.assertEqual(api.post('/api/qsos/', entry, format='json').status_code, 201)
+        entry['datetime'] = (self.START + timedelta(minutes=30)).isoformat()
+        single = api.post('/api/qsos/', entry, format='json')
+        self.assertEqual(single.status_code, 400)
+        batch = api.post('/api/qsos/batch/', [entry], format='json')
+        self.assertEqual(batch.status_code, 400)
+        self.assertEqual(batch.json()['results'][0]['errors'], single.json())
+        self.assertEqual(single.json(), {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]})
+
+    def test_concurrent_conflict_falls_back_to_single_inserts(self):
+        bulk_create = QSOContact.objects.bulk_create
+
+        def conflicting(qsos, *args, **kwargs):
+            # A QSO with DL9RCE committed after the range query
+            if any(qso.recipient == 'DL9RCE' for qso in qsos):
+                raise IntegrityError(f'conflicting key value violates exclusion constraint "{DUPLICATE_WINDOW_CONSTRAINT}"')
+            return bulk_create(qsos, *args, **kwargs)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(QSOContact.objects, 'bulk_create', side_effect=conflicting):
+            response = client.post('/api/qsos/batch/', [
+                {**self.entry(call_sign, 0), 'datetime': self.START.isoformat(), 'frequency': '145.500'}
+                for call_sign in ('DL1OKK', 'DL9RCE')
+            ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['status'] for item in response.data['results']], ['created', 'error'])
+        self.assertEqual(list(QSOContact.objects.values_list('recipient', flat=True)), ['DL1OKK'])
+
+
+class ImportTestCase(TestCase):
+    """Runs the COPY merge on PostgreSQL and the batched inserts elsewhere."""
+
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+
+    @staticmethod
+    def adif(*records):
+        lines = ['Test log <EOH>']
+        for call_sign, frequency, moment, grid in records:
+            lines.append(
+                f'<CALL:{len(call_sign)}>{call_sign}<FREQ:{len(frequency)}>{frequency}<MODE:2>FM'
+                f'<QSO_DATE:8>{moment:%Y%m%d}<TIME_ON:4>{moment:%H%M}'
+                f'<GRIDSQUARE:{len(grid)}>{grid}<MY_GRIDSQUARE:6>JO91AA<EOR>'
+            )
+        return StringIO('\n'.join(lines))
+
+    def test_frequency_outside_the_band_plan(self):
+        moment = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        report = import_log(self.user, self.adif(
+            ('DL1CBR', '27.185', moment, 'JO62AA'),
+            ('DL2VHF', '145.500', moment, 'JO62AA'),
+        ))
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(dict(QSOContact.objects.values_list('recipient', 'band')), {'DL1CBR': '', 'DL2VHF': '2m'})
+
+    def test_locator_off_the_map(self):
+        # JO91ZZ has the grid square format, but subsquares end at X
+        moment = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        report = import_log(self.user, self.adif(
+            ('DL1OFF', '145.500', moment, 'JO91ZZ'),
+            ('DL2ON', '145.500', moment, 'JO62AA'),
+        ))
+        self.assertEqual(report.inserted, 2)
+        distances = dict(QSOContact.objects.values_list('recipient', 'distance_km'))
+        self.assertIsNone(distances['DL1OFF'])
+        self.assertAlmostEqual(distances['DL2ON'], distance_km('JO91AA', 'JO62AA'), places=3)
+
+
+    def test_duplicates_self_qsos_and_matching(self):
+        moment = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        partner = make_user('DL2REP')
+        QSOContact.objects.create(
+            initiator=self.user, recipient='DL1LOG', frequency=Decimal('145.500'), mode='FM',
+            datetime=moment - timedelta(minutes=55), initiator_location='JO91AA', recipient_location='JO62AA',
+        )
+        QSOContact.objects.create(
+            initiator=partner, recipient='SP5AAA', frequency=Decimal('145.500'), mode='FM',
+            datetime=moment + timedelta(minutes=101), initiator_location='JO62AA', recipient_location='JO91AA',
+        )
+        report = import_log(self.user, self.adif(
+            # Within the hour after the logged QSO, then clear of it
+            ('DL1LOG', '145.500', moment, 'JO62AA'),
+            ('DL1LOG', '145.500', moment + timedelta(minutes=50), 'JO62AA'),
+            # A repeat of the first entry, then one more than an hour after the first
+            ('DL2REP', '145.500', moment, 'JO62AA'),
+            ('DL2REP', '145.500', moment + timedelta(minutes=50), 'JO62AA'),
+            ('DL2REP', '145.500', moment + timedelta(minutes=100), 'JO62AA'),
+            ('SP5AAA', '145.500', moment, 'JO62AA'),
+            ('X', '145.500', moment, 'JO62AA'),
+        ))
+        self.assertEqual(
+            (report.read, report.inserted, report.duplicates, report.self_qsos, report.invalid), (7, 3, 2, 1, 1)
+        )
+        self.assertEqual(report.rejections[0]['record'], 7)
+        imported = QSOContact.objects.filter(initiator=self.user).exclude(datetime__lt=moment)
+        self.assertEqual(
+            sorted((qso.recipient, qso.datetime - moment) for qso in imported),
+            [('DL1LOG', timedelta(minutes=50)), ('DL2REP', timedelta(0)), ('DL2REP', timedelta(minutes=100))],
+        )
+        self.assertTrue(imported.get(recipient='DL2REP', datetime=moment + timedelta(minutes=100)).confirmed)
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY merge is PostgreSQL only')
+    def test_copy_merge_queries_do_not_grow_with_the_log(self):
+        # Every 40 minutes: the greedy dedup keeps every other row
+        moment = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        counts = []
+        for size, call_sign in ((4, 'DL1SML'), (400, 'DL2BIG')):
+            records = [(call_sign, '145.500', moment + timedelta(minutes=40 * index), 'JO62AA') for index in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                report = import_log(self.user, self.adif(*records))
+            self.assertEqual((report.inserted, report.duplicates), (size // 2, size // 2))
+            counts.append(sum('qso_import_staging' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_upload_size_limit(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        upload = StringIO('x' * 101)
+        upload.name = 'log.adi'
+        with override_settings(IMPORT_MAX_UPLOAD_BYTES=100):
+            response = api.post('/api/qsos/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 413)
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        self.qsos = [
+            QSOContact.objects.create(
+                initiator=self.user, recipient=recipient, frequency=Decimal(frequency), mode=mode,
+                datetime=start + timedelta(minutes=index * 30, microseconds=index * 500),
+                initiator_location='JO91AA', recipient_location=grid,
+            )
+            for index, (recipient, frequency, mode, grid) in enumerate((
+                ('DL1ABC', '145.500', 'FM', 'JO62AA'),
+                ('OK2XYZ', '432.1', 'SSB', 'JO91ZZ'),
+            ))
+        ]
+
+    def export(self, file_format, **extra):
+        response = self.client.get(f'/api/qsos/export/?format={file_format}', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_lines_match_the_api(self):
+        response, body = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(body, b''.join(
+            JSONRenderer().render(QSOContactSerializer(qso).data) + b'\n' for qso in self.qsos
+        ))
+
+    def test_csv_body(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="SP5AAA.csv"')
+        first, second = self.qsos
+        self.assertEqual(body.decode(), (
+            'id,recipient,frequency,band,mode,datetime,initiator_location,recipient_location,confirmed,distance_km\r\n'
+            f'{first.pk},DL1ABC,145.500,2m,FM,2024-03-01T12:00:00Z,JO91AA,JO62AA,False,{first.distance_km!r}\r\n'
+            f'{second.pk},OK2XYZ,432.100,70cm,SSB,2024-03-01T12:30:00.000500Z,JO91AA,JO91ZZ,False,\r\n'
+        ))
+        _, body = self.export('csv&band=70cm')
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_adif_body(self):
+        response, body = self.export('adif')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(body.decode(), (
+            'QSOPlan ADIF export\n<ADIF_VER:5>3.1.4\n<PROGRAMID:7>QSOPlan\n<EOH>\n'
+            '<STATION_CALLSIGN:6>SP5AAA<CALL:6>DL1ABC<QSO_DATE:8>20240301<TIME_ON:6>120000<FREQ:7>145.500'
+            '<BAND:2>2m<MODE:2>FM<MY_GRIDSQUARE:6>JO91AA<GRIDSQUARE:6>JO62AA<QSL_RCVD:1>N<DISTANCE:3>430<EOR>\n'
+            '<STATION_CALLSIGN:6>SP5AAA<CALL:6>OK2XYZ<QSO_DATE:8>20240301<TIME_ON:6>123000<FREQ:7>432.100'
+            '<BAND:4>70cm<MODE:3>SSB<MY_GRIDSQUARE:6>JO91AA<GRIDSQUARE:6>JO91ZZ<QSL_RCVD:1>N<EOR>\n'
+        ))
+        # The export reads back as the same log
+        records = list(adif.iter_adif(StringIO(body.decode())))
+        self.assertEqual([record['CALL'] for record in records], ['DL1ABC', 'OK2XYZ'])
+
+    def test_gzip_when_accepted(self):
+        for file_format in ('adif', 'csv', 'ndjson'):
+            with self.subTest(file_format=file_format):
+                _, plain = self.export(file_format, HTTP_ACCEPT_ENCODING='identity')
+                response, body = self.export(file_format, HTTP_ACCEPT_ENCODING='br, gzip;q=0.8')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(gzip.decompress(body), plain)
+        response, _ = self.export('csv', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ADIFParserTestCase(TestCase):
+    def test_records_across_read_chunks(self):
+        text = (
+            'Exported log\n<ADIF_VER:5>3.1.4 <eoh>\n'
+            '<call:6>DL1ABC <freq:7>145.500<NOTES:9>a <b> c d<eor>\n'
+            '<CALL:5>OK1XY<FREQ:6>50.150'
+        )
+        with mock.patch.object(adif, 'READ_SIZE', 7):
+            records = list(adif.iter_adif(StringIO(text)))
+        self.assertEqual(records, [
+            {'CALL': 'DL1ABC', 'FREQ': '145.500', 'NOTES': 'a <b> c d'},
+            {'CALL': 'OK1XY', 'FREQ': '50.150'},
+        ])
+
+    def test_normalize_record(self):
+        record = {
+            'CALL': 'dl1abc', 'FREQ': '145.5', 'MODE': 'fm', 'QSO_DATE': '20240301', 'TIME_ON': '1230',
+            'GRIDSQUARE': 'jo62aa12', 'MY_GRIDSQUARE': 'JO91AA',
+        }
+        self.assertEqual(adif.normalize_record(record), {
+            'recipient': 'DL1ABC', 'frequency': Decimal('145.500'), 'mode': 'FM',
+            'datetime': datetime(2024, 3, 1, 12, 30, tzinfo=dt_timezone.utc),
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+        })
+        csv_record = dict(record, QSO_DATE='', DATETIME='2024-03-01T12:30:00Z')
+        self.assertEqual(adif.normalize_record(csv_record)['datetime'], datetime(2024, 3, 1, 12, 30, tzinfo=dt_timezone.utc))
+        for field, value in (('CALL', 'D!'), ('FREQ', '2.0'), ('FREQ', 'abc'), ('MODE', ''),
+                             ('TIME_ON', 'xx'), ('GRIDSQUARE', 'JO6')):
+            with self.subTest(field=field, value=value), self.assertRaises(ValueError):
+                adif.normalize_record(dict(record, **{field: value}))
+
+
+class MaidenheadTestCase(TestCase):
+    def test_known_locator_centres(self):
+        for locator, (lat, lon) in (
+            ('FN31PR', (41.729, -72.708)),
+            ('fn31pr', (41.729, -72.708)),
+            ('IO91WM', (51.521, -0.125)),
+            ('JJ00', (0.5, 1.0)),
+            ('JJ', (5.0, 10.0)),
+        ):
+            with self.subTest(locator=locator):
+                centre = to_latlon(locator)
+                self.assertAlmostEqual(centre[0], lat, places=3)
+                self.assertAlmostEqual(centre[1], lon, places=3)
+        for locator in ('SA00', 'JO9', 'JO91YA', ''):
+            with self.subTest(locator=locator), self.assertRaises(ValueError):
+                to_latlon(locator)
+
+    def test_known_distances_and_bearings(self):
+        # One degree along a meridian
+        self.assertAlmostEqual(distance_km('JJ00', 'JJ01'), 111.195, places=3)
+        self.assertAlmostEqual(bearing('JJ00', 'JJ01'), 0.0, places=6)
+        self.assertAlmostEqual(bearing('JJ01', 'JJ00'), 180.0, places=6)
+        self.assertEqual(distance_km('FN31PR', 'FN31PR'), 0.0)
+        self.assertAlmostEqual(distance_km('FN31PR', 'IO91WM'), 5414.7, places=1)
+        self.assertAlmostEqual(distance_km('IO91WM', 'FN31PR'), 5414.7, places=1)
+        self.assertAlmostEqual(bearing('FN31PR', 'IO91WM'), 52.2, places=1)
+        self.assertAlmostEqual(bearing('IO91WM', 'FN31PR'), 288.6, places=1)
+
+    def test_vectorised_matches_scalar(self):
+        locators = ['FN31PR', 'IO91WM', 'JO91AA', 'JO62AA', 'QF56OD', 'AA00AA', 'RR99XX', 'PM95VQ']
+        pairs = [(a, b) for a in locators for b in locators]
+        distances = distances_km([a for a, _ in pairs], [b for _, b in pairs])
+        directions = bearings([a for a, _ in pairs], [b for _, b in pairs])
+        for (a, b), distance, direction in zip(pairs, distances, directions):
+            with self.subTest(a=a, b=b):
+                self.assertAlmostEqual(distance, distance_km(a, b), places=6)
+                if a != b:
+                    self.assertAlmostEqual(direction, bearing(a, b), places=6)
+
+    def test_distances_of_invalid_locators(self):
+        distances = distances_km(['ZZ99ZZ', 'JO91ZZ', 'JO91', 'JO91AA'], ['JO62AA', 'JO62AA', 'JO62AA', 'JO62AA'])
+        self.assertTrue(all(math.isnan(distance) for distance in distances[:3]))
+        self.assertAlmostEqual(distances[3], distance_km('JO91AA', 'JO62AA'), places=6)
+
+    def test_backfill_leaves_invalid_locators_without_distance(self):
+        user = make_user('SP5AAA')
+        moment = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        QSOContact.objects.bulk_create([
+            QSOContact(initiator=user, recipient=call_sign, frequency=Decimal('145.500'), band='2m', mode='FM',
+                       datetime=moment, initiator_location='JO91AA', recipient_location=grid)
+            for call_sign, grid in (('DL1OFF', 'JO91ZZ'), ('DL2ON', 'JO62AA'))
+        ])
+        call_command('backfill_distances', stdout=StringIO())
+        distances = dict(QSOContact.objects.values_list('recipient', 'distance_km'))
+        self.assertIsNone(distances['DL1OFF'])
+        self.assertAlmostEqual(distances['DL2ON'], distance_km('JO91AA', 'JO62AA'), places=3)
+
+
+def log_qso(initiator, recipient, moment, frequency='145.500'):
+    """A QSO whose locators cross with the partner's, as matching expects."""
+    grids = {'SP5AAA': 'JO91AA', 'SP6BBB': 'JO62AA'}
+    return QSOContact.objects.create(
+        initiator=initiator, recipient=recipient, frequency=Decimal(frequency), mode='FM', datetime=moment,
+        initiator_location=grids[initiator.call_sign], recipient_location=grids.get(recipient, 'JO62AA'),
+    )
+
+
+class ConfirmMatchTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.a = make_user('SP5AAA')
+        self.b = make_user('SP6BBB')
+
+    def test_confirms_both_rows_locked_in_key_order(self):
+        partner = log_qso(self.b, 'SP5AAA', self.START)
+        qso = log_qso(self.a, 'SP6BBB', self.START + timedelta(minutes=2))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(confirm_match(qso), partner.pk)
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+        self.assertEqual(StationStats.objects.get(user=self.a).confirmed_contacts, 1)
+        if connection.features.has_select_for_update:
+            locking = [query['sql'] for query in queries.captured_queries if 'FOR UPDATE' in query['sql']]
+            self.assertEqual(len(locking), 1)
+            self.assertIn('ORDER BY', locking[0])
+
+    def test_earliest_unconfirmed_candidate_wins(self):
+        # Two partner entries inside the window; bulk_create skips the duplicate check
+        taken, later, partner = QSOContact.objects.bulk_create([
+            QSOContact(initiator=self.b, recipient='SP5AAA', frequency=Decimal('145.500'), mode='FM',
+                       datetime=self.START + timedelta(minutes=minutes), initiator_location='JO62AA',
+                       recipient_location='JO91AA', confirmed=confirmed)
+            for minutes, confirmed in ((0, True), (20, False), (10, False))
+        ])
+        qso = log_qso(self.a, 'SP6BBB', self.START + timedelta(minutes=2))
+        self.assertEqual(confirm_match(qso), partner.pk)
+        self.assertEqual(set(QSOContact.objects.filter(confirmed=True).values_list('pk', flat=True)),
+                         {taken.pk, partner.pk, qso.pk})
+
+    def test_own_entry_already_confirmed(self):
+        log_qso(self.b, 'SP5AAA', self.START)
+        qso = log_qso(self.a, 'SP6BBB', self.START + timedelta(minutes=2))
+        QSOContact.objects.filter(pk=qso.pk).update(confirmed=True)
+        self.assertIsNone(confirm_match(qso))
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 1)
+
+
+class ConcurrentConfirmMatchTestCase(TransactionTestCase):
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_mirror_entries_confirmed_at_the_same_time(self):
+        a, b = make_user('SP5AAA'), make_user('SP6BBB')
+        start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        qsos = [log_qso(a, 'SP6BBB', start), log_qso(b, 'SP5AAA', start + timedelta(minutes=1))]
+        barrier = threading.Barrier(2)
+        results, errors = [], []
+
+        def confirm(qso):
+            try:
+                barrier.wait()
+                results.append(confirm_match(qso))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=confirm, args=(qso,)) for qso in qsos]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        # One request confirms the pair, the other finds its entry already confirmed
+        self.assertEqual(results.count(None), 1)
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+
+
+@override_settings(MATCH_JOB_MAX_ATTEMPTS=3, MATCH_JOB_RETRY_SECONDS=30)
+class MatchJobTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.a = make_user('SP5AAA')
+        self.b = make_user('SP6BBB')
+        self.partner = log_qso(self.b, 'SP5AAA', self.START)
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.a)
+
+    def create(self):
+        return self.client_api.post('/api/qsos/', {
+            'recipient': 'SP6BBB', 'frequency': '145.500', 'mode': 'FM',
+            'datetime': (self.START + timedelta(minutes=2)).isoformat(),
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+        }, format='json')
+
+    @override_settings(MATCH_ASYNC=True)
+    def test_create_enqueues_and_worker_confirms(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.data['confirmed'])
+        job = MatchJob.objects.get()
+        self.assertEqual(job.qso_id, response.data['id'])
+
+        self.assertEqual(process_batch(), 1)
+        self.assertFalse(MatchJob.objects.exists())
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+        self.assertEqual(process_batch(), 0)
+
+    def test_failed_inline_match_is_queued(self):
+        with mock.patch('qso_logger.views.confirm_match', side_effect=RuntimeError('boom')), \
+                self.assertLogs('qso_logger.views', 'ERROR'):
+            response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(MatchJob.objects.get().qso_id, response.data['id'])
+
+    def test_retry_with_backoff_then_failure(self):
+        job = enqueue_match(log_qso(self.a, 'SP6BBB', self.START + timedelta(minutes=2)))
+        for attempt, delay in ((1, 30), (2, 60)):
+            with mock.patch('qso_logger.jobs.match_batch', side_effect=RuntimeError('boom')), \
+                    self.assertLogs('qso_logger.jobs', 'ERROR'):
+                before = timezone.now()
+                self.assertEqual(process_batch(), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertEqual(job.last_error, 'RuntimeError: boom')
+            self.assertIsNone(job.failed_at)
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=delay))
+            # Not due yet
+            self.assertEqual(process_batch(), 0)
+            MatchJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        with mock.patch('qso_logger.jobs.match_batch', side_effect=RuntimeError('boom')), \
+                self.assertLogs('qso_logger.jobs', 'ERROR'):
+            self.assertEqual(process_batch(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.failed_at)
+        # Failed jobs are kept for inspection but never claimed again
+        MatchJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(process_batch(), 0)
+
+    def test_queue_stats(self):
+        self.assertEqual(queue_stats(), {'pending': 0, 'failed': 0, 'lag_seconds': 0.0})
+        qsos = [log_qso(self.a, f'DL{index}JOB', self.START + timedelta(minutes=index)) for index in range(3)]
+        for qso in qsos:
+            enqueue_match(qso)
+        MatchJob.objects.filter(qso=qsos[0]).update(created_at=timezone.now() - timedelta(minutes=5))
+        MatchJob.objects.filter(qso=qsos[2]).update(failed_at=timezone.now(), created_at=timezone.now() - timedelta(hours=1))
+        stats = queue_stats()
+        self.assertEqual((stats['pending'], stats['failed']), (2, 1))
+        # The lag is the age of the oldest pending job; failed jobs don't count
+        self.assertGreaterEqual(stats['lag_seconds'], 300)
+        self.assertLess(stats['lag_seconds'], 3600)
+
+    def test_worker_once(self):
+        enqueue_match(log_qso(self.a, 'SP6BBB', self.START + timedelta(minutes=2)))
+        output = StringIO()
+        call_command('run_match_worker', once=True, stdout=output)
+        self.assertIn('Processed 1 match jobs', output.getvalue())
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+
+    def test_worker_survives_a_failed_contest_flush(self):
+        stop = threading.Event()
+        flushes = []
+
+        def flush_due():
+            flushes.append(1)
+            if len(flushes) == 1:
+                raise RuntimeError('boom')
+            stop.set()
+            return 0
+
+        module = 'qso_logger.management.commands.run_match_worker'
+        with mock.patch(f'{module}.process_batch', return_value=0), \
+                mock.patch(f'{module}.flush_due', side_effect=flush_due), \
+                mock.patch(f'{module}.close_old_connections'), mock.patch(f'{module}.connection'), \
+                self.assertLogs('qso_logger.jobs', 'ERROR'):
+            RunMatchWorker().work(stop, {'batch_size': 10, 'poll_interval': 0})
+        self.assertEqual(len(flushes), 2)
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def lookup(self, value):
+        return cache.get_or_set(cache.RANKINGS, ['page'], lambda: value)
+
+    def counters(self):
+        return cache.stats().get(cache.RANKINGS, {'hits': 0, 'misses': 0, 'invalidations': 0})
+
+    def test_hit_and_miss_counters(self):
+        before = self.counters()
+        self.assertEqual(self.lookup(1), 1)
+        self.assertEqual(self.lookup(2), 1)
+        after = self.counters()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertIsNotNone(after['hit_ratio'])
+
+    def test_invalidation_waits_for_commit(self):
+        self.lookup(1)
+        before = self.counters()
+        with self.captureOnCommitCallbacks() as callbacks:
+            cache.invalidate(cache.RANKINGS)
+            self.assertEqual(self.lookup(2), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.lookup(3), 3)
+        self.assertEqual(self.counters()['invalidations'] - before['invalidations'], 1)
+
+    def test_rolled_back_invalidation_is_dropped(self):
+        self.lookup(1)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                cache.invalidate(cache.RANKINGS)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.lookup(2), 1)
+
+    def test_evicted_generation_does_not_revive_entries(self):
+        self.lookup(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.invalidate(cache.RANKINGS)
+        self.assertEqual(self.lookup(2), 2)
+        # Eviction of the counter must not restart it at a generation already used
+        django_cache.delete(cache._generation_key(cache.RANKINGS))
+        self.assertEqual(self.lookup(3), 3)
+
+    def test_signals_invalidate_on_commit(self):
+        self.lookup(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_user('SP7CCC')
+        self.assertEqual(self.lookup(2), 2)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'qso_logger.cache_backends.LocalRedisCache', 'LOCATION': 'redis://local/tests',
+}})
+class LocalRedisCacheTestCase(CacheTestCase):
+    """The cache tests again, through Django's Redis backend and the stand-in server."""
+
+    def test_max_keys_evicts_least_recently_used(self):
+        server = LocalRedis(max_keys=2)
+        server.set('a', b'1')
+        server.set('b', b'2')
+        server.get('a')
+        server.set('c', b'3')
+        self.assertEqual(server.mget(['a', 'b', 'c']), [b'1', None, b'3'])
+        self.assertIsNone(server.set('a', b'4', nx=True))
+        self.assertEqual(server.incr('counter', 5), 5)
+
+
+class SyncTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def log(self, recipient, moment):
+        response = self.api.post('/api/qsos/', {
+            'recipient': recipient, 'frequency': '145.500', 'mode': 'FM', 'datetime': moment.isoformat(),
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_not_modified_until_the_log_changes(self):
+        self.log('DL1AAA', self.START)
+        etag = self.api.get('/api/qsos/')['ETag']
+        self.assertEqual(self.api.get('/api/qsos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.api.get('/api/qsos/?band=2m')['ETag'], etag)
+
+        self.log('DL2BBB', self.START)
+        response = self.api.get('/api/qsos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pruned_deletion_changes_the_etag(self):
+        older = self.log('DL1AAA', self.START)
+        self.log('DL2BBB', self.START)
+        etag = self.api.get('/api/qsos/')['ETag']
+        # Deleting a QSO that is not the newest, then pruning its tombstone,
+        # leaves the newest timestamps where they were
+        self.assertEqual(self.api.delete(f'/api/qsos/{older}/').status_code, 204)
+        self.assertEqual(prune_tombstones(days=0), 1)
+        self.assertEqual(self.api.get('/api/qsos/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_changes_since(self):
+        kept = self.log('DL1AAA', self.START)
+        deleted = self.log('DL2BBB', self.START)
+        QSOContact.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        token = encode_token(timezone.now() - timedelta(hours=1))
+
+        added = self.log('DL3CCC', self.START)
+        self.api.delete(f'/api/qsos/{deleted}/')
+        response = self.api.get(f'/api/qsos/?changes_since={token}')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([row['id'] for row in body['changed']], [added])
+        self.assertEqual(body['deleted'], [deleted])
+        self.assertNotIn(kept, [row['id'] for row in body['changed']])
+
+        response = self.api.get(f"/api/qsos/?changes_since={body['token']}")
+        self.assertEqual(response.json()['deleted'], [deleted])  # within the leeway window
+
+    def test_expired_and_invalid_tokens(self):
+        expired = timezone.now() - timedelta(days=settings.QSO_TOMBSTONE_RETENTION_DAYS + 1)
+        self.assertEqual(self.api.get(f'/api/qsos/?changes_since={encode_token(expired)}').status_code, 410)
+        self.assertEqual(self.api.get('/api/qsos/?changes_since=yesterday').status_code, 400)
+
+
+class CachedAuthenticationTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.user = make_user('SP5AAA')
+        self.api = APIClient()
+        self.login('secret')
+
+    def login(self, password):
+        response = self.client.post('/api/token/', {'username': 'sp5aaa', 'password': password})
+        self.assertEqual(response.status_code, 200)
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+    def grid(self):
+        response = self.api.get('/api/user/profile/')
+        return response.json()['default_grid_square'] if response.status_code == 200 else response.status_code
+
+    def test_password_hash_is_not_cached(self):
+        self.assertEqual(self.grid(), 'JO91AA')
+        entry = django_cache.get(cache.make_key(cache.AUTH_USERS, self.user.pk, versioned=False))
+        self.assertIsNotNone(entry)
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_cached_user_keeps_its_password(self):
+        self.grid()
+        self.assertEqual(self.api.patch('/api/user/profile/', {'default_grid_square': 'KO02AA'}).status_code, 200)
+        response = self.api.post('/api/user/change-password/', {'old_password': 'secret', 'new_password': 'Tr4nsceiver-2m'})
+        self.assertEqual(response.status_code, 200)
+        self.login('Tr4nsceiver-2m')
+
+    def test_save_invalidates_the_cached_user(self):
+        self.assertEqual(self.grid(), 'JO91AA')
+        User.objects.filter(pk=self.user.pk).update(default_grid_square='KO02AA')
+        self.assertEqual(self.grid(), 'JO91AA')  # served from the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.refresh_from_db()
+            self.user.save()
+        self.assertEqual(self.grid(), 'KO02AA')
+
+    def test_approve_users_invalidates_the_cached_user(self):
+        self.assertEqual(self.grid(), 'JO91AA')
+        User.objects.filter(pk=self.user.pk).update(default_grid_square='KO02AA')
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUserAdmin(User, admin_site).approve_users(None, User.objects.filter(pk=self.user.pk))
+        self.assertEqual(self.grid(), 'KO02AA')
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.grid(), 'JO91AA')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_approved = False
+            self.user.save()
+        self.assertEqual(self.grid(), 401)
+
+
+class StationStatsTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.a = make_user('SP5AAA')
+        self.b = make_user('SP6BBB')
+
+    def log(self, user, entries):
+        grids = {'SP5AAA': 'JO91AA', 'SP6BBB': 'JO62AA'}
+        results = create_batch(user, [(index, {
+            'recipient': recipient, 'frequency': Decimal(frequency), 'mode': 'FM', 'datetime': moment,
+            'initiator_location': grids[user.call_sign], 'recipient_location': grids.get(recipient, 'JO62AA'),
+        }) for index, (recipient, moment, frequency) in enumerate(entries)])
+        return [results[index] for index in range(len(entries))]
+
+    def counters(self):
+        return (
+            sorted(StationStats.objects.values_list('user_id', 'total_contacts', 'confirmed_contacts')),
+            sorted(StationDailyStats.objects.exclude(total_contacts=0).values_list(
+                'user_id', 'day', 'band', 'mode', 'total_contacts', 'confirmed_contacts')),
+        )
+
+    def assertCountersMatchRebuild(self):
+        maintained = self.counters()
+        rebuild_station_stats()
+        rebuild_daily_stats()
+        self.assertEqual(maintained, self.counters())
+
+    def test_counters_follow_creates_confirmations_and_deletes(self):
+        partner, unconfirmed = self.log(self.a, [('SP6BBB', self.START, '145.500'), ('DL1AAA', self.START, '432.100')])
+        self.log(self.b, [('SP5AAA', self.START + timedelta(minutes=1), '145.500')])
+        stats = StationStats.objects.get(user=self.a)
+        self.assertEqual((stats.total_contacts, stats.confirmed_contacts), (2, 1))
+        self.assertCountersMatchRebuild()
+
+        api = APIClient()
+        api.force_authenticate(self.a)
+        self.assertEqual(api.delete(f'/api/qsos/{unconfirmed.pk}/').status_code, 204)
+        self.assertTrue(QSOTombstone.objects.filter(initiator=self.a, qso_id=unconfirmed.pk).exists())
+        self.assertCountersMatchRebuild()
+
+        # Confirmed QSOs can only be deleted outside the API, e.g. in the admin
+        partner.refresh_from_db()
+        partner.delete()
+        stats = StationStats.objects.get(user=self.a)
+        self.assertEqual((stats.total_contacts, stats.confirmed_contacts), (0, 0))
+        self.assertCountersMatchRebuild()
+        rankings = api.get('/api/qsos/rankings/').json()['results']
+        self.assertEqual([row['call_sign'] for row in rankings], ['SP6BBB', 'SP5AAA'])
+
+    def test_counters_follow_the_admin(self):
+        admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', call_sign='SP0ADM', password='secret', is_approved=True,
+        )
+        self.client.force_login(admin_user)
+        form = {
+            'initiator': self.a.pk, 'recipient': 'DL1AAA', 'frequency': '145.500', 'mode': 'FM',
+            'datetime_0': '2024-03-01', 'datetime_1': '12:00:00',
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA', 'distance_km': '',
+        }
+        response = self.client.post('/admin/qso_logger/qsocontact/add/', form)
+        self.assertEqual(response.status_code, 302, response.content)
+        qso = QSOContact.objects.get()
+        self.assertEqual(StationStats.objects.get(user=self.a).total_contacts, 1)
+        self.assertCountersMatchRebuild()
+
+        # Another day, band and station, and confirmed
+        form.update(initiator=self.b.pk, frequency='432.100', datetime_0='2024-03-02', confirmed='on')
+        response = self.client.post(f'/admin/qso_logger/qsocontact/{qso.pk}/change/', form)
+        self.assertEqual(response.status_code, 302, response.content)
+        self.assertEqual(StationStats.objects.get(user=self.a).total_contacts, 0)
+        stats = StationStats.objects.get(user=self.b)
+        self.assertEqual((stats.total_contacts, stats.confirmed_contacts), (1, 1))
+        self.assertCountersMatchRebuild()
+
+        # An instance loaded with deferred fields
+        partial = QSOContact.objects.only('id', 'mode').get(pk=qso.pk)
+        partial.mode = 'SSB'
+        partial.confirmed = False
+        partial.save()
+        self.assertEqual(StationStats.objects.get(user=self.b).confirmed_contacts, 0)
+        self.assertCountersMatchRebuild()
+
+    def test_rollup_endpoints_follow_creates_edits_and_deletes(self):
+        api = APIClient()
+        api.force_authenticate(self.a)
+
+        def rollup(group, query=''):
+            response = api.get(f'/api/stats/me/{group}/?{query}')
+            self.assertEqual(response.status_code, 200, response.content)
+            key = {'daily': 'day', 'bands': 'band', 'modes': 'mode'}[group]
+            return {row[key]: (row['total_contacts'], row['confirmed_contacts']) for row in response.json()}
+
+        def write(method, url, data=None):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(api, method)(url, data, format='json')
+            self.assertLess(response.status_code, 300, response.content)
+            return response
+
+        ids = [
+            write('post', '/api/qsos/', {
+                'recipient': recipient, 'frequency': frequency, 'mode': mode, 'datetime': moment,
+                'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+            }).json()['id']
+            for recipient, frequency, mode, moment in (
+                ('SP6BBB', '145.500', 'FM', '2024-03-01T12:00:00Z'),
+                ('DL2AAA', '432.100', 'SSB', '2024-03-01T13:00:00Z'),
+                ('DL3AAA', '145.500', 'FM', '2024-03-02T12:00:00Z'),
+            )
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log(self.b, [('SP5AAA', self.START + timedelta(minutes=1), '145.500')])
+        self.assertEqual(rollup('daily'), {'2024-03-01': (2, 1), '2024-03-02': (1, 0)})
+        self.assertEqual(rollup('bands'), {'2m': (2, 1), '70cm': (1, 0)})
+        self.assertEqual(rollup('modes'), {'FM': (2, 1), 'SSB': (1, 0)})
+        self.assertEqual(rollup('daily', 'mode=fm'), {'2024-03-01': (1, 1), '2024-03-02': (1, 0)})
+        rate = api.get('/api/stats/me/bands/').json()[0]
+        self.assertEqual((rate['band'], rate['confirmation_rate']), ('2m', 0.5))
+
+        # Moved onto another day, band and mode
+        write('patch', f'/api/qsos/{ids[2]}/', {
+            'frequency': '432.100', 'mode': 'SSB', 'datetime': '2024-03-01T14:00:00Z',
+        })
+        self.assertEqual(rollup('daily'), {'2024-03-01': (3, 1)})
+        self.assertEqual(rollup('bands'), {'2m': (1, 1), '70cm': (2, 0)})
+        self.assertEqual(rollup('modes'), {'FM': (1, 1), 'SSB': (2, 0)})
+
+        write('delete', f'/api/qsos/{ids[1]}/')
+        self.assertEqual(rollup('daily'), {'2024-03-01': (2, 1)})
+        self.assertEqual(rollup('bands'), {'2m': (1, 1), '70cm': (1, 0)})
+        self.assertEqual(rollup('modes', 'band=70cm'), {'SSB': (1, 0)})
+        self.assertCountersMatchRebuild()
+
+    def test_bulk_delete_is_set_based(self):
+        def log_many(count):
+            self.log(self.a, [
+                (f'DL{index}AAA', self.START + timedelta(days=index), '145.500' if index % 2 else '432.100')
+                for index in range(count)
+            ])
+            with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+                deleted, _ = QSOContact.objects.filter(initiator=self.a).delete()
+            self.assertEqual(deleted, count)
+            return len(queries)
+
+        before = cache.stats().get(cache.RANKINGS, {}).get('invalidations', 0)
+        self.assertEqual(log_many(3), log_many(30))
+        self.assertEqual(cache.stats()[cache.RANKINGS]['invalidations'] - before, 2)
+        self.assertEqual(QSOTombstone.objects.filter(initiator=self.a).count(), 33)
+        self.assertCountersMatchRebuild()
+
+    def test_user_delete_skips_the_per_qso_bookkeeping(self):
+        self.log(self.a, [('SP6BBB', self.START, '145.500'), ('DL1AAA', self.START, '432.100')])
+        self.log(self.b, [('SP5AAA', self.START + timedelta(minutes=1), '145.500')])
+        with CaptureQueriesContext(connection) as queries:
+            self.a.delete()
+        self.assertFalse(any('qso_logger_stationstats' in query['sql'] and 'UPDATE' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertFalse(QSOTombstone.objects.exists())
+        self.assertFalse(StationStats.objects.filter(user_id=self.a.pk).exists())
+        self.assertCountersMatchRebuild()
+
+
+class GridActivityTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.user = make_user('SP5AAA')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        start = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        for index, (grid, frequency, confirmed) in enumerate((
+            ('JO62AA', '145.500', True),
+            ('JO62AB', '145.500', False),
+            ('JO62AB', '432.100', True),
+            ('JO63XX', '145.500', False),
+            ('IO91WM', '432.100', False),
+        )):
+            QSOContact.objects.create(
+                initiator=self.user, recipient=f'DL{index}ABC', frequency=Decimal(frequency), mode='FM',
+                datetime=start + timedelta(days=index), initiator_location='JO91AA', recipient_location=grid,
+                confirmed=confirmed,
+            )
+        other = make_user('SP6BBB')
+        QSOContact.objects.create(
+            initiator=other, recipient='DL9ABC', frequency=Decimal('145.500'), mode='FM', datetime=start,
+            initiator_location='JO62AA', recipient_location='JO62AA',
+        )
+
+    def cells(self, query=''):
+        response = self.api.get(f'/api/stats/grid-activity/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {cell['grid']: (cell['contacts'], cell['confirmed']) for cell in response.json()['cells']}
+
+    def test_counts_per_level(self):
+        self.assertEqual(self.cells('level=field'), {'IO': (1, 0), 'JO': (4, 2)})
+        self.assertEqual(self.cells(), {'IO91': (1, 0), 'JO62': (3, 2), 'JO63': (1, 0)})
+        self.assertEqual(
+            self.cells('level=subsquare'),
+            {'IO91WM': (1, 0), 'JO62AA': (1, 1), 'JO62AB': (2, 1), 'JO63XX': (1, 0)}
+        )
+        self.assertEqual(self.cells('band=70cm'), {'IO91': (1, 0), 'JO62': (1, 1)})
+        # until is exclusive
+        self.assertEqual(self.cells('since=2024-03-02&until=2024-03-04'), {'JO62': (2, 1)})
+        self.assertEqual(self.cells('since=2024-03-02&until=2024-03-05'), {'JO62': (2, 1), 'JO63': (1, 0)})
+        self.assertEqual(self.api.get('/api/stats/grid-activity/?level=locator').status_code, 400)
+
+    def test_not_modified_on_a_matching_etag(self):
+        response = self.api.get('/api/stats/grid-activity/')
+        etag = response['ETag']
+        response = self.api.get('/api/stats/grid-activity/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # Another level is another representation
+        response = self.api.get('/api/stats/grid-activity/?level=field', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            QSOContact.objects.create(
+                initiator=self.user, recipient='OK1ABC', frequency=Decimal('145.500'), mode='FM',
+                datetime=datetime(2024, 4, 1, tzinfo=dt_timezone.utc),
+                initiator_location='JO91AA', recipient_location='JO70AA',
+            )
+        response = self.api.get('/api/stats/grid-activity/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['cells']), 4)
+
+
+# One sample line of the Prometheus text exposition format
+METRIC_SAMPLE = re.compile(
+    r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)'
+    r'(?P<labels>\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*"(?:,|(?=\})))*\})?'
+    r' (?P<value>[-+]?(?:[0-9.]+(?:e[-+]?[0-9]+)?|Inf|NaN))$'
+)
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsTestCase(TestCase):
+    def scrape(self, **headers):
+        return self.client.get('/api/metrics', **headers)
+
+    def samples(self):
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.endswith('\n'))
+
+        types, samples = {}, {}
+        for line in body.splitlines():
+            if line.startswith('# HELP '):
+                continue
+            if line.startswith('# TYPE '):
+                _, _, name, kind = line.split(' ')
+                self.assertNotIn(name, types, f'{name} is declared twice')
+                self.assertIn(kind, ('counter', 'gauge', 'histogram'))
+                types[name] = kind
+                continue
+            match = METRIC_SAMPLE.match(line)
+            self.assertIsNotNone(match, f'Not a sample line: {line!r}')
+            name = match['name']
+            family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+            self.assertIn(family, types, f'{name} has no TYPE line before it')
+            samples[name + (match['labels'] or '')] = float(match['value'])
+        return types, samples
+
+    def test_token_is_required(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='scrape-token').status_code, 403)
+        with override_settings(METRICS_TOKEN='', DEBUG=False):
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        with override_settings(METRICS_TOKEN='', DEBUG=True):
+            self.assertEqual(self.scrape().status_code, 200)
+
+    def test_exposition_format(self):
+        api = APIClient()
+        api.force_authenticate(make_user('SP5AAA'))
+        view = resolve('/api/qsos/').view_name
+        _, before = self.samples()
+        for _ in range(3):
+            self.assertEqual(api.get('/api/qsos/').status_code, 200)
+        types, samples = self.samples()
+
+        self.assertEqual(types['qso_http_request_duration_seconds'], 'histogram')
+        self.assertEqual(types['qso_match_queue_jobs'], 'gauge')
+        requests = f'qso_http_requests_total{{view="{view}",method="GET",status="200"}}'
+        self.assertEqual(samples[requests] - before.get(requests, 0), 3)
+
+        # Buckets are cumulative and end in +Inf, which equals _count
+        labels = f'view="{view}",method="GET"'
+        for family in ('qso_http_request_duration_seconds', 'qso_db_queries_per_request',
+                       'qso_http_response_size_bytes'):
+            with self.subTest(family=family):
+                buckets = [value for key, value in samples.items()
+                           if key.startswith(f'{family}_bucket{{{labels},le=')]
+                self.assertEqual(buckets, sorted(buckets))
+                self.assertEqual(buckets[-1], samples[f'{family}_bucket{{{labels},le="+Inf"}}'])
+                self.assertEqual(buckets[-1], samples[f'{family}_count{{{labels}}}'])
+        self.assertGreaterEqual(samples[f'qso_db_queries_per_request_sum{{{labels}}}'], 3)
+        self.assertEqual(samples['qso_match_queue_jobs{state="pending"}'], 0)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1)
+class SlowQueryTestCase(TestCase):
+    def setUp(self):
+        slow_queries.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', call_sign='SP0ADM', password='secret', is_approved=True,
+        )
+
+    def capture(self, run):
+        with connection.execute_wrapper(slow_queries.capture), CaptureQueriesContext(connection) as queries:
+            run()
+        return queries
+
+    def test_captures_and_explains_without_running_twice(self):
+        queries = self.capture(lambda: list(QSOContact.objects.filter(recipient='DL1AAA')))
+        self.assertEqual(len(queries), 1)
+        [entry] = slow_queries.entries()
+        self.assertIn('qso_logger_qsocontact', entry['sql'])
+        self.assertEqual(entry['params'], ["'DL1AAA'"])
+        self.assertTrue(entry['plan'])
+        self.assertIsNone(entry['analyzed_plan'])
+        self.assertTrue(any(frame.startswith('tests.py:') for frame in entry['call_site']))
+        self.assertNotIn('raw_params', entry)
+
+    def test_plain_explain_on_postgresql(self):
+        cursor = mock.MagicMock()
+        cursor.fetchall.return_value = [('Seq Scan on qso_logger_qsocontact',)]
+        fake = mock.Mock(vendor='postgresql', in_atomic_block=False)
+        fake.create_cursor.return_value = cursor
+        self.assertEqual(slow_queries._explain(fake, 'SELECT 1', ()), 'Seq Scan on qso_logger_qsocontact')
+        cursor.execute.assert_called_once_with('EXPLAIN SELECT 1', ())
+        cursor.execute.reset_mock()
+        slow_queries._explain(fake, 'SELECT 1', (), analyze=True)
+        cursor.execute.assert_called_once_with('EXPLAIN (ANALYZE, BUFFERS) SELECT 1', ())
+
+    def test_writes_are_not_explained(self):
+        self.capture(lambda: User.objects.filter(pk=self.admin.pk).update(first_name='Op'))
+        [entry] = slow_queries.entries()
+        self.assertIsNone(entry['plan'])
+        self.assertIsNone(slow_queries.analyze(entry['id']))
+
+    def test_admin_browse_and_analyze(self):
+        self.capture(lambda: list(QSOContact.objects.filter(recipient='DL1AAA')))
+        [entry] = slow_queries.entries()
+        self.assertEqual(self.client.get('/admin/slow-queries/').status_code, 302)  # login first
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/slow-queries/')
+        self.assertContains(response, 'qso_logger_qsocontact')
+        self.assertContains(response, 'Run EXPLAIN ANALYZE')
+        response = self.client.post('/admin/slow-queries/', {'analyze': entry['id']})
+        self.assertRedirects(response, '/admin/slow-queries/')
+        self.assertTrue(slow_queries.entries()[-1]['analyzed_plan'])
+
+        self.client.post('/admin/slow-queries/', {'clear': '1'})
+        self.assertEqual(slow_queries.entries(), [])
+
+
+class InlinePool:
+    """Stands in for rematch_qsos' process pool: runs the slices one after another."""
+
+    def __init__(self, max_workers, mp_context):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, function, iterable):
+        return list(map(function, iterable))
+
+
+class RematchTestCase(TestCase):
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.a = make_user('SP5AAA')
+        self.b = make_user('SP6BBB')
+        # (SP5AAA's entry, SP6BBB's entry) of each pair, bulk-created so nothing matches on insert
+        self.pairs = [
+            (timedelta(0), timedelta(minutes=1)),
+            # Across the chunk border at 3h with --chunk-hours=1
+            (timedelta(hours=2, minutes=58), timedelta(hours=3, minutes=2)),
+            # Across the border of the two slices of --workers=2, at 5h00m30s
+            (timedelta(hours=4, minutes=56), timedelta(hours=5, minutes=5)),
+            (timedelta(hours=10), timedelta(hours=10, minutes=1)),
+        ]
+        qsos = []
+        for first, second in self.pairs:
+            qsos.append(QSOContact(initiator=self.a, recipient='SP6BBB', frequency=Decimal('145.500'), mode='FM',
+                                   datetime=self.START + first, initiator_location='JO91AA',
+                                   recipient_location='JO62AA'))
+            qsos.append(QSOContact(initiator=self.b, recipient='SP5AAA', frequency=Decimal('145.500'), mode='FM',
+                                   datetime=self.START + second, initiator_location='JO62AA',
+                                   recipient_location='JO91AA'))
+        QSOContact.objects.bulk_create(qsos)
+
+    def rematch(self, **options):
+        output = StringIO()
+        command = 'qso_logger.management.commands.rematch_qsos'
+        with mock.patch(f'{command}.ProcessPoolExecutor', InlinePool), \
+                mock.patch(f'{command}.connection', mock.Mock(vendor='postgresql')):
+            call_command('rematch_qsos', chunk_hours=1, stdout=output, **options)
+        return output.getvalue()
+
+    def assertAllConfirmed(self, output):
+        self.assertIn(f'Confirmed {len(self.pairs)} pairs', output)
+        self.assertFalse(QSOContact.objects.filter(confirmed=False).exists())
+        for user in (self.a, self.b):
+            self.assertEqual(StationStats.objects.get(user=user).confirmed_contacts, len(self.pairs))
+
+    def test_pairs_across_chunk_borders(self):
+        self.assertAllConfirmed(self.rematch())
+
+    def test_pairs_across_slice_borders(self):
+        self.assertAllConfirmed(self.rematch(workers=2))
+
+    def test_dry_run(self):
+        output = self.rematch(workers=2, dry_run=True)
+        self.assertIn(f'Would confirm {len(self.pairs)} pairs', output)
+        self.assertFalse(QSOContact.objects.filter(confirmed=True).exists())
+
+    def test_range_options(self):
+        output = self.rematch(since='2024-03-01T14:00', until='2024-03-01T23:00:00Z')
+        self.assertIn('Confirmed 3 pairs', output)
+        self.assertEqual(QSOContact.objects.filter(confirmed=False).count(), 2)
+        for value in ('yesterday', '2024-13-01'):
+            with self.subTest(value=value), self.assertRaisesMessage(CommandError, 'Invalid date or datetime'):
+                self.rematch(since=value)
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class RankingsCacheTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        for call_sign in ('SP5AAA', 'SP6BBB', 'SP7CCC'):
+            make_user(call_sign)
+
+    def test_links_follow_the_request_host(self):
+        response = self.client.get('/api/qsos/rankings/?limit=1', HTTP_HOST='evil.example')
+        self.assertEqual(response.json()['next'], 'http://evil.example/api/qsos/rankings/?limit=1&offset=1')
+        response = self.client.get('/api/qsos/rankings/?limit=1')
+        body = response.json()
+        self.assertEqual(body['next'], 'http://testserver/api/qsos/rankings/?limit=1&offset=1')
+        self.assertEqual((body['count'], len(body['results'])), (3, 1))
+
+    def test_unrelated_parameters_share_the_cached_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/api/qsos/rankings/?limit=2').json()
+            self.client.get('/api/qsos/rankings/?limit=2&junk=1')
+            self.client.get('/api/qsos/rankings/?offset=0&limit=2&x=y')
+            # Every offset past the end is the same empty page
+            self.assertEqual(self.client.get('/api/qsos/rankings/?limit=2&offset=1000').json()['results'], [])
+            self.client.get('/api/qsos/rankings/?limit=2&offset=2000')
+        self.assertEqual(len(queries), 3)  # the count, the first page and the empty page
+        self.assertEqual([row['call_sign'] for row in first['results']], ['SP5AAA', 'SP6BBB'])
+
+
+class SeedingTestCase(TestCase):
+    def snapshot(self):
+        return list(QSOContact.objects.order_by('initiator__username', 'datetime').values_list(
+            'initiator__call_sign', 'recipient', 'frequency', 'band', 'mode', 'datetime', 'confirmed'
+        ))
+
+    def test_seed_is_reproducible(self):
+        with transaction.atomic():
+            seed_qsos(5, 300, seed=7)
+            first = self.snapshot()
+            transaction.set_rollback(True)
+        seed_qsos(5, 300, seed=7)
+        self.assertEqual(self.snapshot(), first)
+        with self.assertRaises(ValueError):
+            seed_qsos(5, 300, seed=7)
+
+    def test_seeded_log(self):
+        result = seed_qsos(10, 1000, mutual_share=0.4, seed=1)
+        qsos = QSOContact.objects.all()
+        self.assertEqual(result['qsos'], 1000)
+        self.assertEqual(qsos.count(), 1000)
+        self.assertEqual(qsos.filter(confirmed=True).count(), result['confirmed'])
+        self.assertAlmostEqual(result['confirmed'] / 1000, 0.4, delta=0.05)
+        self.assertFalse(qsos.filter(band='').exists())
+        self.assertEqual(User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count(), 10)
+        self.assertEqual(StationStats.objects.aggregate(total=Sum('total_contacts'))['total'], 1000)
+
+        # No station logs the same call sign twice within the duplicate window
+        logged = {}
+        for initiator_id, recipient, moment in qsos.values_list('initiator_id', 'recipient', 'datetime'):
+            logged.setdefault((initiator_id, recipient), []).append(moment)
+        for moments in logged.values():
+            moments.sort()
+            self.assertTrue(all(later - earlier > timedelta(hours=1) for earlier, later in zip(moments, moments[1:])))
+
+    def test_bench_suite_output(self):
+        output = StringIO()
+        call_command('bench_suite', sizes='400', repeat=2, stdout=output, stderr=StringIO())
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['meta']['database'], connection.vendor)
+        operations = {result['operation']: result for result in report['results']}
+        self.assertEqual(set(operations), {
+            'seed', 'create_match', 'list_page', 'list_full', 'rankings', 'rankings_band',
+            'search_callsigns', 'export_csv',
+        })
+        for name, result in operations.items():
+            for status_code in result.get('statuses', {}):
+                self.assertLess(int(status_code), 300, f'{name}: {result}')
+        # Every size is rolled back
+        self.assertFalse(QSOContact.objects.exists())
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Every endpoint stays within a fixed number of SQL queries.
+
+    Each request is sent twice, against a small log and after the data has
+    grown, with a cold application cache. The query count must not exceed
+    the endpoint's budget and must not change with the data size, which is
+    what an N+1 query would do. API calls are force-authenticated, so the
+    counts leave out the (cached) JWT user lookup.
+    """
+    # Endpoint name: query budget on SQLite. Writes include the savepoints,
+    # the rollup counters and matching; creating a QSO on a new day, band and
+    # mode also inserts its rollup row.
+    BUDGETS = {
+        'api-root': 0,
+        'qso-list': 2,
+        'qso-list-page': 2,
+        'qso-list-filtered': 2,
+        'qso-list-changes': 2,
+        'qso-create': 15,
+        'qso-detail': 1,
+        'qso-update': 10,
+        'qso-delete': 6,
+        'qso-batch': 7,
+        'qso-import': 7,
+        'qso-export': 1,
+        'qso-rankings': 2,
+        'qso-rankings-band': 2,
+        'user-profile': 0,
+        'user-profile-update': 1,
+        'change-password': 0,
+        'search-callsigns': 1,
+        'station-statistics': 2,
+        'station-daily': 1,
+        'station-bands': 1,
+        'station-modes': 1,
+        'grid-activity': 1,
+        'cache-statistics': 0,
+        'slow-queries': 0,
+        'metrics': 1,
+        'contest-open': 4,
+        'contest-log': 6,
+        'contest-close': 21,
+        'register': 7,
+        'token-obtain': 1,
+        'token-refresh': 0,
+        'admin-users': 5,
+        'admin-qsos': 7,
+    }
+    # PostgreSQL enforces the duplicate window without a query, but imports
+    # through a staging table, indexing it and deleting the duplicates there
+    # before the merge
+    POSTGRESQL_BUDGETS = {'qso-import': 13}
+    # A wrong old password leaves the fixture password alone
+    REJECTED = {'change-password'}
+    START = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('SP5AAA')
+        cls.other = make_user('SP6BBB')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', call_sign='SP0ADM', password='secret',
+            is_approved=True,
+        )
+        # One round per data size: a partner entry to match, and a QSO to delete
+        cls.partner_entries = []
+        cls.deletable = []
+        for round_index in range(2):
+            moment = cls.START + timedelta(days=7 * round_index)
+            cls.partner_entries.append(QSOContact.objects.create(
+                initiator=cls.other, recipient='SP5AAA', frequency=Decimal('145.500'), mode='FM',
+                datetime=moment, initiator_location='JO62AA', recipient_location='JO91AA',
+            ))
+            cls.deletable.append(QSOContact.objects.create(
+                initiator=cls.user, recipient='DL9DEL', frequency=Decimal('432.100'), mode='SSB',
+                datetime=moment + timedelta(days=1), initiator_location='JO91AA', recipient_location='JO62AA',
+            ))
+        cls.editable = QSOContact.objects.create(
+            initiator=cls.user, recipient='DL9EDT', frequency=Decimal('50.150'), mode='CW',
+            datetime=cls.START - timedelta(days=30), initiator_location='JO91AA', recipient_location='JO62AA',
+        )
+        cls.add_log(cls.user, 5, cls.START - timedelta(days=20))
+        rebuild_station_stats()
+        rebuild_daily_stats()
+
+    @staticmethod
+    def add_log(user, count, start):
+        qsos = []
+        for index in range(count):
+            qso = QSOContact(
+                initiator=user, recipient=f'DL{index}LOG', frequency=(Decimal('145.500'), Decimal('28.400'))[index % 2],
+                mode=('FM', 'SSB')[index % 2], datetime=start + timedelta(hours=2 * index),
+                initiator_location='JO91AA', recipient_location=('JO62AA', 'KO02BB', 'JN49CC')[index % 3],
+                confirmed=index % 3 == 0,
+            )
+            qso.update_derived_fields()
+            qsos.append(qso)
+        QSOContact.objects.bulk_create(qsos)
+
+    def grow(self):
+        self.add_log(self.user, 200, self.START - timedelta(days=60))
+        self.add_log(self.other, 100, self.START - timedelta(days=60))
+        # seed_qsos rebuilds the counters for every station
+        seed_qsos(30, 1500, seed=5)
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.user)
+        self.client_admin = APIClient()
+        self.client_admin.force_authenticate(self.admin)
+
+    def requests(self, round_index):
+        """(name, send) for every endpoint; ``round_index`` keeps writes apart."""
+        api, admin = self.client_api, self.client_admin
+        partner = self.partner_entries[round_index]
+        moment = self.START + timedelta(days=7 * round_index)
+        refresh = self.client.post('/api/token/', {'username': 'sp5aaa', 'password': 'secret'}).json()['refresh']
+        adif = StringIO(
+            f'<CALL:6>DL{round_index}IMP<QSO_DATE:8>{moment:%Y%m%d}<TIME_ON:4>1800<FREQ:7>145.500'
+            f'<MODE:2>FM<GRIDSQUARE:6>JO62AA<MY_GRIDSQUARE:6>JO91AA<EOR>'
+        )
+        adif.name = 'log.adi'
+        batch = [
+            {'recipient': f'DL{index}BT{round_index}', 'frequency': '145.500', 'mode': 'FM',
+             'datetime': (moment + timedelta(hours=3, minutes=index)).isoformat(),
+             'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA'}
+            for index in range(5)
+        ]
+        session = {}
+
+        def contest_open():
+            response = api.post('/api/contest/sessions/', {'name': f'Round {round_index}'}, format='json')
+            session['id'] = response.data.get('id')
+            return response
+
+        return [
+            ('api-root', lambda: api.get('/api/')),
+            ('qso-list', lambda: api.get('/api/qsos/')),
+            ('qso-list-page', lambda: api.get('/api/qsos/?page_size=20')),
+            ('qso-list-filtered', lambda: api.get('/api/qsos/?band=2m&confirmed=false&recipient=DL')),
+            ('qso-list-changes', lambda: api.get(f'/api/qsos/?changes_since={encode_token(timezone.now() - timedelta(days=1))}')),
+            ('qso-create', lambda: api.post('/api/qsos/', {
+                'recipient': 'SP6BBB', 'frequency': '145.501', 'mode': 'FM',
+                'datetime': (partner.datetime + timedelta(minutes=1)).isoformat(),
+                'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+            }, format='json')),
+            ('qso-detail', lambda: api.get(f'/api/qsos/{self.editable.pk}/')),
+            ('qso-update', lambda: api.patch(f'/api/qsos/{self.editable.pk}/', {'mode': ('SSB', 'FM')[round_index]}, format='json')),
+            ('qso-delete', lambda: api.delete(f'/api/qsos/{self.deletable[round_index].pk}/')),
+            ('qso-batch', lambda: api.post('/api/qsos/batch/', batch, format='json')),
+            ('qso-import', lambda: api.post('/api/qsos/import/', {'file': adif}, format='multipart')),
+            ('qso-export', lambda: api.get('/api/qsos/export/?format=csv')),
+            ('qso-rankings', lambda: api.get('/api/qsos/rankings/')),
+            ('qso-rankings-band', lambda: api.get('/api/qsos/rankings/?band=2m')),
+            ('user-profile', lambda: api.get('/api/user/profile/')),
+            ('user-profile-update', lambda: api.patch('/api/user/profile/', {'default_grid_square': ('JO91AB', 'JO91AA')[round_index]}, format='json')),
+            ('change-password', lambda: api.post('/api/user/change-password/', {'old_password': 'wrong', 'new_password': 'x'}, format='json')),
+            ('search-callsigns', lambda: api.get('/api/users/callsigns/?search=SP')),
+            ('station-statistics', lambda: api.get('/api/stats/me/')),
+            ('station-daily', lambda: api.get('/api/stats/me/daily/')),
+            ('station-bands', lambda: api.get('/api/stats/me/bands/')),
+            ('station-modes', lambda: api.get('/api/stats/me/modes/')),
+            ('grid-activity', lambda: api.get('/api/stats/grid-activity/')),
+            ('cache-statistics', lambda: admin.get('/api/cache/stats/')),
+            ('slow-queries', lambda: admin.get('/api/slow-queries/')),
+            ('metrics', lambda: self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer budget')),
+            ('contest-open', contest_open),
+            ('contest-log', lambda: api.post(f'/api/contest/sessions/{session["id"]}/qsos/', {
+                'recipient': f'DL{round_index}CT', 'frequency': '145.502', 'mode': ('FM', 'SSB')[round_index],
+                'datetime': timezone.now().isoformat(),
+                'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+            }, format='json')),
+            ('contest-close', lambda: api.post(f'/api/contest/sessions/{session["id"]}/close/')),
+            ('register', lambda: self.client.post('/api/register/', {
+                'username': f'new{round_index}', 'email': f'new{round_index}@example.com',
+                'call_sign': f'SP{round_index}NEW', 'password': 'secret-Passw0rd',
+            })),
+            ('token-obtain', lambda: self.client.post('/api/token/', {'username': 'sp5aaa', 'password': 'secret'})),
+            ('token-refresh', lambda: self.client.post('/api/token/refresh/', {'refresh': refresh})),
+            ('admin-users', lambda: self.client.get('/admin/qso_logger/user/')),
+            ('admin-qsos', lambda: self.client.get('/admin/qso_logger/qsocontact/')),
+        ]
+
+    def measure(self, round_index):
+        counts = {}
+        for name, send in self.requests(round_index):
+            if name.startswith('admin-'):
+                self.client.force_login(self.admin)
+            django_cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = send()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if name.startswith('admin-'):
+                self.client.logout()
+            expected = self.assertEqual if name in self.REJECTED else self.assertLess
+            expected(response.status_code, 400, f'{name}: {getattr(response, "content", b"")[:500]}')
+            # captured_queries reads the connection's bounded log lazily, so copy it now
+            counts[name] = list(queries.captured_queries)
+        return counts
+
+    def test_query_budgets(self):
+        self.assertEqual(set(self.BUDGETS), {name for name, _ in self.requests(0)})
+        with override_settings(METRICS_TOKEN='budget'):
+            small = self.measure(0)
+            self.grow()
+            large = self.measure(1)
+
+        budgets = dict(self.BUDGETS)
+        if connection.vendor == 'postgresql':
+            budgets.update(self.POSTGRESQL_BUDGETS)
+        for name, budget in budgets.items():
+            with self.subTest(endpoint=name):
+                for size, queries in (('small', small[name]), ('large', large[name])):
+                    self.assertLessEqual(len(queries), budget, self.report(name, size, queries))
+                self.assertEqual(len(large[name]), len(small[name]), self.report(name, 'large', large[name]))
+
+    @staticmethod
+    def report(name, size, queries):
+        lines = '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(queries, 1))
+        return f'{name} ran {len(queries)} queries on the {size} dataset:\n{lines}'
+
+
+class ContestSessionTestCase(TestCase):
+    def setUp(self):
+        self.user = make_user('SP5AAA')
+        self.other = make_user('SP6BBB')
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.user)
+        self.session_id = self.client_api.post('/api/contest/sessions/', {'name': 'VHF'}, format='json').data['id']
+        self.now = timezone.now().replace(microsecond=0)
+
+    def tearDown(self):
+        # Primary keys come back after a rollback, so no sheet may outlive its test
+        contest._sheets.clear()
+
+    def log(self, recipient, minutes=0, **fields):
+        entry = {
+            'recipient': recipient, 'frequency': '145.500', 'mode': 'FM',
+            'datetime': (self.now + timedelta(minutes=minutes)).isoformat(),
+            'initiator_location': 'JO91AA', 'recipient_location': 'JO62AA',
+        }
+        entry.update(fields)
+        return self.client_api.post(f'/api/contest/sessions/{self.session_id}/qsos/', entry, format='json')
+
+    def test_dupes_are_refused_at_stage(self):
+        self.assertEqual(self.log('DL1ABC').status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.log('DL1ABC', minutes=30)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['errors'], {NON_FIELD_ERRORS: [DUPLICATE_WINDOW_MESSAGE]})
+        # One lookup of the log and the staged entries, nothing written
+        self.assertEqual(len([query for query in queries.captured_queries if 'qso_logger_qsocontact' in query['sql']]), 1)
+        self.assertFalse([query for query in queries.captured_queries if query['sql'].startswith('INSERT')])
+        # Nothing reaches the log before a flush
+        self.assertFalse(QSOContact.objects.exists())
+        self.assertEqual(self.log('DL1ABC', minutes=61).status_code, 201)
+
+    def test_dupes_staged_by_another_process(self):
+        self.assertEqual(self.log('DL1ABC').status_code, 201)
+        # This process has not seen the other process's entries
+        session = ContestSession.objects.get()
+        ContestEntry.objects.create(
+            session=session, recipient='DL2ABC', frequency=Decimal('145.500'), mode='FM',
+            datetime=self.now + timedelta(minutes=5), initiator_location='JO91AA', recipient_location='JO62AA',
+        )
+        QSOContact.objects.create(
+            initiator=self.user, recipient='DL3ABC', frequency=Decimal('145.500'), mode='FM',
+            datetime=self.now - timedelta(hours=2), initiator_location='JO91AA', recipient_location='JO62AA',
+        )
+        self.assertEqual(self.log('DL2ABC', minutes=-20).status_code, 400)
+        self.assertEqual(self.log('DL3ABC', minutes=-150).status_code, 400)
+        self.assertEqual(self.log('DL3ABC', minutes=-50).status_code, 201)
+
+    def test_close_writes_and_confirms(self):
+        QSOContact.objects.create(
+            initiator=self.other, recipient='SP5AAA', frequency=Decimal('145.500'), mode='FM',
+            datetime=self.now, initiator_location='JO62AA', recipient_location='JO91AA',
+        )
+        self.log('SP6BBB', minutes=1)
+        self.log('DL1ABC', minutes=2)
+        response = self.client_api.post(f'/api/contest/sessions/{self.session_id}/close/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['logged_contacts'], 2)
+        self.assertEqual(response.data['staged_contacts'], 0)
+        self.assertIsNotNone(response.data['closed_at'])
+        self.assertEqual(QSOContact.objects.filter(confirmed=True).count(), 2)
+        self.assertEqual(StationStats.objects.get(user=self.user).total_contacts, 2)
+        self.assertFalse(ContestEntry.objects.exists())
+        self.assertEqual(self.log('DL2ABC').status_code, 400)
+
+    @override_settings(CONTEST_FLUSH_SIZE=2)
+    def test_flush_by_size(self):
+        self.log('DL1ABC')
+        self.assertFalse(QSOContact.objects.exists())
+        self.log('DL2ABC')
+        self.assertEqual(QSOContact.objects.filter(initiator=self.user).count(), 2)
+        self.assertFalse(ContestEntry.objects.exists())
+
+    def test_staged_entries_survive_a_restart(self):
+        self.log('DL1ABC')
+        contest._sheets.clear()
+        # A fresh process seeds its sheet with the staged entries too
+        self.assertEqual(self.log('DL1ABC', minutes=5).status_code, 400)
+        contest._sheets.clear()
+        with override_settings(CONTEST_FLUSH_SECONDS=0):
+            self.assertEqual(contest.flush_due(), 1)
+        self.assertEqual(ContestSession.objects.get().logged_contacts, 1)
+
+    def test_entries_rejected_by_the_log(self):
+        self.log('DL1ABC')
+        # Logged outside the session after the dupe check
+        QSOContact.objects.create(
+            initiator=self.user, recipient='DL1ABC', frequency=Decimal('145.500'), mode='FM',
+            datetime=self.now - timedelta(minutes=10), initiator_location='JO91AA', recipient_location='JO62AA',
+        )
+        response = self.client_api.post(f'/api/contest/sessions/{self.session_id}/close/')
+        self.assertEqual(response.data['logged_contacts'], 0)
+        self.assertEqual(response.data['rejected_contacts'], 1)
+        entries = self.client_api.get(f'/api/contest/sessions/{self.session_id}/entries/').data
+        self.assertEqual([entry['recipient'] for entry in entries], ['DL1ABC'])
+        self.assertTrue(entries[0]['error'])
+
+    def test_one_open_session(self):
+        response = self.client_api.post('/api/contest/sessions/', {'name': 'HF'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConnectionBenchmarkTestCase(TransactionTestCase):
+    def test_bench_connections_output(self):
+        output = StringIO()
+        call_command('bench_connections', requests=5, max_age=30, stdout=output)
+        results = {result['configuration']: result for result in json.loads(output.getvalue())['results']}
+        self.assertEqual(set(results), {'per_request', 'persistent', 'persistent_health_checks'})
+        self.assertEqual(results['persistent']['conn_max_age'], 30)
+        self.assertLessEqual(results['persistent']['connections_opened'], 1)
+        # The configured connection settings are restored
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 0)
+        self.assertFalse(connection.settings_dict['CONN_HEALTH_CHECKS'])
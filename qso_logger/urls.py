@@ -2,20 +2,36 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
+    ContestSessionViewSet,
     QSOContactViewSet,
     change_password,
     UserProfileView,
     search_callsigns,
+    station_statistics,
+    station_rollup,
+    grid_activity,
+    cache_statistics,
+    prometheus_metrics,
+    slow_query_log,
     register
 )
 
 router = DefaultRouter()
 router.register(r'qsos', QSOContactViewSet, basename='qso')
+router.register(r'contest/sessions', ContestSessionViewSet, basename='contest-session')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('user/change-password/', change_password, name='change-password'),
     path('user/profile/', UserProfileView.as_view(), name='user-profile'),
     path('users/callsigns/', search_callsigns, name='search-callsigns'),
+    path('stats/me/', station_statistics, name='station-statistics'),
+    path('stats/me/daily/', station_rollup, {'group': 'day'}, name='station-daily'),
+    path('stats/me/bands/', station_rollup, {'group': 'band'}, name='station-bands'),
+    path('stats/me/modes/', station_rollup, {'group': 'mode'}, name='station-modes'),
+    path('stats/grid-activity/', grid_activity, name='grid-activity'),
+    path('cache/stats/', cache_statistics, name='cache-statistics'),
+    path('slow-queries/', slow_query_log, name='slow-queries'),
+    path('metrics', prometheus_metrics, name='metrics'),
     path('register/', register, name='register'),
 ]
\ No newline at end of file
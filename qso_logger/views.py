@@ -1,14 +1,41 @@
 # qso_logger/views.py
-from rest_framework import viewsets, status, generics
-from rest_framework.decorators import action, api_view, permission_classes
+import hashlib
+import io
+import json
+import logging
+import re
+from rest_framework import mixins, viewsets, status, generics, serializers
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Q
-from django.contrib.auth import get_user_model
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Substr
 from django.utils import timezone
-from datetime import timedelta
-from .models import QSOContact, User
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.utils.text import compress_sequence
+from . import cache, contest, metrics, slow_queries
+from .models import ContestSession, QSOContact, StationDailyStats, StationStats, User
+from .batch import create_batch
+from .export import EXPORT_FIELDS, LINE_WRITERS, api_row, export_rows
+from .filters import CALL_SIGN_PREFIX, filter_band, filter_day_range, filter_qsos, filter_time_range, parse_band
+from .importer import guess_format, import_log
+from .jobs import enqueue_match
+from .matching import confirm_match
+from .middleware import gzip_large
+from .renderers import ADIFRenderer, CSVRenderer, NDJSONRenderer, ORJSONRenderer
+from .pagination import QSOCursorPagination, RankingsPagination
+from .sync import changes_since, decode_token, encode_token, log_state, token_expired
 from .serializers import (
+    ContestEntrySerializer,
+    ContestSessionSerializer,
     QSOContactSerializer,
     UserSerializer,
     PasswordChangeSerializer,
@@ -17,55 +44,171 @@ from .serializers import (
     RegistrationSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+CALLSIGN_SEARCH_TTL = 60  # seconds
+MAX_BATCH_SIZE = 1000
+GZIP_ACCEPTED = re.compile(r'\bgzip\b')
+GRID_LEVELS = {'field': 2, 'square': 4, 'subsquare': 6}
+JSON_RENDERERS = [ORJSONRenderer, BrowsableAPIRenderer]
+
 class QSOContactViewSet(viewsets.ModelViewSet):
     serializer_class = QSOContactSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = QSOCursorPagination
+    renderer_classes = JSON_RENDERERS
 
     def get_queryset(self):
         # Only return QSOs where the current user is the initiator
-        return QSOContact.objects.filter(
+        queryset = QSOContact.objects.filter(
             initiator=self.request.user
-        ).order_by('-datetime')
+        ).select_related('initiator').order_by('-datetime', '-id')
+        if self.action == 'list':
+            queryset = filter_qsos(queryset, self.request.query_params)
+        return queryset
+
+    @method_decorator(gzip_large)
+    def list(self, request, *args, **kwargs):
+        if 'changes_since' in request.query_params:
+            return self.list_changes(request)
+
+        # Conditional GET: one aggregate decides whether the client's copy is current
+        last_modified, etag = log_state(
+            request.user, variant=f'{request.accepted_renderer.format}:{request.get_full_path()}'
+        )
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        sync_token = encode_token(timezone.now())
+
+        # Read-only fast path: plain dicts from .values() in the serializer's
+        # exact output format, instead of a serializer field per value
+        queryset = self.filter_queryset(self.get_queryset()).values(*EXPORT_FIELDS)
+        page = self.paginate_queryset(queryset)
+        data = [api_row(row, request.user) for row in (queryset if page is None else page)]
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        response['X-Sync-Token'] = sync_token
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list_changes(self, request):
+        # Delta sync: rows changed and ids deleted since the client's token
+        since = decode_token(request.query_params['changes_since'])
+        if token_expired(since):
+            return Response(
+                {"error": "Sync token expired, fetch the full log again"},
+                status=status.HTTP_410_GONE
+            )
+        sync_token = encode_token(timezone.now())
+        changed, deleted = changes_since(request.user, since)
+        return Response({
+            'changed': [api_row(row, request.user) for row in changed.values(*EXPORT_FIELDS)],
+            'deleted': deleted,
+            'token': sync_token,
+        })
 
     def perform_create(self, serializer):
-        # First save the new QSO
+        # First save the new QSO; its post_save signal counts it in the rankings and rollups
         qso = serializer.save(initiator=self.request.user, confirmed=False)
 
-        # Search for matching QSOs
+        if settings.MATCH_ASYNC:
+            # The match worker confirms it off the request path
+            enqueue_match(qso)
+            return
+
+        # Confirm against the matching QSO from the other station, if logged
         try:
-            # Look for any QSO from the recipient to the initiator within the time window
-            potential_matches = QSOContact.objects.filter(
-                initiator__call_sign=qso.recipient,  # QSO initiated by the recipient
-                recipient=qso.initiator.call_sign,   # To the current initiator
-                datetime__range=(
-                    qso.datetime - timedelta(hours=1),
-                    qso.datetime + timedelta(hours=1)
-                ),
-                confirmed=False  # Only match unconfirmed QSOs
+            confirm_match(qso)
+        except Exception:
+            # Don't stop the QSO from being created; the match worker retries it
+            logger.exception('Matching QSO %s failed, queued for the match worker', qso.pk)
+            enqueue_match(qso)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        # Validate every entry first, then insert and match the valid ones together
+        if not isinstance(request.data, list):
+            return Response(
+                {"error": "Expected a list of QSO contacts"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > MAX_BATCH_SIZE:
+            return Response(
+                {"error": f"A batch may contain at most {MAX_BATCH_SIZE} QSO contacts"},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Add frequency and mode matching criteria
-            # Allow for small frequency differences (within 0.005 MHz)
-            matching_qso = None
-            for potential_match in potential_matches:
-                freq_diff = abs(potential_match.frequency - qso.frequency)
-                if (freq_diff <= 0.005 and  # Frequency within 5 kHz
-                    potential_match.mode == qso.mode and  # Same mode
-                    potential_match.initiator_location == qso.recipient_location and  # Location match
-                    potential_match.recipient_location == qso.initiator_location):  # Cross-location match
-                    matching_qso = potential_match
-                    break
-
-            if matching_qso:
-                # Update both QSOs to confirmed status
-                matching_qso.confirmed = True
-                matching_qso.save()
-                qso.confirmed = True
-                qso.save()
+        entries = []
+        results = {}
+        for index, item in enumerate(request.data):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                entries.append((index, serializer.validated_data))
+            else:
+                results[index] = serializer.errors
+        results.update(create_batch(request.user, entries))
 
-        except Exception as e:
-            # Log the error but don't stop the QSO from being created
-            print(f"Error during QSO matching: {str(e)}")
+        items = []
+        for index in range(len(request.data)):
+            outcome = results[index]
+            if isinstance(outcome, QSOContact):
+                items.append({'index': index, 'status': 'created', 'id': outcome.pk, 'confirmed': outcome.confirmed})
+            else:
+                items.append({'index': index, 'status': 'error', 'errors': outcome})
+        created = sum(1 for item in items if item['status'] == 'created')
+        return Response(
+            {'created': created, 'failed': len(items) - created, 'results': items},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_log(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"error": "Upload the log as the 'file' field"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # The import runs within this request and its statement timeout
+        if upload.size > settings.IMPORT_MAX_UPLOAD_BYTES:
+            return Response(
+                {"error": f"Logs over {settings.IMPORT_MAX_UPLOAD_BYTES} bytes are imported by an administrator"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Uploads are spooled to disk by Django, so the file is parsed as a stream
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', errors='replace', newline='')
+        report = import_log(request.user, stream, file_format=guess_format(upload.name))
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], renderer_classes=[ADIFRenderer, CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        # Rows are streamed straight from a server-side cursor, never materialised
+        queryset = filter_qsos(QSOContact.objects.filter(initiator=request.user), request.query_params)
+
+        write_lines, extension = LINE_WRITERS[request.accepted_renderer.format]
+        lines = write_lines(export_rows(queryset), request.user)
+
+        gzipped = GZIP_ACCEPTED.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        response = StreamingHttpResponse(
+            compress_sequence(lines) if gzipped else lines,
+            content_type=f'{request.accepted_renderer.media_type}; charset=utf-8'
+        )
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        response['Content-Disposition'] = f'attachment; filename="{request.user.call_sign}.{extension}"'
+        return response
 
     def perform_destroy(self, instance):
         # Only allow deletion of unconfirmed QSOs
@@ -76,23 +219,126 @@ class QSOContactViewSet(viewsets.ModelViewSet):
         instance.delete()
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @method_decorator(gzip_large)
     def rankings(self, request):
+        band = request.query_params.get('band')
+        if band:
+            parse_band(band)
         try:
-            User = get_user_model()
-            users = User.objects.annotate(
-                confirmed_contacts=Count(
-                    'initiated_contacts',
-                    filter=Q(initiated_contacts__confirmed=True)
-                ),
-                total_contacts=Count('initiated_contacts')
-            ).values('call_sign', 'confirmed_contacts', 'total_contacts')
-            return Response(list(users))
+            # Read the precomputed per-station counters instead of counting QSOs
+            if band:
+                # Band leaderboards add up that band's daily rollups
+                stats = StationDailyStats.objects.filter(band=band).values('user').annotate(
+                    confirmed_contacts=Sum('confirmed_contacts'),
+                    total_contacts=Sum('total_contacts'),
+                    call_sign=F('user__call_sign')
+                ).filter(total_contacts__gt=0).order_by(
+                    '-confirmed_contacts', '-total_contacts', 'user'
+                ).values('confirmed_contacts', 'total_contacts', 'call_sign')
+            else:
+                stats = StationStats.objects.order_by(
+                    '-confirmed_contacts', '-total_contacts', 'user'
+                ).values(
+                    'confirmed_contacts', 'total_contacts', call_sign=F('user__call_sign')
+                )
+
+            # Only the count and the rows are cached, keyed by the validated
+            # parameters: the links are built from the Host header and the
+            # raw query string, so they are added per request. Offsets past
+            # the end share one (empty) entry.
+            paginator = RankingsPagination()
+            paginator.request = request
+            paginator.limit = paginator.get_limit(request)
+            paginator.count = cache.get_or_set(cache.RANKINGS, [band or '', 'count'], stats.count)
+            paginator.offset = min(paginator.get_offset(request), paginator.count)
+            rows = cache.get_or_set(
+                cache.RANKINGS, [band or '', paginator.limit, paginator.offset],
+                lambda: list(stats[paginator.offset:paginator.offset + paginator.limit])
+            )
+            return paginator.get_paginated_response(rows)
         except Exception as e:
             return Response(
                 {"error": "Failed to fetch rankings"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class ContestSessionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                            mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = ContestSessionSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = JSON_RENDERERS
+
+    def get_queryset(self):
+        queryset = ContestSession.objects.filter(operator=self.request.user)
+        if self.action in ('qsos', 'entries'):
+            return queryset
+        return queryset.annotate(
+            staged_contacts=Count('entries', filter=Q(entries__error='')),
+            rejected_contacts=Count('entries', filter=~Q(entries__error='')),
+        ).order_by('-opened_at', '-id')
+
+    def perform_create(self, serializer):
+        # One open session per operator, also enforced by a partial unique constraint
+        if ContestSession.objects.filter(operator=self.request.user, closed_at__isnull=True).exists():
+            raise serializers.ValidationError({"error": "Close your open contest session first"})
+        try:
+            with transaction.atomic():
+                session = serializer.save(operator=self.request.user)
+        except IntegrityError:
+            raise serializers.ValidationError({"error": "Close your open contest session first"})
+        session.staged_contacts = session.rejected_contacts = 0
+
+    @action(detail=True, methods=['post'])
+    def qsos(self, request, pk=None):
+        # Accepts one QSO or a list; accepted ones are staged and written to the log in batches
+        session = self.get_object()
+        if session.closed_at is not None:
+            return Response({"error": "This contest session is closed"}, status=status.HTTP_400_BAD_REQUEST)
+        items = request.data if isinstance(request.data, list) else [request.data]
+        if len(items) > MAX_BATCH_SIZE:
+            return Response(
+                {"error": f"A batch may contain at most {MAX_BATCH_SIZE} QSO contacts"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entries = []
+        results = {}
+        context = self.get_serializer_context()
+        for index, item in enumerate(items):
+            serializer = QSOContactSerializer(data=item, context=context)
+            if serializer.is_valid():
+                entries.append((index, serializer.validated_data))
+            else:
+                results[index] = serializer.errors
+        results.update(contest.stage(session, entries))
+
+        outcomes = []
+        for index in range(len(items)):
+            outcome = results[index]
+            if isinstance(outcome, dict):
+                outcomes.append({'index': index, 'status': 'error', 'errors': outcome})
+            else:
+                outcomes.append({'index': index, 'status': 'staged', 'id': outcome.pk})
+        staged = sum(1 for item in outcomes if item['status'] == 'staged')
+        return Response(
+            {'staged': staged, 'failed': len(outcomes) - staged, 'results': outcomes},
+            status=status.HTTP_201_CREATED if staged else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        session = self.get_object()
+        if session.closed_at is not None:
+            return Response({"error": "This contest session is closed"}, status=status.HTTP_400_BAD_REQUEST)
+        contest.close(session)
+        return Response(self.get_serializer(self.get_object()).data)
+
+    @action(detail=True, methods=['get'])
+    def entries(self, request, pk=None):
+        # Entries still waiting for a flush, and the ones the log rejected
+        session = self.get_object()
+        return Response(ContestEntrySerializer(session.entries.order_by('datetime', 'id'), many=True).data)
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserUpdateSerializer
     permission_classes = [IsAuthenticated]
@@ -120,18 +366,155 @@ def change_password(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(JSON_RENDERERS)
 def search_callsigns(request):
     search_query = request.query_params.get('search', '').upper()
-    if len(search_query) < 2:
+    if len(search_query) < 2 or not CALL_SIGN_PREFIX.match(search_query):
         return Response([])
 
-    users = User.objects.filter(
-        call_sign__istartswith=search_query
-    ).exclude(
-        call_sign=request.user.call_sign
-    ).values('call_sign', 'default_grid_square')[:10]
+    # Call signs are stored uppercase, so a case-sensitive LIKE 'X%' can use
+    # the varchar_pattern_ops index PostgreSQL keeps for the unique column.
+    # Cached per prefix for all users; one spare row covers excluding yourself.
+    users = cache.get_or_set(cache.CALLSIGNS, [search_query], lambda: list(
+        User.objects.filter(
+            call_sign__startswith=search_query
+        ).values('call_sign', 'default_grid_square')[:11]
+    ), timeout=CALLSIGN_SEARCH_TTL, versioned=False)
+    users = [user for user in users if user['call_sign'] != request.user.call_sign][:10]
+
+    response = Response(users)
+    patch_cache_control(response, private=True, max_age=CALLSIGN_SEARCH_TTL)
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def station_statistics(request):
+    def build():
+        stats, _ = StationStats.objects.get_or_create(user=request.user)
+        rank = StationStats.objects.filter(
+            confirmed_contacts__gt=stats.confirmed_contacts
+        ).count() + 1
+        return {
+            'call_sign': request.user.call_sign,
+            'total_contacts': stats.total_contacts,
+            'confirmed_contacts': stats.confirmed_contacts,
+            'confirmation_rate': (
+                round(stats.confirmed_contacts / stats.total_contacts, 4)
+                if stats.total_contacts else None
+            ),
+            'rank': rank,
+        }
+
+    data = cache.get_or_set(cache.user_stats_namespace(request.user.pk), ['summary'], build)
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def station_rollup(request, group):
+    # Answered from the per-day rollups, so the cost follows the number of
+    # active days rather than the number of QSOs
+    params = request.query_params
+
+    def build():
+        rollups = filter_day_range(StationDailyStats.objects.filter(user=request.user), params)
+        if params.get('band'):
+            rollups = rollups.filter(band=parse_band(params['band']))
+        if params.get('mode'):
+            rollups = rollups.filter(mode=params['mode'].upper())
+        rows = rollups.values(group).annotate(
+            total=Sum('total_contacts'),
+            confirmed=Sum('confirmed_contacts')
+        ).order_by(group)
+        return [
+            {
+                group: row[group],
+                'total_contacts': row['total'],
+                'confirmed_contacts': row['confirmed'],
+                'confirmation_rate': round(row['confirmed'] / row['total'], 4),
+            }
+            for row in rows if row['total']
+        ]
+
+    data = cache.get_or_set(
+        cache.user_stats_namespace(request.user.pk),
+        ['rollup', group, params.get('since', ''), params.get('until', ''),
+         params.get('band', ''), params.get('mode', '').upper()],
+        build
+    )
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def grid_activity(request):
+    level = request.query_params.get('level', 'square')
+    if level not in GRID_LEVELS:
+        return Response(
+            {"level": f"Expected one of: {', '.join(GRID_LEVELS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def build():
+        queryset = QSOContact.objects.filter(initiator=request.user)
+        queryset = filter_band(filter_time_range(queryset, request.query_params), request.query_params)
+        # Let the database group by locator prefix so only the counts travel
+        cells = list(
+            queryset.annotate(
+                grid=Substr('recipient_location', 1, GRID_LEVELS[level])
+            ).values('grid').annotate(
+                contacts=Count('id'),
+                confirmed=Count('id', filter=Q(confirmed=True))
+            ).order_by('grid')
+        )
+        body = {'level': level, 'cells': cells}
+        etag = quote_etag(hashlib.md5(json.dumps(body).encode()).hexdigest())
+        return body, etag
+
+    params = request.query_params
+    body, etag = cache.get_or_set(
+        cache.user_stats_namespace(request.user.pk),
+        ['grid-activity', level, params.get('since', ''), params.get('until', ''), params.get('band', '')],
+        build
+    )
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(body)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_statistics(request):
+    return Response({
+        'backend': settings.CACHES['default']['BACKEND'],
+        'namespaces': cache.stats(),
+    })
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def slow_query_log(request):
+    if request.method == 'DELETE':
+        slow_queries.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({
+        'enabled': settings.SLOW_QUERY_CAPTURE,
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+        'explain_sample_rate': settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        'queries': slow_queries.entries(),
+    })
 
-    return Response(users)
+def prometheus_metrics(request):
+    # Plain Django view: the JWT authentication would reject the scrape token
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @api_view(['POST'])
 @permission_classes([AllowAny])